@@ -2,7 +2,11 @@
 import datetime
 import io
 import os
+import uuid
+from functools import partial
+from typing import AsyncIterator
 from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
 from core.auth import require_auth, require_media_auth
 from fastapi_utils.api_model import APIMessage
 from fastapi_utils.cbv import cbv
@@ -12,33 +16,81 @@ from sqlmodel import Session, select
 import comicfile
 import db
 import global_data
+import page_cache
+import page_index
+import prefetch
 from core.exceptions import abort
+from core.executors import page_cpu, page_io
+from core.streaming import BytesRangeResponse, FileSpanResponse, StreamResponse
+from imaging import downscale
 from loader import ComicLoader
 from model import ComicEntity
+from page_cache import variant_key
 from schemas.common import ProgressRequest, ProgressResponse
 
 
 router = APIRouter()
 
 PAGE_CACHE_CONTROL = "max-age=604800"
+# Upper bound on the pages one batch request may ask for.
+MAX_BATCH_PAGES = 50
 
 
 def page_etag(entity_id: int, page: int, updateTime: datetime.datetime, width: int | None) -> str:
     return f'"{entity_id}-{page}-{int(updateTime.timestamp())}-{width or 0}"'
 
 
-def resize_to_width(buf: bytes, width: int) -> tuple[bytes, str] | None:
+def cached_page_response(rel: str, headers: dict) -> Response:
+    """Serve a variant from the page cache.
+
+    Behind nginx the file is handed off with X-Accel-Redirect, so the bytes
+    never pass through Python; otherwise it is streamed from disk.
+    """
+    accel = global_data.Config.page_cache_accel
+    if accel:
+        return Response(
+            media_type="image/webp", headers={**headers, "x-accel-redirect": accel + rel}
+        )
+    path = os.path.join(page_cache.cache.root, rel)
+    return FileResponse(path, media_type="image/webp", headers=headers)
+
+
+def cache_page_variant(key: str, buf: bytes) -> None:
+    try:
+        page_cache.cache.put(key, buf)
+    except OSError as ex:
+        # A full or read-only cache disk must not fail the page itself.
+        print("page cache write fail:", key, ex)
+
+
+def read_page_variant(key: str) -> bytes | None:
+    """The cached variant's bytes, or None when it is not in the page cache."""
+    rel = page_cache.cache.get(key)
+    if rel is None:
+        return None
+    try:
+        with open(os.path.join(page_cache.cache.root, rel), "rb") as f:
+            return f.read()
+    except OSError:
+        return None  # evicted meanwhile
+
+
+def resize_to_width(buf: bytes, width: int, key: str | None = None) -> tuple[bytes, str] | None:
     """Downscale image bytes to the given width (keeps aspect ratio, returns WebP).
 
     Returns None when the image is already narrow enough or cannot be decoded.
+    The former is remembered under the variant ``key`` in ``page_cache.narrow``,
+    so the next request serves the original without decoding it.
     """
     try:
         img = Image.open(io.BytesIO(buf))
     except Exception:
         return None
     if img.width <= width:
+        if key is not None:
+            page_cache.narrow.add(key)
         return None
-    img.thumbnail((width, img.height * width // img.width))
+    downscale(img, (width, img.height * width // img.width))
     if img.mode != "RGBA":
         img = img.convert("RGB")
     out = io.BytesIO()
@@ -47,6 +99,102 @@ def resize_to_width(buf: bytes, width: int) -> tuple[bytes, str] | None:
     return out.getvalue(), "image/webp"
 
 
+def prefetch_key(comic: ComicEntity, page: int, width: int | None) -> prefetch.Key:
+    return comic.id, int(comic.updateTime.timestamp()), page, width
+
+
+def render_page(
+    comic_id: int,
+    path: str,
+    update_time: datetime.datetime,
+    namelist: list[str],
+    pages: list[dict],
+    page: int,
+    width: int | None,
+) -> tuple[bytes, str] | None:
+    """Read one page through the archive pool, resized to ``width`` if given.
+
+    Blocking; for the prefetcher and the batch endpoint. A variant already in
+    the disk page cache is read from there; a new one is resized on
+    ``page_cpu``, like a request's, and stored.
+    """
+    media_type = pages[page - 1]["mediaType"]
+    key = None
+    if width is not None and media_type != "image/gif":
+        key = variant_key("comics", comic_id, page, update_time, width)
+        cached = read_page_variant(key)
+        if cached is not None:
+            return cached, "image/webp"
+    with comicfile.pool.lease(path, namelist) as cf:
+        if cf is None:
+            return None
+        ok, buf = cf.read(page - 1)
+    if not ok:
+        return None
+    if key is not None and key not in page_cache.narrow:
+        resized = page_cpu.call(resize_to_width, buf, width, key)
+        if resized is not None:
+            buf, media_type = resized
+            cache_page_variant(key, buf)
+    return buf, media_type
+
+
+def read_ahead(comic: ComicEntity, pages: list[dict], page: int, width: int | None):
+    """Queue the pages after ``page`` for the prefetcher, at the same width."""
+    # Plain values only: the loads run after the request's session is gone.
+    args = comic.id, comic.path, comic.updateTime, [p["name"] for p in pages], pages
+    last = min(page + prefetch.prefetcher.window, len(pages))
+    for ahead in range(page + 1, last + 1):
+        prefetch.prefetcher.schedule(
+            prefetch_key(comic, ahead, width), partial(render_page, *args, ahead, width)
+        )
+
+
+async def batch_parts(
+    boundary: str,
+    args: tuple,
+    start: int,
+    end: int,
+    width: int | None,
+) -> AsyncIterator[bytes]:
+    """The ``multipart/mixed`` body of a page batch, one page at a time.
+
+    ``args`` is ``render_page``'s leading arguments. Pages that cannot be
+    read are left out; each part names its page in ``X-Page``.
+    """
+    comic_id, _, update_time, _, pages = args
+    version = int(update_time.timestamp())
+    for page in range(start, end + 1):
+        rendered = prefetch.prefetcher.get((comic_id, version, page, width))
+        key = None
+        if rendered is None and width is not None and pages[page - 1]["mediaType"] != "image/gif":
+            key = variant_key("comics", comic_id, page, update_time, width)
+            cached = await page_io.run(read_page_variant, key)
+            if cached is not None:
+                rendered = cached, "image/webp"
+        if rendered is None:
+            # Read at full size and resize here, so the page_io thread is
+            # not held while the resize waits its turn on page_cpu.
+            rendered = await page_io.run(render_page, *args, page, None)
+            if rendered is None:
+                continue
+            if key is not None and key not in page_cache.narrow:
+                resized = await page_cpu.run(resize_to_width, rendered[0], width, key)
+                if resized is not None:
+                    rendered = resized
+                    await page_io.run(cache_page_variant, key, resized[0])
+        body, media_type = rendered
+        yield (
+            f"--{boundary}\r\n"
+            f"Content-Type: {media_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"X-Page: {page}\r\n\r\n"
+        ).encode()
+        yield body
+        yield b"\r\n"
+    yield f"--{boundary}--\r\n".encode()
+
+
 @cbv(router)
 class ComicPageCBV:
     session: Session = Depends(db.get_session)
@@ -59,7 +207,7 @@ class ComicPageCBV:
         return comic
 
     @router.get("/api/comics/{id}/pages/{page}", tags=["comicpage"])
-    def get(
+    async def get(
         self,
         id: int,
         page: int,
@@ -70,25 +218,123 @@ class ComicPageCBV:
         # Reject 0/negative early: page - 1 would otherwise index from the end.
         if page < 1:
             abort(404, "Page not found")
+        loaded = await page_io.run(
+            self.__load, id, page, width, request.headers.get("if-none-match")
+        )
+        if isinstance(loaded, Response):
+            return loaded
+        buf, media_type, headers, key = loaded
+        resized = await page_cpu.run(resize_to_width, buf, width, key)
+        if resized is not None:
+            buf, media_type = resized
+            await page_io.run(cache_page_variant, key, buf)
+        return BytesRangeResponse(buf, media_type, headers)
+
+    def __load(self, id: int, page: int, width: int | None, if_none_match: str | None):
+        """Everything up to the resize, on the page I/O executor.
+
+        Returns the response when the page can be answered as is, else the
+        ``(bytes, media_type, headers, variant key)`` to resize.
+        """
         comic = self.__get(id)
         etag = page_etag(id, page, comic.updateTime, width)
         headers = {"cache-control": PAGE_CACHE_CONTROL, "etag": etag}
-        if request.headers.get("if-none-match") == etag:
+        if if_none_match == etag:
             return Response(status_code=304, headers=headers)
-        cf = comicfile.create_open(comic.path)
-        if cf is None:
-            abort(404, "Comic file not found")
-        ok, buf = cf.read(page - 1)
-        if not ok:
+        key = variant_key("comics", id, page, comic.updateTime, width)
+        pages = page_index.load(self.session, comic)
+        if pages is not None:
+            if page > len(pages):
+                abort(404, "Page not found")
+            read_ahead(comic, pages, page, width)
+            prefetched = prefetch.prefetcher.get(prefetch_key(comic, page, width))
+            if prefetched is not None:
+                return BytesRangeResponse(*prefetched, headers)
+        if width is not None:
+            rel = page_cache.cache.get(key)
+            if rel is not None:
+                return cached_page_response(rel, headers)
+        # A page no wider than ``width`` is served as is, like no width at all.
+        as_is = width is None or key in page_cache.narrow
+        if pages is not None:
+            info = pages[page - 1]
+            # Pages served as is and kept uncompressed on disk go straight
+            # from the file, without reading them into memory first.
+            if as_is or info["mediaType"] == "image/gif":
+                span = comicfile.stored_span(
+                    comic.path, info, int(comic.updateTime.timestamp())
+                )
+                if span is not None:
+                    return FileSpanResponse(*span, media_type=info["mediaType"], headers=headers)
+        namelist = [p["name"] for p in pages] if pages is not None else None
+        cf, release = comicfile.pool.checkout(comic.path, namelist)
+        try:
+            if cf is None:
+                abort(404, "Comic file not found")
+            if pages is None:
+                pages = page_index.save(self.session, comic, cf)
+                if page > len(pages):
+                    abort(404, "Page not found")
+                read_ahead(comic, pages, page, width)
+            ext = os.path.splitext(pages[page - 1]["name"])[1].lower()
+            media_type = pages[page - 1]["mediaType"]
+            # Resizing a GIF would drop animation frames, so serve it untouched.
+            if as_is or ext == ".gif":
+                opened = cf.open_page(page - 1)
+                if opened is None:
+                    abort(404, "Page not found")
+                # The response keeps the archive leased until it is sent.
+                response = StreamResponse(*opened, media_type, headers, on_close=release)
+                release = None
+                return response
+            ok, buf = cf.read(page - 1)
+            if not ok:
+                abort(404, "Page not found")
+        finally:
+            if release is not None:
+                release()
+        return buf, media_type, headers, key
+
+    @router.get("/api/comics/{id}/pages", tags=["comicpage"])
+    async def get_batch(
+        self,
+        id: int,
+        start: int = Query(ge=1),
+        end: int = Query(ge=1),
+        width: int | None = Query(default=None, ge=1, le=4096),
+        _: None = Depends(require_media_auth),
+    ) -> Response:
+        """Pages ``start``..``end`` (inclusive) in one ``multipart/mixed`` body.
+
+        Preloading a chapter this way costs one request and one archive open
+        instead of one of each per page. Each part carries the page's
+        Content-Type, Content-Length and its number in ``X-Page``.
+        """
+        if end < start:
+            abort(400, "end is before start")
+        if end - start + 1 > MAX_BATCH_PAGES:
+            abort(400, f"At most {MAX_BATCH_PAGES} pages per batch")
+        args = await page_io.run(self.__index, id)
+        pages = args[-1]
+        if start > len(pages):
             abort(404, "Page not found")
-        ext = os.path.splitext(cf.namelist[page - 1])[1].lower()
-        media_type = comicfile.mediaTypes.get(ext, "image/jpeg")
-        # Resizing a GIF would drop animation frames, so serve it untouched.
-        if width is not None and ext != ".gif":
-            resized = resize_to_width(buf, width)
-            if resized is not None:
-                buf, media_type = resized
-        return Response(content=buf, media_type=media_type, headers=headers)
+        boundary = uuid.uuid4().hex
+        return StreamingResponse(
+            batch_parts(boundary, args, start, min(end, len(pages)), width),
+            media_type=f"multipart/mixed; boundary={boundary}",
+            headers={"cache-control": PAGE_CACHE_CONTROL},
+        )
+
+    def __index(self, id: int) -> tuple:
+        """``render_page``'s comic arguments, indexing the comic if needed."""
+        comic = self.__get(id)
+        pages = page_index.load(self.session, comic)
+        if pages is None:
+            with comicfile.pool.lease(comic.path) as cf:
+                if cf is None:
+                    abort(404, "Comic file not found")
+                pages = page_index.save(self.session, comic, cf)
+        return comic.id, comic.path, comic.updateTime, [p["name"] for p in pages], pages
 
     @router.put("/api/comics/{id}/progress", tags=["comicpage"])
     def update_progress(
@@ -114,12 +360,12 @@ class ComicPageCBV:
         path = os.path.join(global_data.Config.Image.liked_path, name)
         if os.path.exists(path):
             return APIMessage(detail="OK")
-        cf = comicfile.create_open(comic.path)
-        if cf is None:
-            abort(404, "Comic file not found")
-        ok, buf = cf.read(page - 1)
-        if not ok:
-            abort(404, "Page not found")
+        with comicfile.pool.lease(comic.path) as cf:
+            if cf is None:
+                abort(404, "Comic file not found")
+            ok, buf = cf.read(page - 1)
+            if not ok:
+                abort(404, "Page not found")
         os.makedirs(global_data.Config.Image.liked_path, exist_ok=True)
         img = Image.open(io.BytesIO(buf))
         img = img.convert("RGB")
@@ -129,10 +375,11 @@ class ComicPageCBV:
     @router.post("/api/comics/{id}/pages/{page}/cover", tags=["comicpage"])
     def set_cover(self, id: int, page: int, _: None = Depends(require_auth)):
         comic = self.__get(id)
-        cf = comicfile.create_open(comic.path)
-        if cf is None:
-            abort(404, "Comic file not found")
-        if ComicLoader.gen_comic_cover(comic, cf, True, page - 1 if page > 0 else 0):
+        with comicfile.pool.lease(comic.path) as cf:
+            if cf is None:
+                abort(404, "Comic file not found")
+            ok = ComicLoader.gen_comic_cover(comic, cf, True, page - 1 if page > 0 else 0)
+        if ok:
             rsp = Response(status_code=200)
             comic.coverPosition = page
             # Bump the cover version so the frontend's cache-busting URL changes.
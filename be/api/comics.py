@@ -4,18 +4,21 @@ import pathlib
 import shutil
 from datetime import datetime
 from typing import List
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response
 from fastapi_utils.api_model import APIMessage
 from fastapi_utils.cbv import cbv
 from sqlmodel import Session, select, or_
 
 import comicfile
 import db
+import dir_size
 import global_data
+import listing
+import page_index
 import util
 from core.exceptions import abort
 from loader import ComicLoader
-from model import ComicEntity
+from model import ComicEntity, path_digest
 from schemas.comic import (
     ComicDetailResponse,
     ComicPageDetailResponse,
@@ -34,18 +37,33 @@ class ComicCBV:
     session: Session = Depends(db.get_session)
 
     @router.get("/api/comics", tags=["comics"], response_model_exclude_none=True, response_model_exclude_defaults=True)
-    def get_all(self, fileMiss: bool = False, top: int = None) -> List[ComicEntity]:
+    def get_all(
+        self,
+        response: Response,
+        fileMiss: bool = False,
+        top: int = None,
+        cursor: str = None,
+        fields: str = None,
+    ) -> List[ComicEntity]:
         # `missing` is maintained by the scan reconcile (loader.work), so this
         # filters on the stored flag instead of stat-ing the filesystem on every
         # request. fileMiss=true is the organize page asking for the gone files;
         # the default list hides them so an unmounted drive doesn't show ghosts.
-        statement = select(ComicEntity).where(
-            ComicEntity.missing == fileMiss  # noqa: E712
-        ).order_by(ComicEntity.updateTime.desc())
-        if top is not None:
-            statement = statement.limit(top)
-        comic_entities = self.session.exec(statement).all()
-        return [comic.model_dump() for comic in comic_entities]
+        # `top` is the page size; follow X-Next-Cursor via `cursor` for the next.
+        columns = listing.parse_fields(ComicEntity, fields)
+        page = listing.fetch(
+            self.session,
+            ComicEntity,
+            ComicEntity.missing == fileMiss,  # noqa: E712
+            top,
+            cursor,
+            columns,
+        )
+        # Directory comics are stored without a size; fill in the ones on
+        # screen first (see dir_size).
+        if not fileMiss:
+            dir_size.filler.prioritize(ComicEntity, page.rows)
+        return listing.respond(page, response, columns is not None)
 
     @router.post(
         "/api/comics/check",
@@ -116,10 +134,13 @@ class ComicCBV:
     )
     def detail(self, id: int):
         comic = self.__get(id)
-        cf = comicfile.create_open(comic.path)
-        if cf is None:
-            abort(404, "Comic file not found")
-        pageDetails = [ComicPageDetailResponse(name=name) for name in cf.namelist]
+        pages = page_index.load(self.session, comic)
+        if pages is None:
+            with comicfile.pool.lease(comic.path) as cf:
+                if cf is None:
+                    abort(404, "Comic file not found")
+                pages = page_index.save(self.session, comic, cf)
+        pageDetails = [ComicPageDetailResponse(name=p["name"]) for p in pages]
         return ComicDetailResponse(pageDetails=pageDetails)
 
     @router.post(
@@ -163,10 +184,14 @@ class ComicCBV:
     def refresh(self, id) -> ComicEntity:
         comic = self.__get(id)
         comic_entity_init = ComicEntity.from_path(pathlib.Path(comic.path), comic.id)
+        # The pooled open handle still points at the old bytes.
+        comicfile.evict(comic.path)
         with comicfile.create(comic.path) as cf:
             comic.page = cf.page
             comic.updateTime = comic_entity_init.updateTime
             ComicLoader.gen_comic_cover(comic, cf)
+            # Re-index from the fresh archive, under the new updateTime.
+            self.session.merge(page_index.build(comic, cf))
             # The cover JPEG is rewritten under the same filename, so bump the
             # version field that the frontend appends to the cover URL — this is
             # what busts the browser/nginx/CDN cache for the regenerated image.
@@ -203,14 +228,11 @@ class ComicCBV:
         new_comic = self.session.exec(new_comic_statement).first()
         if new_comic is not None:
             abort(400, "Comic with same name/path already exists")
-        from cachetools.keys import hashkey
-        cache_key = hashkey(comic.path)
-        if cache_key in comicfile.comic_cache:
-            comicfile.comic_cache[cache_key].close()
-            del comicfile.comic_cache[cache_key]
+        comicfile.evict(comic.path)
         os.rename(comic.path, new_path)
         comic.name = new_name
         comic.path = new_path
+        comic.pathDigest = path_digest(new_path)
         self.session.add(comic)
         self.session.commit()
         return ComicRenameResponse(name=new_name)
@@ -221,10 +243,9 @@ class ComicCBV:
         if comic.favorited:
             abort(400, "Cannot delete favorited comic")
         path = pathlib.Path(comic.path)
-        if path.exists():
-            cf = comicfile.create_open(comic.path)
-            if cf is not None:
-                cf.close()
+        # Release our open handle so the file can actually be removed.
+        comicfile.evict(comic.path)
+        page_index.drop(self.session, id)
 
         if not permanent:
             comic.archived = True
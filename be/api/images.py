@@ -1,9 +1,8 @@
-"""Image API endpoints — in-memory store, populated at bootstrap"""
+"""Image API endpoints — in-memory store, backed by the imageentity table"""
 import datetime
 import os
 import pathlib
 import shutil
-import threading
 import zipfile
 from typing import Dict, List
 
@@ -12,16 +11,28 @@ from fastapi.security import HTTPAuthorizationCredentials
 from core.auth import _bearer, require_auth, require_media_auth
 from fastapi_utils.api_model import APIMessage
 from fastapi_utils.cbv import cbv
-from PIL import Image as PILImage
-from sqlmodel import Session, select
+from sqlmodel import Session, delete, select
 
+import cover_engine
 import db
+import dir_size
 import global_data
-from api.comicpage import PAGE_CACHE_CONTROL, page_etag, resize_to_width
+import page_cache
+from api.comicpage import (
+    PAGE_CACHE_CONTROL,
+    cache_page_variant,
+    cached_page_response,
+    page_etag,
+    resize_to_width,
+)
 from comicfile import allowImgs, mediaTypes
+from image_store import ImageStore, ListingCache
 from core.exceptions import abort
+from core.executors import page_cpu, page_io
+from core.streaming import BytesRangeResponse, FileSpanResponse
 from loader import ComicLoader
-from model import ComicEntity, ImageEntity
+from model import ComicEntity, ImageEntity, path_digest
+from page_cache import variant_key
 from schemas.common import FavorResponse, ProgressRequest, ProgressResponse
 from schemas.image import (
     ImageDetailResponse,
@@ -29,14 +40,14 @@ from schemas.image import (
     ImageRenameRequest,
     ImageRenameResponse,
 )
+from walker import image_leaves
 
 router = APIRouter()
 
 _IMAGE_EXTS = set(allowImgs)
 
-# In-memory store: {id: ImageEntity}
-_store: Dict[int, ImageEntity] = {}
-_store_lock = threading.Lock()
+# In-memory store of the albums, with list order and name/path indexes.
+_store = ImageStore()
 
 
 def _image_files(folder_path: str) -> List[str]:
@@ -54,80 +65,135 @@ def _image_files(folder_path: str) -> List[str]:
     return sorted(names)
 
 
+# Sorted file names per album folder, so paging does not rescan the folder
+# on every request (see image_store.ListingCache).
+_listings = ListingCache(_image_files, global_data.Config.image_listing_ttl)
+
+
 def _gen_cover(entity: ImageEntity, overwrite=False, page=0) -> bool:
     name = f"{entity.id}_0.jpg"
     cover_path = os.path.join(global_data.Config.nginx_image_path, name)
     if overwrite or not os.path.exists(cover_path):
-        files = _image_files(entity.path)
+        files = _listings.get(entity.path)
         if not files or page >= len(files):
             return False
         try:
-            img = PILImage.open(os.path.join(entity.path, files[page]))
-            img.thumbnail((300, 300))
-            img = img.convert("RGB")
-            img.save(cover_path, "JPEG")
+            with open(os.path.join(entity.path, files[page]), "rb") as f:
+                data = cover_engine.engine.encode(f.read())
+            with open(cover_path, "wb") as f:
+                f.write(data)
             return True
         except Exception as ex:
             print("gen image cover fail:", entity.path, ex)
     return False
 
 
-def _leaf_image_dirs(scan_path: str) -> List[str]:
-    """Recursively find pure image folders under scan_path.
+def load():
+    """Fill the store from the albums table, without touching the disk.
 
-    A folder qualifies only if it contains nothing but image files — no
-    subdirectories and no non-image files. This keeps every collected album
-    safe to delete wholesale (it matches the guard in the delete endpoint, so
-    deletion never risks touching unrelated files), and a "mixed" folder
-    (images plus subfolders) yields its pure leaves rather than itself.
-    os.walk does not follow symlinks by default, so symlinked dirs are not
-    descended into (avoids loops). Like comics/videos, the album name is the
-    folder's basename, not its relative path.
+    Runs at startup so the image tab is served right away; the walk in
+    ``bootstrap`` then reconciles it with the folders.
     """
-    leaves = []
-    for root, dirs, files in os.walk(scan_path):
-        if dirs:
-            continue  # has a subfolder -> not a pure leaf
-        exts = [os.path.splitext(f)[1].lower() for f in files]
-        if files and all(ext in _IMAGE_EXTS for ext in exts):
-            leaves.append(root)
-    return sorted(leaves)
+    with Session(db.engine) as session:
+        albums = session.exec(select(ImageEntity).where(ImageEntity.missing == False)).all()  # noqa: E712
+    _store.replace(albums)
+    print(f"[Images] Loaded {len(albums)} image folder(s) from the database")
+
+
+def _save(entity: ImageEntity) -> None:
+    """Write an album changed through the API back to its row."""
+    with Session(db.engine) as session:
+        session.merge(entity)
+        session.commit()
+
+
+def _size_filled(id: int, size: int) -> None:
+    entity = _store.get(id)
+    if entity is not None:
+        entity.size, entity.sizeKnown = size, True
+
+
+def _sync_store(albums: List[ImageEntity]) -> List[ImageEntity]:
+    """Bring the store in line with ``albums`` as read by a walk.
+
+    Albums already in the store keep their live object and take only what
+    the walk owns (page count and updateTime): a favorite, progress or
+    rename committed since the walk read the table is already on that
+    object, and swapping in the older copy would lose it and let the next
+    ``_save`` write it back. Returns the store's objects for ``albums``.
+    """
+    live = []
+    with _store.lock:
+        for album in albums:
+            entity = _store.get(album.id)
+            if entity is None:
+                _store.add(album)
+                entity = album
+            else:
+                entity.page = album.page
+                if entity.updateTime != album.updateTime:
+                    _store.set_update_time(entity, album.updateTime)
+            live.append(entity)
+        for id in set(_store.keys()) - {album.id for album in albums}:
+            _store.remove(id)
+    return live
 
 
 def bootstrap():
-    """Scan image folders and (re)populate the in-memory store."""
-    new_store: Dict[int, ImageEntity] = {}
-    id_counter = 0
-    for scan_path in global_data.Config.Image.scan_pathes:
-        if not os.path.isdir(scan_path):
-            continue
-        try:
-            leaves = _leaf_image_dirs(scan_path)
-        except OSError as e:
-            print(f"Failed to scan {scan_path}: {e}")
-            continue
-        for leaf in leaves:
-            files = _image_files(leaf)
-            if not files:
-                continue
-            id_counter += 1
-            # size is left at 0 here: computing it means a recursive stat() of
-            # every file (see get_dir_size), which makes bootstrap minutes-slow
-            # on large/remote folders. The refresh endpoint fills it on demand.
-            new_store[id_counter] = ImageEntity(
-                id=id_counter,
-                size=0,
-                name=os.path.basename(leaf),
-                path=leaf,
-                updateTime=datetime.datetime.fromtimestamp(os.stat(leaf).st_mtime),
-                page=len(files),
-            )
-
-    with _store_lock:
-        _store.clear()
-        _store.update(new_store)
-
-    print(f"[Images] Loaded {len(new_store)} image folder(s) into memory")
+    """Walk the image folders and reconcile the albums table and store.
+
+    Albums keep their id, favorite, progress and cover across walks; a new
+    folder gets a fresh id, and a folder gone from disk is flagged
+    ``missing`` (like comics and videos) rather than forgotten, so its state
+    comes back with it.
+    """
+    found: Dict[str, tuple] = {}
+    scan_pathes = [p for p in global_data.Config.Image.scan_pathes if os.path.isdir(p)]
+    for leaf in image_leaves(scan_pathes, _IMAGE_EXTS):
+        # The first page request after a restart reuses this listing.
+        _listings.seed(leaf.path, leaf.files, leaf.mtime_ns)
+        found[leaf.path] = (len(leaf.files), datetime.datetime.fromtimestamp(leaf.mtime_ns / 1e9))
+
+    with dir_size.filler.paused(), Session(db.engine) as session:
+        known = {e.path: e for e in session.exec(select(ImageEntity))}
+        ids = iter(db.reserve_ids("imageentity", len(found.keys() - known.keys())))
+        added = changed = gone = 0
+        resized = set()
+        for leaf, (page, update_time) in found.items():
+            entity = known.get(leaf)
+            if entity is None:
+                # size is left at 0 here: computing it means a stat() of every
+                # file, which makes bootstrap minutes-slow on large/remote
+                # folders. dir_size fills it in the background.
+                session.add(ImageEntity(
+                    id=next(ids),
+                    size=0,
+                    sizeKnown=False,
+                    name=os.path.basename(leaf),
+                    path=leaf,
+                    pathDigest=path_digest(leaf),
+                    updateTime=update_time,
+                    page=page,
+                ))
+                added += 1
+                resized.add(leaf)
+            elif entity.missing or entity.page != page or entity.updateTime != update_time:
+                entity.missing, entity.page, entity.updateTime = False, page, update_time
+                changed += 1
+                resized.add(leaf)
+        for path, entity in known.items():
+            if path not in found and not entity.missing:
+                entity.missing = True
+                gone += 1
+        session.commit()
+        albums = session.exec(select(ImageEntity).where(ImageEntity.missing == False)).all()  # noqa: E712
+
+    live = _sync_store(albums)
+    for entity in live:
+        if not entity.sizeKnown or entity.path in resized:
+            dir_size.filler.request(ImageEntity, entity.id, entity.path, on_size=_size_filled)
+
+    print(f"[Images] {len(albums)} image folder(s): {added} new, {changed} changed, {gone} missing")
 
 
 def _get(id: int) -> ImageEntity:
@@ -137,27 +203,62 @@ def _get(id: int) -> ImageEntity:
     return entity
 
 
+def _load_page(entity: ImageEntity, page: int, width: int | None, headers: dict):
+    """The disk side of ``get_page``, run on the page I/O executor.
+
+    Returns the response when the page can be served as is, else the
+    ``(bytes, media_type, variant key)`` to resize.
+    """
+    if width is not None:
+        key = variant_key("images", entity.id, page, entity.updateTime, width)
+        rel = page_cache.cache.get(key)
+        if rel is not None:
+            return cached_page_response(rel, headers)
+    files = _listings.get(entity.path)
+    idx = 0 if page == 0 else page - 1
+    if idx >= len(files):
+        abort(404, "Page not found")
+    img_path = os.path.join(entity.path, files[idx])
+    ext = os.path.splitext(files[idx])[1].lower()
+    media_type = mediaTypes.get(ext, "image/jpeg")
+    # Resizing a GIF would drop animation frames, so serve it untouched; a
+    # page already no wider than ``width`` is served as is too.
+    if width is None or ext == ".gif" or key in page_cache.narrow:
+        try:
+            size = os.stat(img_path).st_size
+        except OSError:
+            abort(404, "Image file not found")
+        return FileSpanResponse(img_path, 0, size, media_type, headers)
+    try:
+        with open(img_path, "rb") as f:
+            content = f.read()
+    except OSError:
+        abort(404, "Image file not found")
+    return content, media_type, key
+
+
 @cbv(router)
 class ImageCBV:
     @router.get("/api/images", tags=["images"])
     def get_all(self, top: int = None, _: None = Depends(require_auth)) -> List[ImageEntity]:
-        entities = sorted(_store.values(), key=lambda e: e.updateTime, reverse=True)
-        if top is not None:
-            entities = entities[:top]
-        return [e.model_dump() for e in entities]
+        albums = _store.newest(top)
+        dir_size.filler.prioritize(ImageEntity, albums, _size_filled)
+        return [e.model_dump() for e in albums]
 
     @router.get("/api/images/{id}", tags=["images"])
     def get(self, id: int, _: None = Depends(require_auth)) -> ImageEntity:
-        return _get(id).model_dump()
+        entity = _get(id)
+        dir_size.filler.prioritize(ImageEntity, [entity], _size_filled)
+        return entity.model_dump()
 
     @router.get("/api/images/{id}/detail", tags=["images"])
     def detail(self, id: int, _: None = Depends(require_auth)) -> ImageDetailResponse:
         entity = _get(id)
-        files = _image_files(entity.path)
+        files = _listings.get(entity.path)
         return ImageDetailResponse(pageDetails=[ImagePageDetailResponse(name=f) for f in files])
 
     @router.get("/api/images/{id}/pages/{page}", tags=["images"])
-    def get_page(
+    async def get_page(
         self,
         id: int,
         page: int,
@@ -176,24 +277,15 @@ class ImageCBV:
         headers = {"cache-control": PAGE_CACHE_CONTROL, "etag": etag}
         if request.headers.get("if-none-match") == etag:
             return Response(status_code=304, headers=headers)
-        files = _image_files(entity.path)
-        idx = 0 if page == 0 else page - 1
-        if idx >= len(files):
-            abort(404, "Page not found")
-        img_path = os.path.join(entity.path, files[idx])
-        try:
-            with open(img_path, "rb") as f:
-                content = f.read()
-        except OSError:
-            abort(404, "Image file not found")
-        ext = os.path.splitext(files[idx])[1].lower()
-        media_type = mediaTypes.get(ext, "image/jpeg")
-        # Resizing a GIF would drop animation frames, so serve it untouched.
-        if width is not None and ext != ".gif":
-            resized = resize_to_width(content, width)
-            if resized is not None:
-                content, media_type = resized
-        return Response(content=content, media_type=media_type, headers=headers)
+        loaded = await page_io.run(_load_page, entity, page, width, headers)
+        if isinstance(loaded, Response):
+            return loaded
+        content, media_type, key = loaded
+        resized = await page_cpu.run(resize_to_width, content, width, key)
+        if resized is not None:
+            content, media_type = resized
+            await page_io.run(cache_page_variant, key, content)
+        return BytesRangeResponse(content, media_type, headers)
 
     @router.put("/api/images/{id}/progress", tags=["images"])
     def update_progress(
@@ -204,6 +296,7 @@ class ImageCBV:
             abort(400, "Position out of range")
         entity.lastViewedPosition = req.position
         entity.lastViewedTime = datetime.datetime.now()
+        _save(entity)
         return ProgressResponse(
             position=entity.lastViewedPosition, lastViewedTime=entity.lastViewedTime
         )
@@ -212,21 +305,26 @@ class ImageCBV:
     def favor(self, id: int, _: None = Depends(require_auth)) -> FavorResponse:
         entity = _get(id)
         entity.favorited = True
+        _save(entity)
         return FavorResponse(favorited=True)
 
     @router.delete("/api/images/{id}/favor", tags=["images"])
     def unfavor(self, id: int, _: None = Depends(require_auth)) -> FavorResponse:
         entity = _get(id)
         entity.favorited = False
+        _save(entity)
         return FavorResponse(favorited=False)
 
     @router.post("/api/images/{id}/refresh", tags=["images"])
     def refresh(self, id: int, _: None = Depends(require_auth)) -> ImageEntity:
         entity = _get(id)
         refreshed = ImageEntity.from_path(pathlib.Path(entity.path), entity.id)
-        entity.page = len(_image_files(entity.path))
-        entity.updateTime = refreshed.updateTime
-        entity.size = refreshed.size
+        _listings.invalidate(entity.path)
+        entity.page = len(_listings.get(entity.path))
+        _store.set_update_time(entity, refreshed.updateTime)
+        # An explicit refresh waits for the real size.
+        entity.size, entity.sizeKnown = dir_size.path_size(entity.path), True
+        _save(entity)
         return entity.model_dump()
 
     @router.post("/api/images/{id}/rename", tags=["images"])
@@ -240,11 +338,12 @@ class ImageCBV:
         new_path = os.path.join(os.path.dirname(entity.path), new_name)
         if os.path.exists(new_path):
             abort(400, "Folder already exists")
-        if any(e.name == new_name for e in _store.values() if e.id != id):
+        if _store.name_taken(new_name, except_id=id):
             abort(400, "Image folder with same name already exists")
         os.rename(entity.path, new_path)
-        entity.name = new_name
-        entity.path = new_path
+        _listings.invalidate(entity.path)
+        _store.rename(entity, new_name, new_path)
+        _save(entity)
         return ImageRenameResponse(name=new_name)
 
     @router.delete("/api/images/{id}/pages/{page}", tags=["images"])
@@ -264,7 +363,7 @@ class ImageCBV:
         entity = _get(id)
         if not os.path.isdir(entity.path):
             abort(404, "Image folder not found in filesystem")
-        files = _image_files(entity.path)
+        files = _listings.get(entity.path)
         idx = page - 1
         if idx >= len(files):
             abort(404, "Page not found")
@@ -277,9 +376,13 @@ class ImageCBV:
             os.remove(os.path.join(entity.path, target))
         except OSError as e:
             abort(500, f"Cannot delete image: {e}")
-        remaining = _image_files(entity.path)
+        _listings.invalidate(entity.path)
+        remaining = _listings.get(entity.path)
         entity.page = len(remaining)
-        entity.updateTime = datetime.datetime.now()
+        _store.set_update_time(entity, datetime.datetime.now())
+        dir_size.filler.request(
+            ImageEntity, entity.id, entity.path, dir_size.VISIBLE, on_size=_size_filled
+        )
         if target == cover_name or cover_name not in remaining:
             # The cover's source image is gone (or unknown): rebuild from the
             # first remaining page and reset the cover pointer.
@@ -290,6 +393,7 @@ class ImageCBV:
             # The cover image survives; its index may have shifted, so keep the
             # pointer aimed at the same file (the JPEG bytes are unchanged).
             entity.coverPosition = remaining.index(cover_name) + 1
+        _save(entity)
         return entity.model_dump()
 
     @router.delete("/api/images/{id}", tags=["images"])
@@ -308,8 +412,11 @@ class ImageCBV:
         if non_image:
             abort(400, f"Folder contains non-image entries: {', '.join(non_image)}")
         shutil.rmtree(entity.path)
-        with _store_lock:
-            _store.pop(entity.id, None)
+        _listings.invalidate(entity.path)
+        _store.remove(entity.id)
+        with Session(db.engine) as session:
+            session.exec(delete(ImageEntity).where(ImageEntity.id == entity.id))
+            session.commit()
         return APIMessage(detail="Deleted")
 
     @router.post("/api/images/{id}/pages/{page}/cover", tags=["images"])
@@ -320,6 +427,7 @@ class ImageCBV:
             entity.coverPosition = page
             # Bump the cover version so the frontend's cache-busting URL changes.
             entity.entityUpdateTime = datetime.datetime.now()
+            _save(entity)
             return Response(status_code=200)
         abort(500)
 
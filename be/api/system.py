@@ -6,6 +6,10 @@ from typing import Dict, List, Literal, Optional
 from fastapi import APIRouter
 from pydantic import BaseModel
 
+import comicfile
+import global_data
+import prefetch
+from core.executors import page_cpu, page_io
 from core.scan_progress import progress
 from tasks.backup import backup_database
 
@@ -20,43 +24,46 @@ router = APIRouter()
 _scan_lock = threading.Lock()
 
 
-def _run_scan(media_type: str):
+def _run_scan(media_type: str, full: bool = False):
     from loader import ComicLoader, VideoLoader
     from api.images import bootstrap as bootstrap_images
 
     results = {}
     try:
-        # Images first: bootstrap is cheap (one readdir per folder) and the
-        # in-memory store is empty until it runs, while comic/video scans can
-        # take a while without leaving the UI empty.
+        # Images first: bootstrap is cheap (one readdir per folder) and new
+        # or removed albums only show up once it runs, while comic/video
+        # scans can take a while without leaving the UI stale.
         if media_type in ("images", "all"):
             progress.set_phase("images", 0)
             bootstrap_images()
             results["images"] = "done"
         if media_type in ("comics", "all"):
-            ComicLoader().work()
+            ComicLoader(full=full).work()
             results["comics"] = "done"
         if media_type in ("videos", "all"):
-            VideoLoader().work()
+            VideoLoader(full=full).work()
             results["videos"] = "done"
         progress.finish({"status": "success", **results})
     except Exception as e:
         progress.finish({"status": "error", "message": str(e)})
 
 
-def start_scan(media_type: str) -> bool:
+def start_scan(media_type: str, full: bool = False) -> bool:
     """Launch a background scan unless one is already running.
 
     Returns True if a scan was started, False if one was already in progress.
     Shared by the HTTP endpoint, the startup scan, and the daily scheduled scan
-    so they all go through the same lock and never run concurrently.
+    so they all go through the same lock and never run concurrently. ``full``
+    re-lists every directory instead of reusing the cached listings of the
+    unchanged ones, which also catches files rewritten in place (see
+    walker.Walker).
     """
     with _scan_lock:
         if progress.running:
             return False
         progress.start(media_type)
 
-    threading.Thread(target=_run_scan, args=(media_type,), daemon=True).start()
+    threading.Thread(target=_run_scan, args=(media_type, full), daemon=True).start()
     return True
 
 
@@ -86,6 +93,13 @@ class ScanTiming(BaseModel):
     slowest: List[SlowFile]
 
 
+class ScanWalk(BaseModel):
+    dirs: int = 0
+    entries: int = 0
+    seconds: float = 0.0
+    dirs_per_sec: float = 0.0
+
+
 class ScanStatusResponse(BaseModel):
     running: bool
     media_type: Optional[str] = None
@@ -93,9 +107,11 @@ class ScanStatusResponse(BaseModel):
     total: int = 0
     processed: int = 0
     reconciled: int = 0
+    refreshed: int = 0
     started_at: Optional[str] = None
     finished_at: Optional[str] = None
     duration_seconds: Optional[float] = None
+    walk: ScanWalk = ScanWalk()
     timing: ScanTiming
     last_result: Optional[dict] = None
 
@@ -109,6 +125,13 @@ class BackupInfo(BaseModel):
     last_backup: Optional[str] = None
     backup_count: int = 0
     cadence_hours: int = 24
+    compress: bool = False
+    # Size of the newest backup file on disk.
+    last_size: Optional[int] = None
+    # The latest backup run in this process, skipped runs aside.
+    last_run_at: Optional[str] = None
+    last_duration_seconds: Optional[float] = None
+    last_error: Optional[str] = None
 
 
 class TasksResponse(BaseModel):
@@ -116,6 +139,39 @@ class TasksResponse(BaseModel):
     backup: BackupInfo
 
 
+class ExecutorStats(BaseModel):
+    workers: int
+    queued: int
+    running: int
+    completed: int
+    peak_queued: int
+
+
+class ExecutorsResponse(BaseModel):
+    page_io: ExecutorStats
+    page_cpu: ExecutorStats
+
+
+class PrefetchResponse(BaseModel):
+    window: int
+    entries: int
+    bytes: int
+    max_bytes: int
+    inflight: int
+    hits: int
+    misses: int
+    evictions: int
+
+
+class ArchivePoolResponse(BaseModel):
+    capacity: int
+    open: int
+    leased: int
+    hits: int
+    misses: int
+    evictions: int
+
+
 # ---------------------------------------------------------------------------
 # Endpoints
 # ---------------------------------------------------------------------------
@@ -131,9 +187,10 @@ def health_check() -> HealthResponse:
 @router.post("/api/system/scan", tags=["system"])
 def trigger_scan(
     media_type: Literal["comics", "videos", "images", "all"] = "all",
+    full: bool = False,
 ) -> ScanResponse:
     """Start a background scan to import new media files into the database."""
-    if not start_scan(media_type):
+    if not start_scan(media_type, full):
         return ScanResponse(status="already_running", message="A scan is already in progress")
     return ScanResponse(status="started", message=f"Scan started for: {media_type}")
 
@@ -148,32 +205,47 @@ def scan_status() -> ScanStatusResponse:
 def tasks_status() -> TasksResponse:
     """Background task health: next scheduled scan and database backup state."""
     from tasks.scan import SCAN_HOUR, _seconds_until
-    from tasks.backup import _get_paths
+    from tasks.backup import _get_paths, last_result, list_backups
 
     next_run = datetime.now() + timedelta(seconds=_seconds_until(SCAN_HOUR))
 
     db_path, backup_dir = _get_paths()
-    db_stem = os.path.splitext(os.path.basename(db_path))[0]
-    backup_ext = os.path.splitext(db_path)[1] or ".db"
-    last_backup = None
-    backup_count = 0
-    if os.path.isdir(backup_dir):
-        backups = [
-            os.path.join(backup_dir, f)
-            for f in os.listdir(backup_dir)
-            if f.startswith(f"{db_stem}_") and f.endswith(backup_ext)
-        ]
-        backup_count = len(backups)
-        if backups:
-            latest = max(backups, key=os.path.getmtime)
-            last_backup = datetime.fromtimestamp(os.path.getmtime(latest)).isoformat()
+    backups = [os.path.join(backup_dir, f) for f in list_backups(db_path, backup_dir)]
+    backup = BackupInfo(backup_count=len(backups), compress=global_data.Config.backup_compress)
+    if backups:
+        latest = max(backups, key=os.path.getmtime)
+        backup.last_backup = datetime.fromtimestamp(os.path.getmtime(latest)).isoformat()
+        backup.last_size = os.path.getsize(latest)
+    last_run = last_result()
+    if last_run is not None:
+        backup.last_run_at = last_run["finished_at"]
+        backup.last_duration_seconds = last_run["duration_seconds"]
+        backup.last_error = last_run["error"]
 
     return TasksResponse(
         daily_scan=DailyScanInfo(scan_hour=SCAN_HOUR, next_run=next_run.isoformat()),
-        backup=BackupInfo(last_backup=last_backup, backup_count=backup_count),
+        backup=backup,
     )
 
 
+@router.get("/api/system/archives", tags=["system"])
+def archive_pool_status() -> ArchivePoolResponse:
+    """Open-archive pool occupancy and hit/miss/eviction counters."""
+    return ArchivePoolResponse(**comicfile.pool.stats())
+
+
+@router.get("/api/system/executors", tags=["system"])
+def executors_status() -> ExecutorsResponse:
+    """Load on the page endpoints' I/O and resize executors."""
+    return ExecutorsResponse(page_io=page_io.stats(), page_cpu=page_cpu.stats())
+
+
+@router.get("/api/system/prefetch", tags=["system"])
+def prefetch_status() -> PrefetchResponse:
+    """Page read-ahead cache occupancy and hit/miss/eviction counters."""
+    return PrefetchResponse(**prefetch.prefetcher.stats())
+
+
 @router.post("/api/debug/backup-now", tags=["system"])
 async def trigger_backup() -> Dict[str, str]:
     try:
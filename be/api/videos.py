@@ -1,13 +1,14 @@
 """Video API endpoints"""
 import os
 from typing import List
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response
 from fastapi_utils.api_model import APIMessage
 from fastapi_utils.cbv import cbv
 from sqlmodel import Session, select
 
 import db
 import global_data
+import listing
 import util
 from core.exceptions import abort
 from model import VideoEntity
@@ -21,17 +22,21 @@ class VideoCBV:
     session: Session = Depends(db.get_session)
 
     @router.get("/api/videos", tags=["videos"])
-    def get_all(self, top: int = None) -> List[VideoEntity]:
+    def get_all(
+        self, response: Response, top: int = None, cursor: str = None, fields: str = None
+    ) -> List[VideoEntity]:
         # Hide videos whose file is gone (flag maintained by the scan reconcile),
         # so an unmounted drive doesn't surface ghost entries.
-        statement = select(VideoEntity).where(
-            VideoEntity.missing == False  # noqa: E712
-        ).order_by(VideoEntity.updateTime.desc())
-        if top is not None:
-            statement = statement.limit(top)
-        video_entities = self.session.exec(statement).all()
-
-        return [v.model_dump() for v in video_entities]
+        columns = listing.parse_fields(VideoEntity, fields)
+        page = listing.fetch(
+            self.session,
+            VideoEntity,
+            VideoEntity.missing == False,  # noqa: E712
+            top,
+            cursor,
+            columns,
+        )
+        return listing.respond(page, response, columns is not None)
 
     def __get(self, id: int) -> VideoEntity:
         statement = select(VideoEntity).where(VideoEntity.id == id)
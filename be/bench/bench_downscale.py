@@ -0,0 +1,92 @@
+"""Benchmark reduced-scale decoding for covers and width-resized pages.
+
+Synthesizes a 2000x3000 manga-style scan (black line art on white, saved as
+JPEG and as grayscale PNG) and times three ways of shrinking it to a 300px
+cover and to an 800px reader width:
+
+* ``full``    — decode at full size, then resize (no draft / reduce at all)
+* ``default`` — Pillow's ``thumbnail`` with its default ``reducing_gap=2.0``
+* ``imaging`` — ``imaging.downscale`` (what the cover engine and page resizer use)
+
+Run from ``be/``::
+
+    python bench/bench_downscale.py [--rounds N]
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from imaging import downscale  # noqa: E402
+
+SOURCE_SIZE = (2000, 3000)
+TARGETS = {"cover 300px": (300, 300), "page 800px": (800, 1200)}
+
+
+def make_page() -> Image.Image:
+    rng = random.Random(1)
+    img = Image.new("RGB", SOURCE_SIZE, (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    for _ in range(3000):
+        x, y = rng.randrange(SOURCE_SIZE[0]), rng.randrange(SOURCE_SIZE[1])
+        end = (x + rng.randrange(-200, 200), y + rng.randrange(-200, 200))
+        draw.line((x, y, *end), fill=(0, 0, 0), width=3)
+    return img
+
+
+def encode(img: Image.Image, fmt: str) -> bytes:
+    out = io.BytesIO()
+    if fmt == "JPEG":
+        img.save(out, "JPEG", quality=90)
+    else:
+        img.convert("L").save(out, "PNG")
+    return out.getvalue()
+
+
+def full(buf: bytes, size):
+    img = Image.open(io.BytesIO(buf))
+    img.load()
+    img.thumbnail(size, reducing_gap=None)
+
+
+def default(buf: bytes, size):
+    Image.open(io.BytesIO(buf)).thumbnail(size)
+
+
+def imaging(buf: bytes, size):
+    downscale(Image.open(io.BytesIO(buf)), size)
+
+
+def timed(fn, buf: bytes, size, rounds: int) -> float:
+    fn(buf, size)  # warm-up
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn(buf, size)
+    return (time.perf_counter() - started) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    page = make_page()
+    print(f"{'source':<6} {'target':<12} {'full':>9} {'default':>9} {'imaging':>9} {'speedup':>8}")
+    for fmt in ("JPEG", "PNG"):
+        buf = encode(page, fmt)
+        for label, size in TARGETS.items():
+            ms = [timed(fn, buf, size, args.rounds) for fn in (full, default, imaging)]
+            print(
+                f"{fmt:<6} {label:<12} {ms[0]:>7.1f}ms {ms[1]:>7.1f}ms {ms[2]:>7.1f}ms"
+                f" {ms[0] / ms[2]:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Benchmark the API's entity-table queries with and without the model indexes.
+
+Seeds a throwaway SQLite database with ``--rows`` comics (default 100k, about
+2% flagged missing), then runs each query the API and loader issue against
+``comicentity`` twice: with the secondary indexes dropped, as on a database
+created before they were declared, and after ``db._ensure_indexes`` has put
+them back. For each it prints the mean latency and SQLite's
+``EXPLAIN QUERY PLAN``.
+
+Run from ``be/``::
+
+    python bench/bench_queries.py [--rows N] [--rounds N]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func, insert, or_
+from sqlmodel import select
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DB_PATH"] = os.path.join(_tmp.name, "bench.sqlite")
+
+import db  # noqa: E402
+from model import ComicEntity  # noqa: E402
+
+PAGE = 50
+EPOCH = datetime(2015, 1, 1)
+
+
+def seed(rows: int) -> None:
+    rng = random.Random(1)
+    batch = []
+    with db.engine.begin() as conn:
+        for i in range(1, rows + 1):
+            batch.append(
+                {
+                    "id": i,
+                    "size": rng.randrange(1 << 20, 1 << 30),
+                    "name": f"comic {i:06d}.zip",
+                    "path": f"/data/comics/{i % 97:02d}/comic {i:06d}.zip",
+                    # Whole minutes, so plenty of rows share an updateTime.
+                    "updateTime": EPOCH + timedelta(minutes=rng.randrange(rows)),
+                    "missing": rng.random() < 0.02,
+                    "archived": rng.random() < 0.01,
+                    "page": rng.randrange(10, 300),
+                }
+            )
+            if len(batch) == 10_000:
+                conn.execute(insert(ComicEntity), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(ComicEntity), batch)
+        conn.exec_driver_sql("ANALYZE")
+
+
+def queries(rows: int) -> dict:
+    c = ComicEntity
+    newest = (c.updateTime.desc(), c.id.desc())
+    # A cursor halfway down the list, as after many "load more" clicks.
+    mid_time, mid_id = EPOCH + timedelta(minutes=rows // 2), rows // 2
+    some_paths = [
+        f"/data/comics/{i % 97:02d}/comic {i:06d}.zip" for i in range(1, rows, rows // 500)
+    ]
+    return {
+        "list first page": select(c).where(c.missing == False)  # noqa: E712
+        .order_by(*newest).limit(PAGE + 1),
+        "list cursor page": select(c).where(
+            c.missing == False,  # noqa: E712
+            c.updateTime <= mid_time,
+            or_(c.updateTime < mid_time, c.id < mid_id),
+        ).order_by(*newest).limit(PAGE + 1),
+        "list fields=name": select(c.id, c.name, c.updateTime).where(c.missing == False)  # noqa: E712
+        .order_by(*newest).limit(PAGE + 1),
+        "list total count": select(func.count()).select_from(c).where(c.missing == False),  # noqa: E712
+        "list fileMiss": select(c).where(c.missing == True).order_by(*newest),  # noqa: E712
+        "loader path lookup": select(c).where(c.path == some_paths[0]),
+        "loader path IN 500": select(c).where(c.path.in_(some_paths)),
+        "rename conflict": select(c).where(
+            or_(c.name == "comic 000042.zip", c.path == "/data/new/comic 000042.zip")
+        ),
+        "reconcile non-archived": select(c).where(c.archived == False),  # noqa: E712
+    }
+
+
+def run(conn, statement, rounds: int) -> tuple[float, str]:
+    captured = {}
+
+    def capture(conn, cursor, sql, params, context, executemany):
+        captured["sql"], captured["params"] = sql, params
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        conn.execute(statement).all()  # warm-up, and the SQL to explain
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        conn.execute(statement).all()
+    ms = (time.perf_counter() - started) / rounds * 1000
+    plan = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + captured["sql"], captured["params"])
+    return ms, "; ".join(row[3] for row in plan)
+
+
+def measure(rows: int, rounds: int) -> dict:
+    with db.engine.connect() as conn:
+        return {label: run(conn, s, rounds) for label, s in queries(rows).items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    seed(args.rows)
+    with db.engine.begin() as conn:
+        for index in ComicEntity.__table__.indexes:
+            index.drop(conn)
+    before = measure(args.rows, args.rounds)
+    db._ensure_indexes()
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    after = measure(args.rows, args.rounds)
+
+    print(f"{args.rows} rows, mean of {args.rounds} rounds")
+    print(f"{'query':<24} {'before':>10} {'after':>10} {'speedup':>8}")
+    for label, (ms_before, _) in before.items():
+        ms_after = after[label][0]
+        print(f"{label:<24} {ms_before:>8.2f}ms {ms_after:>8.2f}ms {ms_before / ms_after:>7.1f}x")
+    print()
+    for label in before:
+        print(label)
+        print("  before:", before[label][1])
+        print("  after: ", after[label][1])
+
+
+if __name__ == "__main__":
+    main()
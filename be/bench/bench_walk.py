@@ -0,0 +1,117 @@
+"""Benchmark the scan walker: a full walk against an incremental one.
+
+Builds a throwaway tree of ``--dirs`` directories holding ``--files`` empty
+archives each, walks it once to record the listings, then walks it again
+with ``full=True`` and incrementally (reusing the listings of the unchanged
+directories). ``os.stat``, ``os.scandir`` and ``DirEntry.stat`` are wrapped
+to count the calls and, with ``--latency``, to sleep that many milliseconds
+per call, standing in for the round trip each one costs on an SMB/NFS mount.
+
+Run from ``be/``::
+
+    python bench/bench_walk.py [--dirs N] [--files N] [--latency MS]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import walker  # noqa: E402
+
+calls = {"stat": 0, "readdir": 0}
+
+
+def slowed_os(latency: float) -> types.SimpleNamespace:
+    """An ``os`` stand-in for the walker whose filesystem calls are counted."""
+
+    def stat(path, *args, **kwargs):
+        calls["stat"] += 1
+        time.sleep(latency)
+        return os.stat(path, *args, **kwargs)
+
+    class Entry:
+        def __init__(self, entry):
+            self._entry = entry
+            self.name, self.path = entry.name, entry.path
+
+        def is_dir(self):
+            return self._entry.is_dir()
+
+        def is_symlink(self):
+            return self._entry.is_symlink()
+
+        def stat(self):
+            calls["stat"] += 1
+            time.sleep(latency)
+            return self._entry.stat()
+
+    class scandir:
+        def __init__(self, path):
+            calls["readdir"] += 1
+            time.sleep(latency)
+            self._it = os.scandir(path)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self._it.close()
+
+        def __iter__(self):
+            return (Entry(e) for e in self._it)
+
+    fake = types.SimpleNamespace(**{name: getattr(os, name) for name in dir(os)})
+    fake.stat, fake.scandir = stat, scandir
+    return fake
+
+
+def build(root: str, dirs: int, files: int) -> None:
+    for d in range(dirs):
+        sub = os.path.join(root, f"series{d // 20:03d}", f"vol{d:04d}")
+        os.makedirs(sub)
+        for f in range(files):
+            open(os.path.join(sub, f"{f:03d}.zip"), "wb").close()
+
+
+def walk(root: str, cache: dict, full: bool, workers: int):
+    """Walk ``root``, keeping ``cache``'s listings current as the loader does."""
+
+    def on_listing(path, listing, modified):
+        if listing is None:
+            cache.pop(path, None)
+        else:
+            cache[path] = listing
+
+    calls.update(stat=0, readdir=0)
+    w = walker.Walker([".zip"], [root], cache, full, workers, on_listing)
+    started = time.perf_counter()
+    found = sum(1 for _ in w)
+    return found, time.perf_counter() - started, dict(calls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dirs", type=int, default=400)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=1.0, help="ms per filesystem call")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    walker.os = slowed_os(args.latency / 1000)
+    with tempfile.TemporaryDirectory() as root:
+        build(root, args.dirs, args.files)
+        cache: dict = {}
+        found, _, _ = walk(root, cache, False, args.workers)
+        print(f"{found} files in {len(cache)} directories, "
+              f"{args.latency:g}ms per call, {args.workers} workers")
+        for label, full in (("full", True), ("incremental", False)):
+            _, seconds, c = walk(root, cache, full, args.workers)
+            print(f"{label:<12} {seconds:>7.2f}s {c['stat']:>7} stats {c['readdir']:>5} readdirs")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ from multiprocessing.pool import ThreadPool
 import click
 from rich.console import Console
 
+import cover_engine
 import global_data
 
 console = Console()
@@ -41,8 +42,19 @@ def update_durations():
         session.commit()
 
 
-def override_cover():
-    p = ThreadPool(8)
+def _use_cover_workers(workers: int | None) -> int:
+    """Resize the cover engine and return a matching reader thread count."""
+    # Must run before the first cover: the engine starts its pool lazily.
+    if workers is not None:
+        cover_engine.engine.workers = workers
+    # One reader thread per encode process, but at least 8 for the archive I/O.
+    return max(cover_engine.engine.workers, 8)
+
+
+@click.command()
+@click.option("--workers", "-w", type=int, help="Cover encode processes (0: in-process).")
+def override_cover(workers: int | None):
+    p = ThreadPool(_use_cover_workers(workers))
     with Session(engine) as session:
         statement = select(ComicEntity)
         entities = session.exec(statement).all()
@@ -57,10 +69,13 @@ def override_cover():
                 progress.update(task, advance=1)
 
             p.map(do, [e for e in entities])
+    cover_engine.engine.shutdown()
 
 
 @click.command()
-def gen_covers():
+@click.option("--workers", "-w", type=int, help="Cover encode processes (0: in-process).")
+def gen_covers(workers: int | None):
+    p = ThreadPool(_use_cover_workers(workers))
     with Session(engine) as session:
         statement = select(ComicEntity).where(not ComicEntity.archived)
         entities = session.exec(statement).all()
@@ -74,6 +89,7 @@ def gen_covers():
 
             p.map(do, [e for e in entities])
             rich.print("Done.")
+    cover_engine.engine.shutdown()
 
 
 @click.command()
@@ -157,9 +173,10 @@ def remove_conflict_names():
 
 @click.command()
 @click.option("--path", "-p", help="Path to load.")
-def load(path: str):
+@click.option("--full", is_flag=True, help="Re-list every directory.")
+def load(path: str, full: bool):
     if not path:
-        ComicLoader().work()
+        ComicLoader(full=full).work()
     else:
         ComicLoader().load(path)
 
@@ -170,6 +187,7 @@ def cli():
 
 
 cli.add_command(gen_covers)
+cli.add_command(override_cover)
 cli.add_command(remove_invalid_entities)
 cli.add_command(remove_invalid_covers)
 cli.add_command(remove_conflict_names)
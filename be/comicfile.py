@@ -1,12 +1,18 @@
 from abc import abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache, partial
 import os
 import pathlib
+import struct
 import threading
-from typing import List
+import time
+from typing import BinaryIO, Callable, Iterator, List
 import zipfile
-from cachetools import TTLCache, cached
 import rarfile
 
+import global_data
+
 allowImgs = [".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif"]
 allowZips = [".zip", ".rar"]
 
@@ -60,34 +66,282 @@ class Comicfile:
             raise Exception("comic file not opened")
         return self._namelist
 
+    @abstractmethod
+    def open_page(self, page) -> tuple[BinaryIO, int] | None:
+        """
+        a readable stream of the page and its size, None if out of range
+        """
+
+    def seed(self, namelist: List[str]):
+        """Use a known page list so ``open`` can skip listing the file."""
+        self._namelist = list(namelist)
+        self._page = len(self._namelist)
+
+    @abstractmethod
+    def page_index(self) -> List[dict]:
+        """
+        where each page lives, in page order (see model.ComicPageIndexEntity)
+        """
+
+
+def _page_info(name: str, offset: int, compress_size: int, size: int, stored: bool) -> dict:
+    return {
+        "name": name,
+        "offset": offset,
+        "compressSize": compress_size,
+        "size": size,
+        "mediaType": mediaTypes.get(os.path.splitext(name)[1].lower(), "image/jpeg"),
+        "stored": stored,
+    }
 
-def create(filepath: str) -> Comicfile | None:
+
+# Fixed part of a zip local file header: signature, 22 bytes we do not need,
+# then the lengths of the file name and extra field that precede the data.
+_ZIP_LOCAL_HEADER = struct.Struct("<4s22xHH")
+
+
+@lru_cache(maxsize=4096)
+def _zip_data_offset(filepath: str, header_offset: int, version: int) -> int | None:
+    # ``version`` (the comic's updateTime) keys out offsets of a rewritten file.
+    with open(filepath, "rb") as f:
+        f.seek(header_offset)
+        header = f.read(_ZIP_LOCAL_HEADER.size)
+    if len(header) != _ZIP_LOCAL_HEADER.size:
+        return None
+    signature, name_len, extra_len = _ZIP_LOCAL_HEADER.unpack(header)
+    if signature != b"PK\x03\x04":
+        return None
+    return header_offset + _ZIP_LOCAL_HEADER.size + name_len + extra_len
+
+
+def stored_span(filepath: str, page: dict, version: int) -> tuple[str, int, int] | None:
+    """Locate a page's raw bytes on disk as ``(path, offset, size)``.
+
+    Only for pages that can be served straight from the file: images of a
+    directory comic and uncompressed, unencrypted zip members. ``page`` is an
+    entry of the persisted page index. Returns None for anything else (rar,
+    compressed members, a header that does not check out), which should go
+    through ``Comicfile.read`` instead.
+    """
+    if not page.get("stored"):
+        return None
+    if os.path.isdir(filepath):
+        return os.path.join(filepath, page["name"]), 0, page["size"]
+    if os.path.splitext(filepath)[1].lower() != ".zip":
+        return None
+    try:
+        offset = _zip_data_offset(filepath, page["offset"], version)
+    except OSError:
+        return None
+    if offset is None:
+        return None
+    return filepath, offset, page["compressSize"]
+
+
+def create(filepath: str, namelist: List[str] | None = None) -> Comicfile | None:
     path = pathlib.Path(filepath)
     if not path.exists():
         return None
     if path.is_dir():
-        return DirectoryComicfile(filepath)
+        comic = DirectoryComicfile(filepath)
     else:
         ext = path.suffix.lower()
         if ext == ".zip":
-            return ZipComicfile(filepath)
+            comic = ZipComicfile(filepath)
         elif ext == ".rar":
-            return RarComicfile(filepath)
+            comic = RarComicfile(filepath)
+        else:
+            return None
+    if namelist:
+        comic.seed(namelist)
+    return comic
 
 
-comic_lock = threading.Lock()
-comic_cache = TTLCache(maxsize=3, ttl=120)
-
-
-@cached(cache=comic_cache, lock=comic_lock)
-def create_open(filepath: str) -> Comicfile | None:
-    comic = create(filepath)
+def create_open(filepath: str, namelist: List[str] | None = None) -> Comicfile | None:
+    comic = create(filepath, namelist)
     if comic:
         comic.open()
         return comic
     return None
 
 
+class _PoolEntry:
+    __slots__ = ("comic", "refs", "last_used", "evicted")
+
+    def __init__(self, comic: Comicfile):
+        self.comic = comic
+        self.refs = 0
+        self.last_used = time.monotonic()
+        # Dropped from the pool while leased: closed by the last release.
+        self.evicted = False
+
+
+class ArchivePool:
+    """LRU pool of open archives shared by the page and detail endpoints.
+
+    Opening a zip/rar means reading its central directory (for rar, spawning
+    unrar), so a reader paging through a comic should reuse one handle rather
+    than reopen per page. Handles are leased: ``lease`` bumps a refcount and
+    an evicted handle is only closed once its last lease is released, so an
+    eviction never pulls a file out from under a request mid-read. Handles
+    idle for longer than ``idle_seconds`` are closed as well, which keeps
+    files on a network share from being held open forever.
+    """
+
+    def __init__(self, capacity: int, idle_seconds: float):
+        self.capacity = max(capacity, 1)
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, _PoolEntry] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @contextmanager
+    def lease(
+        self, filepath: str, namelist: List[str] | None = None
+    ) -> Iterator[Comicfile | None]:
+        """Yield the open archive for ``filepath`` (None if it cannot be opened).
+
+        ``namelist`` (from the persisted page index) spares a fresh open the
+        listing; a handle already in the pool is used as is.
+        """
+        comic, release = self.checkout(filepath, namelist)
+        try:
+            yield comic
+        finally:
+            release()
+
+    def checkout(
+        self, filepath: str, namelist: List[str] | None = None
+    ) -> tuple[Comicfile | None, Callable[[], None]]:
+        """``lease`` for a handle that outlives the calling block, such as one
+        a streamed response reads from; call the returned release once done.
+        """
+        entry = self._acquire(filepath, namelist)
+        if entry is None:
+            return None, lambda: None
+        return entry.comic, partial(self._release, entry)
+
+    def evict(self, filepath: str) -> None:
+        """Drop ``filepath``'s handle; it is closed now or on its last release."""
+        with self._lock:
+            entry = self._entries.pop(filepath, None)
+            to_close = self._retire(entry) if entry is not None else []
+        self._close(to_close)
+
+    def clear(self) -> None:
+        with self._lock:
+            to_close = []
+            while self._entries:
+                _, entry = self._entries.popitem(last=False)
+                to_close += self._retire(entry, count=False)
+        self._close(to_close)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "open": len(self._entries),
+                "leased": sum(1 for e in self._entries.values() if e.refs),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _acquire(self, filepath: str, namelist: List[str] | None) -> _PoolEntry | None:
+        with self._lock:
+            to_close = self._expire()
+            entry = self._entries.get(filepath)
+            if entry is not None:
+                self.hits += 1
+                entry.refs += 1
+                self._entries.move_to_end(filepath)
+        self._close(to_close)
+        if entry is not None:
+            return entry
+
+        # Open outside the lock: it is slow I/O and must not stall other hits.
+        comic = create_open(filepath, namelist)
+        if comic is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.misses += 1
+            entry = self._entries.get(filepath)
+            if entry is not None:
+                # Lost a race with a concurrent open of the same file.
+                duplicate = [comic]
+            else:
+                duplicate = []
+                entry = _PoolEntry(comic)
+                self._entries[filepath] = entry
+            entry.refs += 1
+            self._entries.move_to_end(filepath)
+            to_close = duplicate + self._shrink()
+        self._close(to_close)
+        return entry
+
+    def _release(self, entry: _PoolEntry) -> None:
+        with self._lock:
+            entry.refs -= 1
+            entry.last_used = time.monotonic()
+            to_close = [entry.comic] if entry.evicted and entry.refs == 0 else []
+        self._close(to_close)
+
+    def _retire(self, entry: _PoolEntry, count: bool = True) -> List[Comicfile]:
+        # Caller holds the lock and has already unlinked ``entry``.
+        if count:
+            self.evictions += 1
+        if entry.refs:
+            entry.evicted = True
+            return []
+        return [entry.comic]
+
+    def _shrink(self) -> List[Comicfile]:
+        # Caller holds the lock.
+        to_close = []
+        while len(self._entries) > self.capacity:
+            _, entry = self._entries.popitem(last=False)
+            to_close += self._retire(entry)
+        return to_close
+
+    def _expire(self) -> List[Comicfile]:
+        # Caller holds the lock. Oldest first, so stop at the first fresh one;
+        # a leased entry is skipped, not a stop, or it would pin the idle
+        # ones behind it.
+        to_close = []
+        deadline = time.monotonic() - self.idle_seconds
+        for path, entry in list(self._entries.items()):
+            if entry.refs:
+                continue
+            if entry.last_used > deadline:
+                break
+            del self._entries[path]
+            to_close += self._retire(entry)
+        return to_close
+
+    @staticmethod
+    def _close(comics: List[Comicfile]) -> None:
+        for comic in comics:
+            try:
+                comic.close()
+            except Exception as e:
+                print("close archive failed", e)
+
+
+# Process-wide singleton.
+pool = ArchivePool(
+    global_data.Config.archive_pool_size, global_data.Config.archive_pool_idle_seconds
+)
+
+
+def evict(filepath: str) -> None:
+    """Drop and close the pooled open handle for ``filepath``, if any."""
+    pool.evict(filepath)
+
+
 class ZipRarComicfile(Comicfile):
     def __init__(self, filepath: str):
         self.filepath = filepath
@@ -108,6 +362,12 @@ class ZipRarComicfile(Comicfile):
             return False, None
         return True, self._archive.read(self._namelist[page])
 
+    def open_page(self, page):
+        if page >= self.page:
+            return None
+        info = self._archive.getinfo(self._namelist[page])
+        return self._archive.open(info), info.file_size
+
     def close(self):
         self._opened = False
         if self._archive:
@@ -142,18 +402,47 @@ class ZipRarComicfile(Comicfile):
                 )
             self._page = len(self._namelist)
 
+    def page_index(self) -> List[dict]:
+        return [self._member_info(name) for name in self.namelist]
+
+    @abstractmethod
+    def _member_info(self, name: str) -> dict:
+        pass
+
 
 class ZipComicfile(ZipRarComicfile):
     def open(self):
         self._archive = zipfile.ZipFile(self.filepath)
         super().open()
 
+    def _member_info(self, name: str) -> dict:
+        # header_offset is the member's local header; its data follows the
+        # variable-length name/extra fields, which only that header records.
+        info = self._archive.getinfo(name)
+        return _page_info(
+            name,
+            info.header_offset,
+            info.compress_size,
+            info.file_size,
+            info.compress_type == zipfile.ZIP_STORED and not info.flag_bits & 0x1,
+        )
+
 
 class RarComicfile(ZipRarComicfile):
     def open(self):
         self._archive = rarfile.RarFile(self.filepath)
         super().open()
 
+    def _member_info(self, name: str) -> dict:
+        info = self._archive.getinfo(name)
+        return _page_info(
+            name,
+            info.data_offset,
+            info.compress_size,
+            info.file_size,
+            info.compress_type == rarfile.RAR_M0 and not info.needs_password(),
+        )
+
 
 class DirectoryComicfile(Comicfile):
     def __init__(self, filepath: str):
@@ -167,6 +456,8 @@ class DirectoryComicfile(Comicfile):
         if self._opened:
             return
         self._opened = True
+        if self._namelist is not None:
+            return
         self._valid_entries = filter(
                 lambda x: x.is_file() and os.path.splitext(x.name)[-1] in allowImgs,
                 list(os.scandir(self._filepath)),
@@ -178,6 +469,13 @@ class DirectoryComicfile(Comicfile):
         )
         self._page = len(self._namelist)
 
+    def page_index(self) -> List[dict]:
+        pages = []
+        for name in self.namelist:
+            size = os.stat(os.path.join(self._filepath, name)).st_size
+            pages.append(_page_info(name, 0, size, size, True))
+        return pages
+
     def close(self):
         self._opened = False
 
@@ -197,3 +495,9 @@ class DirectoryComicfile(Comicfile):
             return False, None
         with open(os.path.join(self._filepath, self._namelist[page]), "rb") as f:
             return True, f.read()
+
+    def open_page(self, page):
+        if page >= self._page:
+            return None
+        f = open(os.path.join(self._filepath, self._namelist[page]), "rb")
+        return f, os.fstat(f.fileno()).st_size
@@ -0,0 +1,99 @@
+"""Dedicated executors for the page endpoints.
+
+Sync handlers all share Starlette's default threadpool, so a burst of page
+loads stuck on a slow share (or busy resizing) would leave the list and
+detail endpoints queueing for a thread. The page handlers are async and hand
+their blocking work to these pools instead: archive and disk reads to
+``page_io``, Pillow resizes to ``page_cpu``. Each pool's worker count is its
+concurrency limit; work beyond it waits in the pool's queue, whose depth is
+tracked for /api/system/executors.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+import global_data
+
+T = TypeVar("T")
+
+
+class BoundedExecutor:
+    """A named thread pool that counts queued, running and finished jobs."""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = max(workers, 1)
+        self._lock = threading.Lock()
+        self._pool: ThreadPoolExecutor | None = None
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.peak_queued = 0
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        """Run ``fn(*args)`` on the pool and await its result."""
+        return await asyncio.wrap_future(self._submit(fn, args))
+
+    def call(self, fn: Callable[..., T], *args) -> T:
+        """Run ``fn(*args)`` on the pool and block for its result.
+
+        For threads outside the event loop (the prefetcher), so their work
+        counts against the same limit as the requests'.
+        """
+        return self._submit(fn, args).result()
+
+    def _submit(self, fn: Callable[..., T], args: tuple) -> Future:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix=self.name
+                )
+            pool = self._pool
+            self.queued += 1
+            self.peak_queued = max(self.peak_queued, self.queued)
+        try:
+            future = pool.submit(self._job, fn, args)
+        except RuntimeError:  # the pool was shut down meanwhile
+            self._unqueue()
+            raise
+        # A job cancelled before it started (its request went away, or the
+        # pool shut down) never reaches _job, so take it off the queue here.
+        future.add_done_callback(lambda f: f.cancelled() and self._unqueue())
+        return future
+
+    def _unqueue(self) -> None:
+        with self._lock:
+            self.queued -= 1
+
+    def _job(self, fn: Callable[..., T], args: tuple) -> T:
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "peak_queued": self.peak_queued,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Process-wide singletons.
+page_io = BoundedExecutor("page-io", global_data.Config.page_io_workers)
+page_cpu = BoundedExecutor("page-cpu", global_data.Config.page_cpu_workers)
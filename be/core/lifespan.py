@@ -3,6 +3,11 @@ import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
+import cover_engine
+import dir_size
+import prefetch
+from core.executors import page_cpu, page_io
+
 from tasks.backup import backup_database_loop
 from tasks.scan import daily_scan_loop
 
@@ -19,10 +24,13 @@ async def lifespan(app: FastAPI):
     # files gone from disk get flagged (and hidden from the list API) rather
     # than deleted, so an unmounted external drive never loses its records.
     # The image bootstrap runs here too — it stats every folder, so doing it
-    # synchronously would block startup on large/remote libraries.
+    # synchronously would block startup on large/remote libraries. Until it
+    # finishes, the image store serves the albums persisted by the last one.
     # After this startup scan, the daily_scan_loop task re-runs it at 2:00 AM
-    # local time so the in-memory image store and comic/video tables stay fresh.
+    # local time so the image, comic and video tables stay fresh.
+    from api.images import load as load_images
     from api.system import start_scan
+    load_images()
     start_scan("all")
     print("Background scan started", flush=True)
 
@@ -49,6 +57,12 @@ async def lifespan(app: FastAPI):
     
     # Wait for all tasks to complete cancellation
     await asyncio.gather(*tasks, return_exceptions=True)
+
+    cover_engine.engine.shutdown()
+    prefetch.prefetcher.shutdown()
+    dir_size.filler.shutdown()
+    page_io.shutdown()
+    page_cpu.shutdown()
     
     print("All background tasks stopped", flush=True)
     print("=" * 50)
@@ -34,6 +34,11 @@ class ScanProgress:
         self.total = 0
         self.processed = 0
         self.reconciled = 0
+        self.refreshed = 0
+        # Directory walk throughput: listings done, entries kept, time spent.
+        self.walk_dirs = 0
+        self.walk_entries = 0
+        self.walk_seconds = 0.0
         self.started_at: Optional[datetime] = None
         self.finished_at: Optional[datetime] = None
         self.last_result: Optional[dict] = None
@@ -52,6 +57,10 @@ class ScanProgress:
             self.total = 0
             self.processed = 0
             self.reconciled = 0
+            self.refreshed = 0
+            self.walk_dirs = 0
+            self.walk_entries = 0
+            self.walk_seconds = 0.0
             self.started_at = datetime.now()
             self.finished_at = None
             self._durations = []
@@ -73,10 +82,30 @@ class ScanProgress:
             elif ms > self._slowest[0][0]:
                 heapq.heapreplace(self._slowest, (ms, path))
 
+    def add_total(self, n: int):
+        """Grow the phase total while a streaming walk is still discovering files."""
+        with self._lock:
+            self.total += n
+
+    def add_walked(self, entries: int):
+        """Record one directory listed (or reused from cache) by the walker."""
+        with self._lock:
+            self.walk_dirs += 1
+            self.walk_entries += entries
+
+    def add_walk_time(self, seconds: float):
+        with self._lock:
+            self.walk_seconds += seconds
+
     def add_reconciled(self, n: int):
         with self._lock:
             self.reconciled += n
 
+    def add_refreshed(self, n: int):
+        """Count known files re-parsed because their bytes changed in place."""
+        with self._lock:
+            self.refreshed += n
+
     def finish(self, result: dict):
         with self._lock:
             self.running = False
@@ -113,9 +142,18 @@ class ScanProgress:
                 "total": self.total,
                 "processed": self.processed,
                 "reconciled": self.reconciled,
+                "refreshed": self.refreshed,
                 "started_at": self.started_at.isoformat() if self.started_at else None,
                 "finished_at": self.finished_at.isoformat() if self.finished_at else None,
                 "duration_seconds": duration_seconds,
+                "walk": {
+                    "dirs": self.walk_dirs,
+                    "entries": self.walk_entries,
+                    "seconds": round(self.walk_seconds, 1),
+                    "dirs_per_sec": round(self.walk_dirs / self.walk_seconds, 1)
+                    if self.walk_seconds
+                    else 0.0,
+                },
                 "timing": {
                     "count": count,
                     "avg_ms": round(avg_ms, 1),
@@ -0,0 +1,231 @@
+"""Responses that stream page bytes in chunks, with single-range support"""
+from abc import abstractmethod
+import os
+import re
+import typing
+
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from core.executors import page_io
+
+ZEROCOPY = "http.response.zerocopy"
+
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """Resolve a ``Range`` header to ``(start, end)``, end exclusive.
+
+    Returns None when the whole body should be sent instead: the header is
+    malformed (a last byte before the first included) or asks for several
+    ranges, both of which a server may ignore. Raises RangeNotSatisfiable
+    when the range lies past the end.
+    """
+    match = _RANGE.fullmatch(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes.
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(size - length, 0), size
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    end = min(int(last) + 1, size) if last else size
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+class RangedResponse(Response):
+    """Base for responses of a known ``size`` sent in ``chunk_size`` pieces.
+
+    Handles ``Range`` (a single byte range, answered with 206), ``If-Range``
+    against the response's ETag, and HEAD. Subclasses provide the bytes.
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(
+        self,
+        size: int,
+        media_type: str | None = None,
+        headers: typing.Mapping[str, str] | None = None,
+    ):
+        self.size = size
+        self.status_code = 200
+        self.media_type = media_type
+        self.background = None
+        self.init_headers(headers)
+        self.headers["accept-ranges"] = "bytes"
+        self.headers["content-length"] = str(size)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            start, end = self._resolve_range(Headers(scope=scope))
+        except RangeNotSatisfiable:
+            await self._close()
+            response = Response(status_code=416, headers={"content-range": f"bytes */{self.size}"})
+            return await response(scope, receive, send)
+        try:
+            await self._open()
+            await send(
+                {"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers}
+            )
+            if scope["method"].upper() == "HEAD" or start == end:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+            else:
+                await self._send_body(scope, send, start, end)
+        finally:
+            await self._close()
+
+    def _resolve_range(self, request_headers: Headers) -> tuple[int, int]:
+        header = request_headers.get("range")
+        if header is None:
+            return 0, self.size
+        if_range = request_headers.get("if-range")
+        if if_range is not None and if_range != self.headers.get("etag"):
+            # The client's partial copy is of another version: send it all.
+            return 0, self.size
+        span = parse_range(header, self.size)
+        if span is None:
+            return 0, self.size
+        start, end = span
+        self.status_code = 206
+        self.headers["content-range"] = f"bytes {start}-{end - 1}/{self.size}"
+        self.headers["content-length"] = str(end - start)
+        return start, end
+
+    async def _send_body(self, scope: Scope, send: Send, start: int, end: int) -> None:
+        pos = start
+        while pos < end:
+            chunk = await self._read(pos, min(self.chunk_size, end - pos))
+            if not chunk:
+                # Truncated under us; end the body rather than spin.
+                break
+            pos += len(chunk)
+            await send({"type": "http.response.body", "body": chunk, "more_body": pos < end})
+        if pos < end:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _open(self) -> None:
+        pass
+
+    @abstractmethod
+    async def _read(self, pos: int, n: int) -> bytes:
+        pass
+
+    async def _close(self) -> None:
+        pass
+
+
+class BytesRangeResponse(RangedResponse):
+    """Serve bytes already in memory (e.g. a resized page)."""
+
+    def __init__(self, content: bytes, media_type: str | None = None, headers=None):
+        super().__init__(len(content), media_type, headers)
+        self._view = memoryview(content)
+
+    async def _read(self, pos: int, n: int) -> bytes:
+        return bytes(self._view[pos : pos + n])
+
+
+class FileSpanResponse(RangedResponse):
+    """Serve ``size`` bytes of ``path`` starting at ``offset``.
+
+    Used for image files and for pages stored uncompressed inside an archive:
+    the member is a plain byte span of the zip, so it goes out without being
+    read whole into a bytes object. On a server offering the ASGI zero-copy
+    extension the span is handed over for ``sendfile``; otherwise it is read
+    in ``chunk_size`` pieces on the page I/O executor.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        offset: int,
+        size: int,
+        media_type: str | None = None,
+        headers: typing.Mapping[str, str] | None = None,
+    ):
+        super().__init__(size, media_type, headers)
+        self.path = path
+        self.offset = offset
+        self._file = None
+
+    async def _open(self) -> None:
+        self._file = await page_io.run(open, self.path, "rb", 0)
+
+    async def _send_body(self, scope: Scope, send: Send, start: int, end: int) -> None:
+        if ZEROCOPY in scope.get("extensions", {}):
+            await send(
+                {
+                    "type": ZEROCOPY,
+                    "file": self._file,
+                    "offset": self.offset + start,
+                    "count": end - start,
+                    "more_body": False,
+                }
+            )
+        else:
+            await super()._send_body(scope, send, start, end)
+
+    async def _read(self, pos: int, n: int) -> bytes:
+        return await page_io.run(os.pread, self._file.fileno(), n, self.offset + pos)
+
+    async def _close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class StreamResponse(RangedResponse):
+    """Serve a sequential stream (a decompressing archive member) of known size.
+
+    ``on_close`` runs once the response is done with the stream, sent or not;
+    a range start is reached by reading and discarding up to it.
+    """
+
+    def __init__(
+        self,
+        stream: typing.BinaryIO,
+        size: int,
+        media_type: str | None = None,
+        headers: typing.Mapping[str, str] | None = None,
+        on_close: typing.Callable[[], None] | None = None,
+    ):
+        super().__init__(size, media_type, headers)
+        self._stream = stream
+        self._pos = 0
+        self._on_close = on_close
+
+    async def _read(self, pos: int, n: int) -> bytes:
+        while self._pos < pos:
+            skipped = await page_io.run(self._stream.read, min(self.chunk_size, pos - self._pos))
+            if not skipped:
+                return b""
+            self._pos += len(skipped)
+        chunk = await page_io.run(self._stream.read, n)
+        self._pos += len(chunk)
+        return chunk
+
+    async def _close(self) -> None:
+        stream, self._stream = self._stream, None
+        if stream is None:
+            return
+        try:
+            stream.close()
+        finally:
+            if self._on_close is not None:
+                self._on_close()
@@ -0,0 +1,153 @@
+"""Process-pool cover thumbnail encoding.
+
+Decoding a full-size page, thumbnailing it and re-encoding a JPEG is CPU
+bound, so running it on the loader's threads serializes every cover behind the
+GIL. The engine ships the compressed page bytes to a pool of worker processes
+and gets the encoded JPEG back. Each job has a timeout: a pathological image
+(a decompression bomb, a corrupt stream Pillow loops on) gets its worker
+killed and the pool recycled instead of stalling every cover behind it.
+"""
+import io
+import itertools
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image
+
+import global_data
+from imaging import downscale
+
+THUMBNAIL_MAXSIZE = (300, 300)
+
+
+def encode_cover(buf: bytes) -> bytes:
+    """Thumbnail image bytes into cover JPEG bytes (runs in a worker process)."""
+    img = downscale(Image.open(io.BytesIO(buf)), THUMBNAIL_MAXSIZE)
+    img = img.convert("RGB")
+    out = io.BytesIO()
+    img.save(out, "JPEG")
+    return out.getvalue()
+
+
+# How often a waiting caller checks whether its job has overrun.
+_POLL_SECONDS = 0.2
+
+# Set in each worker process by _init_worker: the pool's shared table of
+# (job token, pid, start time) triples, and this worker's row in it.
+_started = None
+_slot = 0
+
+
+def _init_worker(started, next_slot) -> None:
+    global _started, _slot
+    with next_slot.get_lock():
+        _slot = next_slot.value % (len(started) // 3)
+        next_slot.value += 1
+    _started = started
+
+
+def _run_job(token: int, fn, args):
+    """Note that job ``token`` started, and where, then run it."""
+    with _started.get_lock():
+        _started[_slot * 3:_slot * 3 + 3] = [token, os.getpid(), time.monotonic()]
+    return fn(*args)
+
+
+class CoverEngine:
+    """Run cover encodes on a lazily started process pool.
+
+    ``workers <= 0`` disables the pool and encodes on the calling thread.
+    A job's timeout runs from when a worker picks it up, not from when it was
+    queued behind the others.
+    """
+
+    def __init__(self, workers: int, timeout: float):
+        self.workers = workers
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pool: ProcessPoolExecutor | None = None
+        self._started = None  # the pool's job start table, see _run_job
+        self._tokens = itertools.count(1)
+
+    def encode(self, buf: bytes) -> bytes:
+        return self.run(encode_cover, buf)
+
+    def run(self, fn, *args):
+        """Call ``fn(*args)`` in a worker; raises TimeoutError past the timeout."""
+        if self.workers <= 0:
+            return fn(*args)
+        for _ in range(2):
+            pool, started = self._get_pool()
+            token = next(self._tokens)
+            try:
+                future = pool.submit(_run_job, token, fn, args)
+            except RuntimeError:
+                # Shut down or broken by another job's recycle; retry once on
+                # the fresh pool.
+                self._recycle(pool)
+                continue
+            try:
+                return self._wait(pool, started, future, token)
+            except BrokenProcessPool:
+                # Another job's timeout killed a worker under us; retry once.
+                self._recycle(pool)
+        raise BrokenProcessPool("cover pool broke twice in a row")
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _wait(self, pool: ProcessPoolExecutor, started, future, token: int):
+        while True:
+            try:
+                return future.result(timeout=_POLL_SECONDS)
+            except FutureTimeoutError:
+                pass
+            with started.get_lock():
+                table = started[:]
+            for i in range(0, len(table), 3):
+                if table[i] == token:
+                    if time.monotonic() - table[i + 2] > self.timeout:
+                        self._recycle(pool, int(table[i + 1]))
+                        raise TimeoutError(f"cover job exceeded {self.timeout}s")
+                    break
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn, not fork: the scan and the web server are threaded,
+                # and forking a threaded process can deadlock the child.
+                ctx = multiprocessing.get_context("spawn")
+                self._started = ctx.Array("d", self.workers * 3)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=ctx,
+                    initializer=_init_worker,
+                    initargs=(self._started, ctx.Value("i", 0)),
+                )
+            return self._pool, self._started
+
+    def _recycle(self, pool: ProcessPoolExecutor, stuck_pid: int | None = None):
+        """Drop ``pool`` for a fresh one, killing the worker stuck on a job."""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        if stuck_pid is not None:
+            # Shutting the pool down does not stop a job that is running.
+            try:
+                os.kill(stuck_pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+            except OSError:
+                pass  # already gone
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Process-wide singleton.
+engine = CoverEngine(global_data.Config.cover_workers, global_data.Config.cover_timeout)
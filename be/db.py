@@ -1,11 +1,50 @@
 import os
 from typing import Generator
+from sqlalchemy import Engine, event
 from sqlmodel import SQLModel, create_engine, Session
 
 import model
 
 _db_path = os.environ.get("DB_PATH", "prod.sqlite")
-engine = create_engine(f"sqlite:///{_db_path}", echo=False)
+# Connection tuning (see _configure_connection). WAL lets the list and page
+# handlers keep reading while a scan commits; NORMAL sync is durable across
+# app crashes under WAL (only a power loss can drop the last commits).
+_journal_mode = os.environ.get("DB_JOURNAL_MODE", "WAL")
+_synchronous = os.environ.get("DB_SYNCHRONOUS", "NORMAL")
+_mmap_size = int(os.environ.get("DB_MMAP_MB", "256")) * 1024 * 1024
+# How long a writer waits for another writer's lock before "database is locked".
+_busy_timeout_ms = int(os.environ.get("DB_BUSY_TIMEOUT_MS", "10000"))
+_pool_size = int(os.environ.get("DB_POOL_SIZE", "10"))
+_pool_overflow = int(os.environ.get("DB_POOL_OVERFLOW", "30"))
+
+
+def _configure_connection(dbapi_connection, _connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={_journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={_synchronous}")
+        cursor.execute(f"PRAGMA mmap_size={_mmap_size}")
+        cursor.execute(f"PRAGMA busy_timeout={_busy_timeout_ms}")
+    finally:
+        cursor.close()
+
+
+def create_sqlite_engine(path: str) -> Engine:
+    """An engine on the SQLite file at ``path`` with the tuned pragmas applied
+    to every new connection and a pool sized for the request threads, the
+    page executors and the scan sharing it."""
+    engine = create_engine(
+        f"sqlite:///{path}",
+        echo=False,
+        pool_size=_pool_size,
+        max_overflow=_pool_overflow,
+        connect_args={"timeout": _busy_timeout_ms / 1000},
+    )
+    event.listen(engine, "connect", _configure_connection)
+    return engine
+
+
+engine = create_sqlite_engine(_db_path)
 SQLModel.metadata.create_all(engine)
 
 
@@ -28,6 +67,50 @@ def _ensure_column(table: str, column: str, ddl: str) -> None:
 # Backfill columns added after the initial schema (see model.FileEntity).
 _ensure_column("comicentity", "missing", "missing BOOLEAN NOT NULL DEFAULT 0")
 _ensure_column("videoentity", "missing", "missing BOOLEAN NOT NULL DEFAULT 0")
+_ensure_column("comicentity", "pathDigest", "pathDigest INTEGER")
+_ensure_column("videoentity", "pathDigest", "pathDigest INTEGER")
+# Comic and video sizes were always computed up front; image albums were
+# stored with size 0, so theirs start out unknown and get filled in.
+_ensure_column("comicentity", "sizeKnown", "sizeKnown BOOLEAN NOT NULL DEFAULT 1")
+_ensure_column("videoentity", "sizeKnown", "sizeKnown BOOLEAN NOT NULL DEFAULT 1")
+_ensure_column("imageentity", "sizeKnown", "sizeKnown BOOLEAN NOT NULL DEFAULT 0")
+
+
+def _ensure_indexes() -> None:
+    """Create the indexes declared on the models that the database lacks.
+
+    Like columns, ``create_all`` only builds indexes together with a new table,
+    so a deployed database would never get ones added to an existing model.
+    ``checkfirst`` makes this a no-op once they exist.
+    """
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
+_ensure_indexes()
+
+
+def reserve_ids(table: str, count: int) -> range:
+    """Reserve ``count`` consecutive unused ids of ``table``.
+
+    Atomic across threads and processes: the UPDATE takes the write lock.
+    Never returns ids at or below the table's current maximum, so rows
+    inserted with explicit ids (or before the sequence existed) are skipped.
+    """
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO idsequenceentity (name, next) VALUES (?, 1) ON CONFLICT DO NOTHING",
+            (table,),
+        )
+        end = conn.exec_driver_sql(
+            f"UPDATE idsequenceentity"
+            f" SET next = max(next, (SELECT coalesce(max(id), 0) + 1 FROM {table})) + ?"
+            f" WHERE name = ? RETURNING next",
+            (count, table),
+        ).scalar_one()
+    return range(end - count, end)
 
 
 def get_session() -> Generator[Session, None, None]:
@@ -0,0 +1,96 @@
+"""The scan walker's directory listings, kept between scans (see
+``model.ScanDirEntity`` and ``walker.Walker``).
+
+A scan never holds the whole cache: the walker looks each directory up as it
+reaches it, and the listings that changed are written back in batches while
+the walk goes on. Listings that flagged a modified file are held back until
+``flush_modified``, which the loader calls once it has refreshed those
+entities — if the run dies first, the next scan still compares against the
+old signatures and redoes the refresh.
+"""
+import json
+import os
+from typing import Dict, List
+
+from sqlalchemy import and_, delete, or_, select
+from sqlalchemy.dialects.sqlite import insert
+
+import db
+from model import ScanDirEntity
+
+# Changed listings written per transaction.
+_BATCH = 500
+
+
+class DirCache:
+    """``scope``'s cached listings, read one directory at a time."""
+
+    def __init__(self, scope: str):
+        self.scope = scope
+        # path -> (mtime_ns, entries), or None to drop it and everything under it
+        self._pending: Dict[str, tuple | None] = {}
+        self._held: Dict[str, tuple] = {}
+
+    def get(self, path: str) -> tuple | None:
+        """The cached ``(mtime_ns, entries)`` of ``path``; safe from any thread."""
+        with db.engine.connect() as conn:
+            row = conn.execute(
+                select(ScanDirEntity.mtime, ScanDirEntity.entries).where(
+                    ScanDirEntity.scope == self.scope, ScanDirEntity.path == path
+                )
+            ).first()
+        return None if row is None else (row[0], json.loads(row[1]))
+
+    def record(self, path: str, listing: tuple | None, modified: List[str]) -> None:
+        """The walker's ``on_listing``: queue ``path``'s new listing for writing."""
+        if modified:
+            self._held[path] = listing
+            return
+        self._pending[path] = listing
+        if len(self._pending) >= _BATCH:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the queued listings, except the held-back ones."""
+        pending, self._pending = self._pending, {}
+        self._write(pending)
+
+    def flush_modified(self) -> None:
+        """Write everything, including listings that flagged modified files."""
+        self.flush()
+        held, self._held = self._held, {}
+        self._write(held)
+
+    def _write(self, listings: Dict[str, tuple | None]) -> None:
+        if not listings:
+            return
+        table = ScanDirEntity.__table__
+        rows = [
+            {"scope": self.scope, "path": path, "mtime": listing[0], "entries": json.dumps(listing[1])}
+            for path, listing in listings.items()
+            if listing is not None
+        ]
+        upsert = insert(table)
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[table.c.scope, table.c.path],
+            set_={"mtime": upsert.excluded.mtime, "entries": upsert.excluded.entries},
+        )
+        with db.engine.begin() as conn:
+            for path, listing in listings.items():
+                if listing is None:
+                    # The directory and its subtree: "<path>/" up to "<path>0",
+                    # the next character after the separator, as a range on the key.
+                    conn.execute(
+                        delete(table).where(
+                            table.c.scope == self.scope,
+                            or_(
+                                table.c.path == path,
+                                and_(
+                                    table.c.path >= path + os.sep,
+                                    table.c.path < path + chr(ord(os.sep) + 1),
+                                ),
+                            ),
+                        )
+                    )
+            if rows:
+                conn.execute(upsert, rows)
@@ -0,0 +1,213 @@
+"""Directory sizes, filled in by background workers.
+
+A directory comic's or image album's size is the sum of every file under it:
+one stat per file, which on a large or network-mounted library turns a scan
+into minutes of waiting. Scans therefore store directories with size 0 and
+``sizeKnown`` false and hand them to ``filler``, whose workers add the sizes up from scandir entries
+and write them back to the entity rows in batches. Entities a client is
+looking at jump the queue, so the grid fills in first.
+"""
+import heapq
+import itertools
+import os
+import stat
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import bindparam, update
+
+import db
+import global_data
+
+# Queue priorities, lowest first.
+VISIBLE = 0  # returned by a list or detail request
+SCAN = 1  # stored or changed by a scan
+
+# Results are written once this many are waiting, after this many seconds,
+# or whenever the queue runs dry.
+_FLUSH_ROWS = 200
+_FLUSH_SECONDS = 1.0
+
+OnSize = Callable[[int, int], None]  # (entity id, size)
+
+
+def path_size(path: str) -> int:
+    """Total size of the files under ``path``, or a plain file's own size.
+
+    Symlinked directories are not descended into (like the walker); a
+    symlinked file counts its target. Unreadable entries count as 0.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return 0
+    if not stat.S_ISDIR(st.st_mode):
+        return st.st_size
+    total = 0
+    todo = [path]
+    while todo:
+        try:
+            with os.scandir(todo.pop()) as it:
+                for e in it:
+                    try:
+                        if e.is_dir():
+                            if not e.is_symlink():
+                                todo.append(e.path)
+                        else:
+                            # Free on Windows (it comes with the listing).
+                            total += e.stat().st_size
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+    return total
+
+
+class SizeFiller:
+    """Priority queue of ``(entity_cls, id)`` whose ``size`` needs computing."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[int, int, tuple]] = []
+        # (entity_cls, id) -> (priority, path, on_size) while queued
+        self._queued: Dict[tuple, Tuple[int, str, OnSize | None]] = {}
+        self._seq = itertools.count()
+        self._results: List[tuple] = []
+        self._results_since = 0.0
+        self._busy = 0
+        self._threads: List[threading.Thread] = []
+        self._stopped = False
+        self._paused = 0
+
+    def request(
+        self, entity_cls, id: int, path: str, priority: int = SCAN, on_size: OnSize | None = None
+    ) -> None:
+        """Queue ``id``'s size, unless it is already queued at this priority
+        or better. ``on_size`` runs once the size is stored."""
+        key = (entity_cls, id)
+        with self._cond:
+            if self._stopped:
+                return
+            queued = self._queued.get(key)
+            if queued is not None and queued[0] <= priority:
+                return
+            # A worse-priority heap entry left behind is skipped when popped.
+            self._queued[key] = (priority, path, on_size)
+            heapq.heappush(self._heap, (priority, next(self._seq), key))
+            if len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name="size-filler", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+            self._cond.notify()
+
+    def prioritize(self, entity_cls, rows, on_size: OnSize | None = None) -> None:
+        """Move the rows a client was just sent and still lack a size to the
+        front of the queue. ``rows`` are entities or projected dicts."""
+        for row in rows:
+            get = row.get if isinstance(row, dict) else lambda f, r=row: getattr(r, f, None)
+            if get("sizeKnown") is False and get("path"):
+                self.request(entity_cls, get("id"), get("path"), VISIBLE, on_size)
+
+    @contextmanager
+    def paused(self):
+        """Hold back writes (sizes are still computed) for the duration.
+
+        Scans wrap their database work in this. A scan transaction that read
+        before it writes cannot wait out a commit made in between: SQLite
+        fails it with "database is locked" at once instead.
+        """
+        with self._cond:
+            self._paused += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._paused -= 1
+                self._cond.notify_all()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Block until every queued size is computed and stored."""
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not self._queued and not self._busy and not self._results, timeout
+            )
+
+    def shutdown(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._heap.clear()
+            self._queued.clear()
+            self._cond.notify_all()
+
+    def _pop(self):
+        # Caller holds the lock.
+        while self._heap:
+            priority, _, key = heapq.heappop(self._heap)
+            queued = self._queued.get(key)
+            if queued is not None and queued[0] == priority:
+                del self._queued[key]
+                return key, queued[1], queued[2]
+        return None
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    job = None if self._stopped else self._pop()
+                    can_store = bool(self._results) and not self._paused
+                    if job is not None or can_store:
+                        break
+                    if self._stopped:
+                        return
+                    self._cond.wait()
+                batch = []
+                if can_store and (
+                    job is None
+                    or len(self._results) >= _FLUSH_ROWS
+                    or time.monotonic() - self._results_since >= _FLUSH_SECONDS
+                ):
+                    batch, self._results = self._results, []
+                self._busy += 1
+            try:
+                if batch:
+                    self._store(batch)
+                if job is not None:
+                    (entity_cls, id), path, on_size = job
+                    size = path_size(path)
+                    with self._cond:
+                        if not self._results:
+                            self._results_since = time.monotonic()
+                        self._results.append((entity_cls, id, size, on_size))
+            finally:
+                with self._cond:
+                    self._busy -= 1
+                    self._cond.notify_all()
+
+    def _store(self, batch: List[tuple]) -> None:
+        by_cls: Dict[type, list] = {}
+        for entity_cls, id, size, _ in batch:
+            by_cls.setdefault(entity_cls, []).append({"row_id": id, "new_size": size})
+        try:
+            with db.engine.begin() as conn:
+                for entity_cls, params in by_cls.items():
+                    conn.execute(
+                        update(entity_cls)
+                        .where(entity_cls.id == bindparam("row_id"))
+                        .values(size=bindparam("new_size"), sizeKnown=True),
+                        params,
+                    )
+        except Exception as ex:
+            # Still unknown in the table: the next scan, or the next request
+            # listing them, queues them again.
+            print("size fill fail:", ex)
+            return
+        for _, id, size, on_size in batch:
+            if on_size is not None:
+                on_size(id, size)
+
+
+# Process-wide singleton.
+filler = SizeFiller(global_data.Config.size_workers)
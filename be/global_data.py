@@ -19,6 +19,37 @@ class Config:
     nginx_video_path = os.path.join(_cache_base, "videos")
     nginx_comic_path = os.path.join(_cache_base, "comics")
     nginx_image_path = os.path.join(_cache_base, "images")
+    # Width-resized page variants (see page_cache). When nginx fronts the API,
+    # PAGE_CACHE_ACCEL names the internal location aliasing this directory and
+    # hits are handed to nginx via X-Accel-Redirect; empty serves them directly.
+    page_cache_path = os.path.join(_cache_base, "pages")
+    page_cache_max_bytes = int(os.environ.get("PAGE_CACHE_MAX_MB", "1024")) * 1024 * 1024
+    page_cache_accel = os.environ.get("PAGE_CACHE_ACCEL", "")
+    # Concurrent directory listings during a scan; each is a round trip on a
+    # network mount, so this is worth raising for high-latency shares.
+    scan_walk_workers = int(os.environ.get("SCAN_WALK_WORKERS", "8"))
+    # Threads adding up directory comic / image album sizes in the background
+    # (see dir_size).
+    size_workers = int(os.environ.get("SIZE_WORKERS", "2"))
+    # Cover encoding process pool (see cover_engine); 0 encodes in-process.
+    cover_workers = int(os.environ.get("COVER_WORKERS", os.cpu_count() or 1))
+    cover_timeout = float(os.environ.get("COVER_TIMEOUT", "30"))
+    # Open archives kept for page reads (see comicfile.ArchivePool); handles
+    # idle longer than the timeout are closed.
+    archive_pool_size = int(os.environ.get("ARCHIVE_POOL_SIZE", "16"))
+    archive_pool_idle_seconds = float(os.environ.get("ARCHIVE_POOL_IDLE", "300"))
+    # Page endpoint executors (see core.executors): archive/disk reads and
+    # Pillow resizes each get their own bounded pool.
+    page_io_workers = int(os.environ.get("PAGE_IO_WORKERS", "16"))
+    page_cpu_workers = int(os.environ.get("PAGE_CPU_WORKERS", os.cpu_count() or 1))
+    # Pages read ahead after each comic page request (see prefetch); 0 disables.
+    prefetch_pages = int(os.environ.get("PREFETCH_PAGES", "3"))
+    prefetch_max_bytes = int(os.environ.get("PREFETCH_MAX_MB", "128")) * 1024 * 1024
+    # Seconds an image album's cached file list is trusted before its folder
+    # mtime is checked again (see image_store.ListingCache).
+    image_listing_ttl = float(os.environ.get("IMAGE_LISTING_TTL", "5"))
+    # Gzip the daily database backups (see tasks.backup).
+    backup_compress = os.environ.get("BACKUP_COMPRESS", "0") == "1"
 
     class Comic:
         scan_pathes = [os.environ.get("COMIC_SCAN_PATH", "/data/comics")]
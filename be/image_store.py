@@ -0,0 +1,211 @@
+"""In-memory index of the image albums (see api.images).
+
+Albums are kept in the ``imageentity`` table, which ``api.images.load()``
+reads once at startup; after that every image request reads this store, not
+the database. On top of the id map it keeps the newest-first order the list
+endpoint returns, maintained incrementally rather than re-sorted per request,
+and name and path indexes for the rename conflict check and path lookups.
+Every change goes through the store's lock, so a reader never sees the map
+and the indexes out of step. ``ListingCache`` keeps each album's sorted file
+list alongside.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Mapping, Set, Tuple
+
+from model import ImageEntity, path_digest
+
+# Sort key: ascending order of these is oldest first; ties on updateTime
+# list the lower id first once reversed.
+_OrderKey = Tuple[datetime, int]
+
+
+def _order_key(entity: ImageEntity) -> _OrderKey:
+    return entity.updateTime, -entity.id
+
+
+class ImageStore:
+    """``{id: ImageEntity}`` with a maintained newest-first order and
+    name -> ids and path -> id indexes.
+
+    Mutate entities' ``updateTime``, ``name`` and ``path`` only through
+    ``set_update_time`` and ``rename``; the other fields are free to change
+    in place.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._by_id: Dict[int, ImageEntity] = {}
+        self._order: List[_OrderKey] = []
+        self._by_name: Dict[str, Set[int]] = {}
+        self._by_path: Dict[str, int] = {}
+
+    # -- reads ---------------------------------------------------------------
+
+    def get(self, id: int) -> ImageEntity | None:
+        return self._by_id.get(id)
+
+    def __getitem__(self, id: int) -> ImageEntity:
+        return self._by_id[id]
+
+    def __contains__(self, id: int) -> bool:
+        return id in self._by_id
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def keys(self) -> List[int]:
+        with self.lock:
+            return list(self._by_id)
+
+    def values(self) -> List[ImageEntity]:
+        with self.lock:
+            return list(self._by_id.values())
+
+    def newest(self, top: int | None = None) -> List[ImageEntity]:
+        """Albums by ``updateTime``, newest first; the first ``top`` if given."""
+        with self.lock:
+            n = len(self._order) if top is None else max(min(top, len(self._order)), 0)
+            keys = self._order[len(self._order) - n :]
+            return [self._by_id[-neg_id] for _, neg_id in reversed(keys)]
+
+    def name_taken(self, name: str, except_id: int | None = None) -> bool:
+        with self.lock:
+            ids = self._by_name.get(name, ())
+            return any(id != except_id for id in ids)
+
+    def id_for_path(self, path: str) -> int | None:
+        return self._by_path.get(path)
+
+    # -- writes --------------------------------------------------------------
+
+    def add(self, entity: ImageEntity) -> None:
+        """Insert ``entity``, replacing any album with the same id."""
+        with self.lock:
+            self._remove(entity.id)
+            self._by_id[entity.id] = entity
+            insort(self._order, _order_key(entity))
+            self._by_name.setdefault(entity.name, set()).add(entity.id)
+            self._by_path[entity.path] = entity.id
+
+    def remove(self, id: int) -> ImageEntity | None:
+        with self.lock:
+            return self._remove(id)
+
+    def replace(self, entities: Iterable[ImageEntity]) -> None:
+        """Swap the whole contents for ``entities`` in one step."""
+        fresh = ImageStore()
+        for entity in entities:
+            fresh.add(entity)
+        with self.lock:
+            self._by_id, self._order = fresh._by_id, fresh._order
+            self._by_name, self._by_path = fresh._by_name, fresh._by_path
+
+    def set_update_time(self, entity: ImageEntity, when: datetime) -> None:
+        with self.lock:
+            self._unorder(entity)
+            entity.updateTime = when
+            insort(self._order, _order_key(entity))
+
+    def rename(self, entity: ImageEntity, name: str, path: str) -> None:
+        with self.lock:
+            self._unname(entity)
+            entity.name, entity.path = name, path
+            entity.pathDigest = path_digest(path)
+            self._by_name.setdefault(name, set()).add(entity.id)
+            self._by_path[path] = entity.id
+
+    # dict-style helpers, for callers (and tests) that treat it as a mapping.
+
+    def clear(self) -> None:
+        self.replace(())
+
+    def update(self, entities: Mapping[int, ImageEntity]) -> None:
+        with self.lock:
+            for entity in entities.values():
+                self.add(entity)
+
+    # -- internals (caller holds the lock) -------------------------------------
+
+    def _remove(self, id: int) -> ImageEntity | None:
+        entity = self._by_id.pop(id, None)
+        if entity is not None:
+            self._unorder(entity)
+            self._unname(entity)
+        return entity
+
+    def _unorder(self, entity: ImageEntity) -> None:
+        key = _order_key(entity)
+        i = bisect_left(self._order, key)
+        if i < len(self._order) and self._order[i] == key:
+            del self._order[i]
+
+    def _unname(self, entity: ImageEntity) -> None:
+        ids = self._by_name.get(entity.name)
+        if ids is not None:
+            ids.discard(entity.id)
+            if not ids:
+                del self._by_name[entity.name]
+        if self._by_path.get(entity.path) == entity.id:
+            del self._by_path[entity.path]
+
+
+class ListingCache:
+    """Sorted image file names per album folder, re-read only when it changes.
+
+    Paging through an album asks for its file list on every page. Within
+    ``ttl`` seconds of the last check the cached list is returned as is;
+    after that one ``stat`` of the folder tells whether its mtime moved (an
+    entry was added, removed or renamed), and only then is it listed again.
+    Holds at most ``capacity`` albums, least recently used out first.
+    """
+
+    def __init__(self, list_files: Callable[[str], List[str]], ttl: float, capacity: int = 4096):
+        self._list_files = list_files
+        self.ttl = ttl
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        # path -> (files, folder st_mtime_ns, monotonic time of last check)
+        self._entries: OrderedDict[str, Tuple[List[str], int, float]] = OrderedDict()
+
+    def get(self, path: str) -> List[str]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None:
+                self._entries.move_to_end(path)
+                if now - entry[2] < self.ttl:
+                    return entry[0]
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            self.invalidate(path)
+            return self._list_files(path)
+        if entry is not None and entry[1] == mtime:
+            files = entry[0]
+        else:
+            # Stat first, list second: a change landing in between shows up
+            # as a newer mtime on the next check.
+            files = self._list_files(path)
+        self.seed(path, files, mtime, now)
+        return files
+
+    def seed(self, path: str, files: List[str], mtime_ns: int, checked: float | None = None) -> None:
+        """Record a listing taken elsewhere (e.g. by the bootstrap walk)."""
+        with self._lock:
+            self._entries[path] = (files, mtime_ns, time.monotonic() if checked is None else checked)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, path: str) -> None:
+        with self._lock:
+            self._entries.pop(path, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,27 @@
+"""Fast downscaling shared by cover generation and width-resized pages.
+
+Both shrink scans that are far larger than the output (2000x3000 pages to a
+300px cover or a phone-width page), so the decode dominates. JPEGs can be
+decoded at 1/2, 1/4 or 1/8 scale straight from the DCT coefficients
+(``Image.draft``) and other formats block-averaged with ``Image.reduce``
+before the final resample; Pillow's ``thumbnail`` does both, steered by
+``reducing_gap``.
+"""
+from PIL import Image
+
+# How much larger than the target the reduced decode must stay before the
+# final resample. Pillow's default of 2.0 decodes a 2000px-wide JPEG at full
+# size for an 800px page; 1.0 lets libjpeg's scaled IDCT do most of the work
+# (about twice as fast, see bench/bench_downscale.py) with no visible loss at
+# these sizes.
+REDUCING_GAP = 1.0
+
+
+def downscale(img: Image.Image, size: tuple[int, int]) -> Image.Image:
+    """Shrink ``img`` in place to fit within ``size``, keeping the aspect ratio.
+
+    ``img`` must not be loaded yet (fresh from ``Image.open``), otherwise the
+    reduced-scale JPEG decode no longer applies.
+    """
+    img.thumbnail(size, reducing_gap=REDUCING_GAP)
+    return img
@@ -1,86 +1,277 @@
 from abc import abstractmethod
-import io
+from contextlib import contextmanager
+from datetime import datetime
+import json
 from multiprocessing.pool import ThreadPool
 import os
 import pathlib
+import queue
 import subprocess
 import time
-from typing import List
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
 import threading
 
-from sqlalchemy import func
+from sqlalchemy import Column, MetaData, String, Table, text, update
 from sqlmodel import Session, select
 from rich.progress import Progress
-from PIL import Image
 
 from comicfile import Comicfile
 import comicfile
+import cover_engine
 import global_data
+import page_index
 from core.scan_progress import progress
-from model import ComicEntity, FileEntity, VideoEntity
+from model import (
+    ComicEntity,
+    ComicPageIndexEntity,
+    FileEntity,
+    VideoEntity,
+)
 import db
+import dir_size
 import util
+from dir_cache import DirCache
+from path_index import PathIndex
+from walker import Walker
 
 p = ThreadPool(8)
 
+# Bound on the number of bound parameters per ``IN (...)`` clause; older SQLite
+# builds cap a statement at 999 variables.
+_IN_CHUNK = 500
+
+# Per-connection scratch table holding the paths a scan found on disk (see
+# Loader._reconcile_missing). Its own metadata keeps it out of create_all.
+_present = Table(
+    "scan_present",
+    MetaData(),
+    Column("path", String, primary_key=True),
+    prefixes=["TEMP"],
+    sqlite_with_rowid=False,
+)
+_stage_pathes = text(
+    "INSERT OR IGNORE INTO scan_present (path) SELECT value FROM json_each(:pathes)"
+)
+_STAGE_CHUNK = 10_000
+
+
+class _Present:
+    """The paths a scan found on disk, staged into ``scan_present`` in chunks."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.count = 0
+        self._batch: List[str] = []
+
+    def add(self, path: str) -> None:
+        self._batch.append(path)
+        self.count += 1
+        if len(self._batch) >= _STAGE_CHUNK:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._batch:
+            # One statement per chunk, unpacked by SQLite's json_each: far
+            # cheaper than a row-per-parameter-set executemany. Only the temp
+            # table is written, so this takes no lock on the database proper.
+            self.conn.execute(_stage_pathes, {"pathes": json.dumps(self._batch)})
+            self.conn.commit()
+            self._batch = []
+
 
 class Loader:
-    # Subclasses set this to their SQLModel table class so the shared reconcile
-    # can flag/clear the ``missing`` column generically.
+    # Subclasses set this to their SQLModel table class so the shared reconcile,
+    # known-path index and id reservation work on it generically.
     entity_cls = None
     # Human-readable phase label surfaced in the scan progress/metrics.
     phase = None
-
-    def __init__(self):
-        self._starting_id = 0
+    # Scan pipeline sizing: parse workers are I/O bound (archive open on a
+    # network mount); cover workers mostly wait on the cover_engine process
+    # pool, so one per pool process keeps it busy. The writer commits in chunks.
+    parse_workers = 8
+    cover_workers = max(global_data.Config.cover_workers, 1)
+    commit_batch = 200
+    commit_interval = 2.0
+
+    # Ids each worker thread reserves at a time (see _get_id).
+    id_block = 32
+
+    def __init__(self, full: bool = False):
         self.lock = threading.Lock()
-
-    def _get_id(self):
-        with self.lock:
-            self._starting_id += 1
-            return self._starting_id
+        self._ids = threading.local()
+        # Re-list every directory instead of trusting the cached listings of
+        # unchanged ones (see walker.Walker).
+        self.full = full
+
+    def _get_id(self) -> int:
+        # Each thread draws from its own block of ids reserved in the database,
+        # so parse workers never wait on each other and no two loaders (a scan
+        # and an image convert, say) hand out the same id. The unused rest of
+        # a block is simply skipped.
+        block = getattr(self._ids, "block", None)
+        id = next(block, None) if block is not None else None
+        if id is None:
+            self._reserve_ids(self.id_block)
+            id = next(self._ids.block)
+        return id
+
+    def _reserve_ids(self, count: int) -> None:
+        # Start this thread on a fresh block of ``count`` ids. ``load`` of a
+        # single path takes one, rather than skipping the rest of a full block.
+        self._ids.block = iter(db.reserve_ids(self.entity_cls.__tablename__, count))
 
     @abstractmethod
     def load(self, path: str):
         pass
 
     def work(self):
+        # Directory sizes queued meanwhile are stored once the scan is done.
+        with dir_size.filler.paused():
+            self._work()
+
+    def _work(self):
         progress.set_phase(self.phase, 0)
-        old_pathes = set(self._load_old())
-        all_pathes = set(self._load_all())
-        print(f"old: {len(old_pathes)}, all: {len(all_pathes)}")
-        # Reconcile the missing flag first: a file can disappear without any new
-        # file appearing, so this must run even when the early-returns below fire.
-        progress.add_reconciled(self._reconcile_missing(all_pathes))
-        if len(all_pathes) == 0:
+        old_pathes = self._load_old()
+        self._queue_unsized()
+        dir_cache = DirCache(self.phase)
+        walker = self._walker(dir_cache)
+        with self._stage_present() as present:
+
+            def new_pathes():
+                # Every path found goes to the staging table as it comes, so
+                # the scan never holds the whole listing.
+                for path in walker:
+                    present.add(path)
+                    if path not in old_pathes:
+                        yield path
+
+            # New files are parsed while the walker is still listing the rest
+            # of the tree, so on a slow mount the two overlap instead of queueing.
+            self._process_news(new_pathes())
+            dir_cache.flush()
+            print(f"old: {len(old_pathes)}, all: {present.count}")
+            # Reconcile the missing flag once the listing is complete: a file
+            # can disappear without any new file appearing, so this must run
+            # even when nothing new turned up.
+            progress.add_reconciled(self._reconcile_missing(present))
+        if present.count == 0:
             print("not work due to no file, perhaps specify wrong pathes?")
             return
-        new_pathes = list(all_pathes.difference(old_pathes))
-        if len(new_pathes) == 0:
-            print("not work due to no new file.")
-            return
-
-        progress.set_phase(self.phase, len(new_pathes))
-        new_entities = []
+        modified_pathes = [path for path in walker.modified if path in old_pathes]
+        if modified_pathes:
+            progress.add_refreshed(self._refresh_modified(modified_pathes))
+        # The listings that flagged those files go last (see dir_cache).
+        dir_cache.flush_modified()
+
+    def _process_news(self, new_pathes: Iterable[str]):
+        """Import new files through the staged scan pipeline.
+
+        walk -> parse (open archive, namelist, read the cover page) -> cover
+        (decode/thumbnail/encode) -> writer (batched commits). The queues
+        between stages are bounded, so memory stays flat however large the
+        library is; the writer commits every ``commit_batch`` entities (or
+        after ``commit_interval`` seconds idle), so a crash late in the scan
+        keeps the work already done and new entries show up in the list API
+        while the scan is still running.
+        """
+        discovered = 0
         with Progress() as bar:
-            task = bar.add_task("[green]Processing...", total=len(new_pathes))
+            task = bar.add_task("[green]Processing...", total=None)
 
-            def do(path: str):
-                # Time the per-file work: on a network mount the open/parse is
-                # the dominant cost and the metric worth surfacing.
+            def parse(path: str):
+                # Time the per-file open/parse: on a network mount it is the
+                # dominant cost and the metric worth surfacing.
                 started = time.perf_counter()
                 try:
-                    return self._to_entity(path)
+                    return self._parse(path)
                 finally:
                     bar.update(task, advance=1)
                     progress.advance(path, (time.perf_counter() - started) * 1000)
 
-            entities = p.map(do, [e for e in new_pathes])
-            new_entities = [e for e in entities if e is not None]
+            parse_q = queue.Queue(maxsize=self.parse_workers * 4)
+            cover_q = queue.Queue(maxsize=self.cover_workers * 4)
+            write_q = queue.Queue(maxsize=self.commit_batch * 2)
+            stages = [
+                _Stage(parse, parse_q, cover_q, self.parse_workers),
+                _Stage(lambda parsed: self._cover(*parsed), cover_q, write_q, self.cover_workers),
+            ]
+            writer = threading.Thread(target=self._write_news, args=(write_q,))
+            writer.start()
+            try:
+                for path in new_pathes:
+                    # The total is unknown until the walk ends; grow it as we go.
+                    discovered += 1
+                    progress.add_total(1)
+                    bar.update(task, total=discovered)
+                    parse_q.put(path)
+            finally:
+                parse_q.put(_DONE)
+                for stage in stages:
+                    stage.join()
+                writer.join()
+
+        if discovered == 0:
+            print("not work due to no new file.")
 
-        self._commit_news(new_entities)
+    def _write_news(self, inbox: queue.Queue):
+        """Writer stage: drain ``inbox`` and commit in chunks."""
+        batch = []
+        while True:
+            try:
+                item = inbox.get(timeout=self.commit_interval)
+            except queue.Empty:
+                item = None
+            if item is not None and item is not _DONE:
+                batch.append(item)
+            if batch and (item is None or item is _DONE or len(batch) >= self.commit_batch):
+                try:
+                    self._commit_news(batch)
+                except Exception as ex:
+                    # Dropped rows are simply "new" again on the next scan.
+                    print("commit fail:", ex)
+                    global_data.err_message.append(f"commit {len(batch)} entities: {ex}")
+                batch = []
+            if item is _DONE:
+                return
+
+    def _refresh_modified(self, pathes: List[str]) -> int:
+        """Re-parse known entities whose file changed under the same path.
+
+        Returns the number of entities that were refreshed.
+        """
+        print(f"refresh {len(pathes)} modified entit(y/ies)")
+        with Session(db.engine) as session:
+            entities = []
+            for i in range(0, len(pathes), _IN_CHUNK):
+                entities += session.exec(
+                    select(self.entity_cls).where(
+                        self.entity_cls.path.in_(pathes[i : i + _IN_CHUNK])
+                    )
+                ).all()
+            refreshed = [e for e, ok in zip(entities, p.map(self._refresh, entities)) if ok]
+            session.add_all(refreshed)
+            for row in self._extra_rows(refreshed):
+                session.merge(row)
+            unsized = self._unsized(refreshed)
+            session.commit()
+        self._fill_sizes(unsized)
+        return len(refreshed)
+
+    @contextmanager
+    def _stage_present(self) -> Iterator["_Present"]:
+        """A staging table for the paths this scan finds on disk (see
+        ``_reconcile_missing``), on a connection held for the scan."""
+        with db.engine.connect() as conn:
+            _present.create(conn)
+            conn.commit()
+            try:
+                yield _Present(conn)
+            finally:
+                conn.rollback()
+                _present.drop(conn)
+                conn.commit()
 
-    def _reconcile_missing(self, present_pathes: set):
+    def _reconcile_missing(self, present: "_Present"):
         """Flag DB rows whose file is gone and clear ones that reappeared.
 
         Scoped to non-archived rows — archived entries are deliberate
@@ -93,30 +284,37 @@ class Loader:
 
         Returns the number of rows whose flag changed (for progress/metrics).
         """
-        if self.entity_cls is None or not present_pathes:
+        if self.entity_cls is None or not present.count:
             return 0
-        with Session(db.engine) as session:
-            entities = session.exec(
-                select(self.entity_cls).where(self.entity_cls.archived == False)  # noqa: E712
-            ).all()
-            changed = 0
-            for e in entities:
-                should_miss = e.path not in present_pathes
-                if e.missing != should_miss:
-                    e.missing = should_miss
-                    session.add(e)
-                    changed += 1
-            if changed:
-                session.commit()
-                print(f"reconcile: updated missing flag on {changed} entit(y/ies)")
-            return changed
+        cls = self.entity_cls
+        present.flush()
+        # SQLite diffs the staged listing against the entity table, so
+        # neither side is materialized as objects.
+        conn = present.conn
+        staged = select(_present.c.path)
+        with conn.begin():
+            flagged = conn.execute(
+                update(cls)
+                .where(cls.archived == False, cls.missing == False)  # noqa: E712
+                .where(cls.path.not_in(staged))
+                .values(missing=True)
+            ).rowcount
+            cleared = conn.execute(
+                update(cls)
+                .where(cls.archived == False, cls.missing == True)  # noqa: E712
+                .where(cls.path.in_(staged))
+                .values(missing=False)
+            ).rowcount
+        changed = flagged + cleared
+        if changed:
+            print(f"reconcile: flagged {flagged}, cleared {cleared} missing entit(y/ies)")
+        return changed
+
+    def _load_old(self) -> PathIndex:
+        return PathIndex(self.entity_cls)
 
     @abstractmethod
-    def _load_old(self) -> List[str]:
-        pass
-
-    @abstractmethod
-    def _load_all(self) -> List[str]:
+    def _walker(self, dir_cache: DirCache) -> Walker:
         pass
 
     @abstractmethod
@@ -124,10 +322,54 @@ class Loader:
         print(f"commit {len(news)} entities to db.")
         with Session(db.engine) as session:
             session.add_all(news)
+            for row in self._extra_rows(news):
+                session.merge(row)
+            unsized = self._unsized(news)
             session.commit()
+        self._fill_sizes(unsized)
+
+    @staticmethod
+    def _unsized(entities: List[FileEntity]) -> List[Tuple[int, str]]:
+        # Read before the commit expires them.
+        return [(e.id, e.path) for e in entities if not e.sizeKnown]
+
+    def _fill_sizes(self, unsized: List[Tuple[int, str]]) -> None:
+        """Queue directory sizes (see dir_size) for rows now committed."""
+        for id, path in unsized:
+            dir_size.filler.request(self.entity_cls, id, path)
+
+    def _queue_unsized(self) -> None:
+        """Queue the stored rows still without a size: a fill that failed to
+        write, or one cut short by a restart."""
+        cls = self.entity_cls
+        with db.engine.connect() as conn:
+            rows = conn.execute(
+                select(cls.id, cls.path).where(
+                    cls.sizeKnown == False, cls.missing == False  # noqa: E712
+                )
+            ).all()
+        self._fill_sizes(rows)
+
+    def _extra_rows(self, entities: List[FileEntity]) -> list:
+        """Rows that belong to ``entities`` and are committed along with them."""
+        return []
 
-    @abstractmethod
     def _to_entity(self, path: str):
+        parsed = self._parse(path)
+        if parsed is None:
+            return None
+        return self._cover(*parsed)
+
+    @abstractmethod
+    def _parse(self, path: str) -> Tuple[FileEntity, Any] | None:
+        """Build the entity for ``path`` plus whatever its cover stage needs."""
+
+    @abstractmethod
+    def _cover(self, entity: FileEntity, source: Any) -> FileEntity | None:
+        pass
+
+    @abstractmethod
+    def _refresh(self, entity: FileEntity) -> bool:
         pass
 
     @abstractmethod
@@ -135,23 +377,54 @@ class Loader:
         pass
 
 
+# End-of-stream marker passed down the scan pipeline queues.
+_DONE = object()
+
+
+class _Stage:
+    """A pool of threads mapping ``fn`` from ``inbox`` to ``outbox``.
+
+    ``None`` results are dropped. The end marker is handed on to ``outbox``
+    once every worker of the stage has seen it.
+    """
+
+    def __init__(self, fn, inbox: queue.Queue, outbox: queue.Queue, workers: int):
+        self.fn = fn
+        self.inbox = inbox
+        self.outbox = outbox
+        self._remaining = workers
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._run) for _ in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    def _run(self):
+        while True:
+            item = self.inbox.get()
+            if item is _DONE:
+                # Put it back for the sibling workers; the last one forwards it.
+                self.inbox.put(_DONE)
+                with self._lock:
+                    self._remaining -= 1
+                    last = self._remaining == 0
+                if last:
+                    self.outbox.put(_DONE)
+                return
+            try:
+                out = self.fn(item)
+            except Exception as ex:
+                print("pipeline skip", item, ex)
+                out = None
+            if out is not None:
+                self.outbox.put(out)
+
+    def join(self):
+        for t in self._threads:
+            t.join()
+
+
 def scan(exts: List[str], pathes: List[str]):
-    ret = []
-    scanDir = "" in exts  # "" means scan dir
-    for path in pathes:
-        for root, dirs, files in os.walk(path):
-            file_exts = [os.path.splitext(file)[1] for file in files]
-            # dir with no sub dir
-            if scanDir and len(dirs) == 0:
-                # if has image file, add dir
-                if any([ext in comicfile.allowImgs for ext in file_exts]):
-                    ret.append(root)
-            for file, ext in zip(files, file_exts):
-                if ext in exts:
-                    f = os.path.join(root, file)
-                    ret.append(f)
-
-    return list(set(ret))
+    return list(Walker(exts, pathes))
 
 
 class ComicLoader(Loader):
@@ -159,13 +432,11 @@ class ComicLoader(Loader):
     entity_cls = ComicEntity
     phase = "comics"
 
-    def __init__(self):
-        super().__init__()
-        with Session(db.engine) as session:
-            sub_query = select(func.max(ComicEntity.id)).scalar_subquery()
-            statement = select(ComicEntity).where(ComicEntity.id == sub_query)
-            entity = session.exec(statement).first()
-            self._starting_id = entity.id if entity is not None else 0
+    def __init__(self, full: bool = False):
+        super().__init__(full)
+        # Page indexes built while parsing, keyed by comic id, waiting for
+        # their comic to be committed.
+        self._page_indexes: Dict[int, ComicPageIndexEntity] = {}
 
     def load(self, path: str):
         with Session(db.engine) as session:
@@ -173,64 +444,122 @@ class ComicLoader(Loader):
             entities = session.exec(statement).all()
             if len(entities) > 0:
                 raise Exception(f"{path} already exists in db.")
+            self._reserve_ids(1)
             entity = self._to_entity(path)
-            if entity is not None:
-                session.add(entity)
-                session.commit()
-
-    def _load_old(self) -> List[str]:
-        with Session(db.engine) as session:
-            # load
-            statement = select(ComicEntity)
-            entities = session.exec(statement).all()
-            print(f"read {len(entities)} entities from db.")
-
-            return [e.path for e in entities]
+            if entity is None:
+                return
+            session.add(entity)
+            for row in self._extra_rows([entity]):
+                session.merge(row)
+            unsized = self._unsized([entity])
+            session.commit()
+        self._fill_sizes(unsized)
 
-    def _load_all(self) -> List[str]:
-        return scan(self.comic_ext, global_data.Config.Comic.scan_pathes)
+    def _walker(self, dir_cache: DirCache) -> Walker:
+        return Walker(
+            self.comic_ext, global_data.Config.Comic.scan_pathes, dir_cache, self.full,
+            on_listing=dir_cache.record,
+        )
 
-    def _to_entity(self, path: str):
+    def _parse(self, path: str):
         ret = ComicEntity.from_path(pathlib.Path(path), self._get_id())
 
         try:
             with comicfile.create(ret.path) as cf:
                 ret.page = cf.page
-                ComicLoader.gen_comic_cover(ret, cf, True)
+                self._keep_page_index(ret, cf)
+                # Only pull the compressed cover bytes here; decoding them is
+                # CPU work for the cover stage, off the archive-open workers.
+                buf = ComicLoader.read_cover_source(ret, cf)
         except Exception as ex:
             print("skip", ret.path, ex)
             global_data.err_message.append(f"{ret.path}: {ex}")
+            with self.lock:
+                self._page_indexes.pop(ret.id, None)
             return None
 
-        return ret
+        return ret, buf
+
+    def _cover(self, entity: ComicEntity, buf: bytes | None):
+        if buf is not None:
+            ComicLoader.write_cover(entity, buf)
+        return entity
+
+    def _refresh(self, entity: ComicEntity) -> bool:
+        # The cached open handle still points at the old bytes.
+        comicfile.evict(entity.path)
+        try:
+            fresh = ComicEntity.from_path(pathlib.Path(entity.path), entity.id)
+            with comicfile.create(entity.path) as cf:
+                entity.page = cf.page
+                if entity.coverPosition > cf.page:
+                    entity.coverPosition = 0
+                page = entity.coverPosition - 1 if entity.coverPosition > 0 else 0
+                ComicLoader.gen_comic_cover(entity, cf, True, page)
+                entity.size, entity.sizeKnown = fresh.size, fresh.sizeKnown
+                entity.updateTime = fresh.updateTime
+                self._keep_page_index(entity, cf)
+        except Exception as ex:
+            print("skip refresh", entity.path, ex)
+            global_data.err_message.append(f"{entity.path}: {ex}")
+            return False
+        # Bump the cover version so the frontend's cache-busting URL changes.
+        entity.entityUpdateTime = datetime.now()
+        return True
+
+    def _keep_page_index(self, entity: ComicEntity, cf: Comicfile):
+        row = page_index.build(entity, cf)
+        with self.lock:
+            self._page_indexes[entity.id] = row
+
+    def _extra_rows(self, entities: List[ComicEntity]) -> list:
+        with self.lock:
+            rows = [self._page_indexes.pop(e.id, None) for e in entities]
+        return [row for row in rows if row is not None]
 
     @staticmethod
     def gen_comic_cover(
         c: ComicEntity, cf: Comicfile = None, overwrite=False, page=0
     ) -> bool:
-        thumbnail_maxsize = (300, 300)
-        name = f"{c.id}_0.jpg"
-        cover_path = os.path.join(global_data.Config.nginx_comic_path, name)
-        if overwrite or not os.path.exists(cover_path):
-            try:
-                if cf is None:
-                    with comicfile.create(c.path) as cf:
-                        ok, buf = cf.read(page)
-                else:
+        if overwrite or not os.path.exists(ComicLoader.cover_path(c)):
+            buf = ComicLoader.read_cover_source(c, cf, page)
+            if buf is not None:
+                return ComicLoader.write_cover(c, buf)
+        return False
+
+    @staticmethod
+    def cover_path(c: ComicEntity) -> str:
+        return os.path.join(global_data.Config.nginx_comic_path, f"{c.id}_0.jpg")
+
+    @staticmethod
+    def read_cover_source(c: ComicEntity, cf: Comicfile = None, page=0) -> bytes | None:
+        """Read the raw bytes of the page the cover is made from."""
+        try:
+            if cf is None:
+                with comicfile.create(c.path) as cf:
                     ok, buf = cf.read(page)
-                if ok:
-                    img = Image.open(io.BytesIO(buf))
-                    img.thumbnail(thumbnail_maxsize)
-                    img = img.convert("RGB")
-                    img.save(cover_path, "JPEG")
-                    return True
-            except RuntimeError as ex:
-                if "password required for extraction" in str(ex):
-                    print("skip due to encrypted", c.path)
-                else:
-                    raise ex
-            except Exception as ex:
-                print("gen cover fail:", c.path, ex)
+            else:
+                ok, buf = cf.read(page)
+            return buf if ok else None
+        except RuntimeError as ex:
+            if "password required for extraction" in str(ex):
+                print("skip due to encrypted", c.path)
+            else:
+                raise ex
+        except Exception as ex:
+            print("gen cover fail:", c.path, ex)
+        return None
+
+    @staticmethod
+    def write_cover(c: ComicEntity, buf: bytes) -> bool:
+        """Thumbnail the page bytes into the comic's cover JPEG."""
+        try:
+            data = cover_engine.engine.encode(buf)
+            with open(ComicLoader.cover_path(c), "wb") as f:
+                f.write(data)
+            return True
+        except Exception as ex:
+            print("gen cover fail:", c.path, ex)
         return False
 
 
@@ -249,15 +578,6 @@ class VideoLoader(Loader):
     ]
     entity_cls = VideoEntity
     phase = "videos"
-    _starting_id: int
-
-    def __init__(self):
-        super().__init__()
-        with Session(db.engine) as session:
-            sub_query = select(func.max(VideoEntity.id)).scalar_subquery()
-            statement = select(VideoEntity).where(VideoEntity.id == sub_query)
-            entity = session.exec(statement).first()
-            self._starting_id = entity.id if entity is not None else 0
 
     def load(self, path):
         with Session(db.engine) as session:
@@ -265,31 +585,54 @@ class VideoLoader(Loader):
             entities = session.exec(statement).all()
             if len(entities) > 0:
                 raise Exception(f"{path} already exists in db.")
+            self._reserve_ids(1)
             entity = self._to_entity(path)
             if entity is not None:
                 session.add(entity)
                 session.commit()
 
-    def _load_old(self) -> List[str]:
-        with Session(db.engine) as session:
-            statement = select(VideoEntity)
-            entities = session.exec(statement).all()
-            print(f"read {len(entities)} entities from db.")
-            return [e.path for e in entities]
-
-    def _load_all(self) -> List[str]:
-        return scan(self.video_ext, global_data.Config.Video.scan_pathes)
+    def _walker(self, dir_cache: DirCache) -> Walker:
+        return Walker(
+            self.video_ext, global_data.Config.Video.scan_pathes, dir_cache, self.full,
+            on_listing=dir_cache.record,
+        )
 
-    def _to_entity(self, path: str):
+    def _parse(self, path: str):
         ret = VideoEntity.from_path(pathlib.Path(path), self._get_id())
 
         try:
-            VideoLoader.gen_video_cover(ret)
             ret.durationInSecond = VideoLoader.get_video_length(path)
         except Exception as ex:
             print("skip", ret.path, ex)
 
-        return ret
+        return ret, None
+
+    def _cover(self, entity: VideoEntity, _):
+        try:
+            VideoLoader.gen_video_cover(entity)
+        except Exception as ex:
+            print("skip", entity.path, ex)
+        return entity
+
+    def _refresh(self, entity: VideoEntity) -> bool:
+        try:
+            fresh = VideoEntity.from_path(pathlib.Path(entity.path), entity.id)
+        except OSError as ex:
+            print("skip refresh", entity.path, ex)
+            return False
+        cover = os.path.join(global_data.Config.nginx_video_path, f"{entity.id}.jpg")
+        try:
+            # gen_video_cover keeps an existing cover, so drop the stale one.
+            if os.path.exists(cover):
+                os.remove(cover)
+            VideoLoader.gen_video_cover(entity)
+            entity.durationInSecond = VideoLoader.get_video_length(entity.path)
+        except Exception as ex:
+            print("skip", entity.path, ex)
+        entity.size = fresh.size
+        entity.updateTime = fresh.updateTime
+        entity.entityUpdateTime = datetime.now()
+        return True
 
     @staticmethod
     def gen_video_cover(c: VideoEntity):
@@ -34,6 +34,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Paginated lists report their total and next cursor in headers.
+    expose_headers=["X-Total-Count", "X-Next-Cursor"],
 )
 
 # Register API routers
@@ -1,24 +1,32 @@
 from datetime import datetime
+import hashlib
 import pathlib
 from typing import Optional
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 
-def get_dir_size(path: pathlib.Path) -> int:
-    size = 0
-    for p in path.iterdir():
-        if p.is_dir():
-            size += get_dir_size(p)
-        else:
-            size += p.stat().st_size
-    return size
+def path_digest(path: str) -> int:
+    """64-bit digest of ``path``, stored as ``FileEntity.pathDigest``."""
+    raw = hashlib.blake2b(path.encode("utf-8", "surrogateescape"), digest_size=8).digest()
+    return int.from_bytes(raw, "little", signed=True)
 
 
 class FileEntity(SQLModel):
     id: int = Field(primary_key=True)
     size: int
-    name: str
-    path: str
+    # False while a directory's size is still being added up in the
+    # background (see dir_size); ``size`` is 0 until then.
+    sizeKnown: bool = Field(default=True)
+    # Looked up by the loader (path), rename conflict checks (name, path) and
+    # the image-to-comic convert (path).
+    name: str = Field(index=True)
+    path: str = Field(index=True)
+    # path_digest(path): the scan diffs the walker's output against these
+    # instead of the paths themselves (see path_index). Keep it in step with
+    # ``path``; rows written without it are backfilled before each scan. Not
+    # part of the API.
+    pathDigest: Optional[int] = Field(default=None, index=True, exclude=True)
     updateTime: datetime
     archived: bool = Field(default=False)
     favorited: bool = Field(default=False)
@@ -37,38 +45,111 @@ class FileEntity(SQLModel):
         stat = path.stat()
         return FileEntity(
             id=0,
-            size=stat.st_size if path.is_file() else get_dir_size(path),
+            # A directory's size takes a stat per file below it; dir_size
+            # fills it in the background once the row is stored.
+            size=stat.st_size if path.is_file() else 0,
+            sizeKnown=path.is_file(),
             name=path.name,
             path=str(path),
+            pathDigest=path_digest(str(path)),
             updateTime=datetime.fromtimestamp(stat.st_mtime),
         )
 
 
+def _list_index(table: str) -> Index:
+    # Serves the list endpoints: filter on ``missing``, newest first, keyset on
+    # (updateTime, id). SQLite appends the rowid (``id``) to every index, so
+    # the index alone covers the ORDER BY and the cursor seek.
+    return Index(f"ix_{table}_missing_updateTime", "missing", "updateTime")
+
+
 class ComicEntity(FileEntity, table=True):
+    __table_args__ = (_list_index("comicentity"),)
+
     page: int = Field(default=0)
 
     @staticmethod
     def from_path(path: pathlib.Path, id: int):
-        ret = ComicEntity(**FileEntity.from_path(path).model_dump())
+        base = FileEntity.from_path(path)
+        ret = ComicEntity(**base.model_dump(), pathDigest=base.pathDigest)
         ret.id = id
         return ret
 
 
 class VideoEntity(FileEntity, table=True):
+    __table_args__ = (_list_index("videoentity"),)
+
     durationInSecond: int = Field(default=0)
 
     @staticmethod
     def from_path(path: pathlib.Path, id: int):
-        ret = VideoEntity(**FileEntity.from_path(path).model_dump())
+        base = FileEntity.from_path(path)
+        ret = VideoEntity(**base.model_dump(), pathDigest=base.pathDigest)
         ret.id = id
         return ret
 
 
-class ImageEntity(FileEntity):
+class ImageEntity(FileEntity, table=True):
+    """An image album (a folder of images). The API serves albums from the
+    in-memory ``api.images`` store; this table keeps them, with their ids,
+    favorites, progress and cover positions, across restarts."""
+
     page: int = Field(default=0)
 
     @staticmethod
     def from_path(path: pathlib.Path, id: int):
-        ret = ImageEntity(**FileEntity.from_path(path).model_dump())
+        base = FileEntity.from_path(path)
+        ret = ImageEntity(**base.model_dump(), pathDigest=base.pathDigest)
         ret.id = id
         return ret
+
+
+class ScanDirEntity(SQLModel, table=True):
+    """Cached listing of one scanned directory, used by the incremental scan.
+
+    A directory's mtime only moves when an entry inside it is added, removed or
+    renamed, so while ``mtime`` still matches the directory on disk the stored
+    ``entries`` stand in for a fresh readdir. Rows are scoped per loader phase
+    ("comics" / "videos") because each loader only records the children it
+    cares about. ``entries`` is a JSON object mapping a child name to its kind
+    ("d" subdir, "l" symlinked subdir, "i" image, "f" media file) and, for
+    media files, the ``[size, mtime_ns, inode]`` signature used to spot a file
+    rewritten under the same path.
+    """
+
+    scope: str = Field(primary_key=True)
+    path: str = Field(primary_key=True)
+    mtime: int  # st_mtime_ns
+    entries: str = Field(default="{}")
+
+
+class IdSequenceEntity(SQLModel, table=True):
+    """Next unassigned id of an entity table (see ``db.reserve_ids``).
+
+    Loaders pick an entity's id before it is committed, since its cover file
+    is named after it. Ids come from here in reserved blocks, so concurrent
+    loaders never hand out the same one, and an id is never reused after its
+    row is deleted (a reused id would match the old cover in a client's cache).
+    """
+
+    name: str = Field(primary_key=True)
+    next: int = Field(default=1)
+
+
+class ComicPageIndexEntity(SQLModel, table=True):
+    """Where each page of a comic lives, recorded when the comic is scanned.
+
+    Serving a page or the detail view from this skips listing the archive
+    (for rar, the unrar round trip). ``updateTime`` is the comic's
+    ``updateTime`` the index was built from; once they differ the file has
+    changed on disk and the index is rebuilt. ``pages`` is a JSON list in page
+    order of ``{name, offset, compressSize, size, mediaType, stored}``:
+    ``offset`` is the member's local header for zip and its data for rar
+    (always 0 for directory comics), and ``stored`` marks members kept
+    uncompressed and unencrypted, whose bytes can be read straight from the
+    file.
+    """
+
+    comicId: int = Field(primary_key=True)
+    updateTime: datetime
+    pages: str = Field(default="[]")
@@ -0,0 +1,156 @@
+"""On-disk LRU cache of width-resized page variants.
+
+``?width=N`` page requests decode and re-encode the page on every browser
+cache miss, and those bytes come from the API so nginx never gets to cache
+them. Readers on phones hit the same handful of widths over and over, so the
+encoded variants are kept on disk, keyed on ``(kind, id, page, updateTime,
+width)`` — a rescan that changes ``updateTime`` simply makes the old variants
+unreachable and they age out. Total size is capped; the least recently served
+variants are evicted first. File mtimes carry the recency across restarts.
+"""
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+import global_data
+
+
+def variant_key(kind: str, entity_id: int, page: int, update_time: datetime, width: int) -> str:
+    return f"{kind}/{entity_id}/{page}/{int(update_time.timestamp())}/{width}"
+
+
+class PageCache:
+    """Size-capped, LRU-evicted directory of resized page variants."""
+
+    def __init__(self, root: str, max_bytes: int, ext: str = ".webp"):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ext = ext
+        self._lock = threading.Lock()
+        # relpath -> size, least recently used first; built lazily from disk.
+        self._entries: OrderedDict[str, int] | None = None
+        self._bytes = 0
+
+    def relpath(self, key: str) -> str:
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return f"{digest[:2]}/{digest}{self.ext}"
+
+    def get(self, key: str) -> str | None:
+        """Return the variant's path relative to ``root`` if cached, else None."""
+        rel = self.relpath(key)
+        with self._lock:
+            entries = self._index()
+            if rel not in entries:
+                return None
+            entries.move_to_end(rel)
+        try:
+            # Bump the mtime so the LRU order survives a restart.
+            os.utime(os.path.join(self.root, rel))
+        except OSError:
+            # Removed behind our back (or by a concurrent eviction).
+            with self._lock:
+                self._drop(rel)
+            return None
+        return rel
+
+    def put(self, key: str, data: bytes) -> str:
+        """Store a variant, evicting the least recently used past the cap."""
+        rel = self.relpath(key)
+        path = os.path.join(self.root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename so a concurrent reader never sees a partial file.
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            entries = self._index()
+            self._drop(rel)
+            entries[rel] = len(data)
+            self._bytes += len(data)
+            evicted = []
+            while self._bytes > self.max_bytes and len(entries) > 1:
+                old, size = entries.popitem(last=False)
+                self._bytes -= size
+                evicted.append(old)
+        for old in evicted:
+            try:
+                os.remove(os.path.join(self.root, old))
+            except OSError:
+                pass
+        return rel
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._index()
+            return {"entries": len(entries), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+    def _drop(self, rel: str):
+        size = self._entries.pop(rel, None)
+        if size is not None:
+            self._bytes -= size
+
+    def _index(self) -> OrderedDict:
+        # Caller holds the lock.
+        if self._entries is None:
+            found = []
+            for dirpath, _, files in os.walk(self.root):
+                for name in files:
+                    path = os.path.join(dirpath, name)
+                    if name.endswith(".tmp"):
+                        # Left over from a crash mid-write; only worth cleaning
+                        # once it is clearly not somebody's in-flight write.
+                        try:
+                            if os.stat(path).st_mtime < time.time() - 3600:
+                                os.remove(path)
+                        except OSError:
+                            pass
+                        continue
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    rel = os.path.relpath(path, self.root).replace(os.sep, "/")
+                    found.append((st.st_mtime, rel, st.st_size))
+            found.sort()
+            self._entries = OrderedDict((rel, size) for _, rel, size in found)
+            self._bytes = sum(size for _, _, size in found)
+        return self._entries
+
+
+class NarrowPages:
+    """Variant keys whose page is already no wider than the width asked for.
+
+    Such a page has no variant to store, so without this every request for it
+    would decode the page again only to find that out. Bounded, LRU.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._keys: OrderedDict[str, None] = OrderedDict()
+
+    def add(self, key: str) -> None:
+        with self._lock:
+            self._keys[key] = None
+            self._keys.move_to_end(key)
+            while len(self._keys) > self.capacity:
+                self._keys.popitem(last=False)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            if key not in self._keys:
+                return False
+            self._keys.move_to_end(key)
+            return True
+
+
+# Process-wide singletons.
+narrow = NarrowPages(16384)
+cache = PageCache(
+    global_data.Config.page_cache_path, global_data.Config.page_cache_max_bytes
+)
@@ -0,0 +1,46 @@
+"""Persisted per-comic page lists (see ``model.ComicPageIndexEntity``).
+
+Built by the comic loader at scan time and backfilled by the API the first
+time an older comic is read, so page and detail requests normally know the
+page order without listing the archive.
+"""
+import json
+from typing import List
+
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, delete
+
+from comicfile import Comicfile
+from model import ComicEntity, ComicPageIndexEntity
+
+
+def build(comic: ComicEntity, cf: Comicfile) -> ComicPageIndexEntity:
+    return ComicPageIndexEntity(
+        comicId=comic.id,
+        updateTime=comic.updateTime,
+        pages=json.dumps(cf.page_index()),
+    )
+
+
+def load(session: Session, comic: ComicEntity) -> List[dict] | None:
+    """The stored page list, or None if there is none or the file changed since."""
+    row = session.get(ComicPageIndexEntity, comic.id)
+    if row is None or row.updateTime != comic.updateTime:
+        return None
+    return json.loads(row.pages)
+
+
+def save(session: Session, comic: ComicEntity, cf: Comicfile) -> List[dict]:
+    """Index the open ``cf`` for ``comic`` and store it; returns the page list."""
+    row = build(comic, cf)
+    try:
+        session.merge(row)
+        session.commit()
+    except IntegrityError:
+        # A concurrent request stored the same index first.
+        session.rollback()
+    return json.loads(row.pages)
+
+
+def drop(session: Session, comic_id: int):
+    session.exec(delete(ComicPageIndexEntity).where(ComicPageIndexEntity.comicId == comic_id))
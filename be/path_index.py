@@ -0,0 +1,74 @@
+"""Compact index of the paths a loader already has rows for.
+
+Every scan diffs the walker's output against the known paths. Held as a set
+of strings that costs well over 100 bytes a path — tens of megabytes for a
+large library — and building it used to mean loading every entity. Instead
+each row stores a 64-bit digest of its path (``FileEntity.pathDigest``,
+indexed), and the index is that column streamed in order into an array:
+8 bytes a path, membership by binary search. A digest collision would make
+a new file look known; at 64 bits that takes billions of files to expect.
+"""
+from array import array
+from bisect import bisect_left
+
+from sqlalchemy import bindparam, update
+from sqlmodel import select
+
+import db
+from model import path_digest
+
+_BATCH = 10_000
+
+
+def backfill(entity_cls) -> int:
+    """Fill in ``pathDigest`` on rows stored without one; returns how many."""
+    filled = 0
+    with db.engine.begin() as conn:
+        while rows := conn.execute(
+            select(entity_cls.id, entity_cls.path)
+            .where(entity_cls.pathDigest == None)  # noqa: E711
+            .limit(_BATCH)
+        ).all():
+            conn.execute(
+                update(entity_cls)
+                .where(entity_cls.id == bindparam("row_id"))
+                .values(pathDigest=bindparam("digest")),
+                [{"row_id": id, "digest": path_digest(path)} for id, path in rows],
+            )
+            filled += len(rows)
+    if filled:
+        print(f"path index: backfilled {filled} digest(s)")
+    return filled
+
+
+class PathIndex:
+    """The paths stored in ``entity_cls``'s table, read on first use."""
+
+    def __init__(self, entity_cls):
+        self.entity_cls = entity_cls
+        self._digests: array | None = None
+
+    def __contains__(self, path: str) -> bool:
+        digests = self._load()
+        key = path_digest(path)
+        i = bisect_left(digests, key)
+        return i < len(digests) and digests[i] == key
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+    def _load(self) -> array:
+        if self._digests is None:
+            backfill(self.entity_cls)
+            digests = array("q")
+            column = self.entity_cls.pathDigest
+            with db.engine.connect() as conn:
+                # Sorted by the column's index, streamed in batches.
+                result = conn.execution_options(yield_per=_BATCH).execute(
+                    select(column).order_by(column)
+                )
+                for rows in result.partitions():
+                    digests.extend(digest for (digest,) in rows)
+            self._digests = digests
+            print(f"read {len(digests)} known path(s) of {self.entity_cls.__tablename__}")
+        return self._digests
@@ -0,0 +1,136 @@
+"""Read-ahead of the pages a reader is about to turn to.
+
+Readers go through a comic page by page, but every page request pays for
+its own archive read — on a network-mounted rar that is an unrar round trip
+per page. After a page is served, the next few pages (at the width that was
+asked for) are loaded in the background into a bounded in-memory cache, so
+the page turn is answered from memory. Each comic keeps at most a couple of
+windows' worth of pages, and the cache as a whole is capped in bytes; the
+least recently used pages go first.
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Tuple
+
+import global_data
+
+# (comic id, updateTime as int, page, width or None)
+Key = Tuple[int, int, int, int | None]
+Loaded = Tuple[bytes, str] | None
+
+
+class Prefetcher:
+    """Background page loader feeding a byte-capped LRU of page bodies.
+
+    ``window <= 0`` disables read-ahead.
+    """
+
+    def __init__(self, window: int, max_bytes: int, workers: int = 2):
+        self.window = window
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Key, Tuple[bytes, str]] = OrderedDict()
+        self._bytes = 0
+        self._inflight: dict[Key, Future] = {}
+        self._executor: ThreadPoolExecutor | None = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Key) -> Tuple[bytes, str] | None:
+        """The prefetched ``(body, media_type)`` for ``key``, if any."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+    def schedule(self, key: Key, load: Callable[[], Loaded]) -> None:
+        """Run ``load`` in the background unless ``key`` is cached or pending."""
+        if self.window <= 0:
+            return
+        with self._lock:
+            if key in self._entries or key in self._inflight:
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="prefetch"
+                )
+            self._inflight[key] = self._executor.submit(self._run, key, load)
+
+    def put(self, key: Key, body: bytes, media_type: str) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._entries[key] = (body, media_type)
+            self._bytes += len(body)
+            self._shrink(key[0])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "window": self.window,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "inflight": len(self._inflight),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def wait(self, timeout: float | None = None) -> None:
+        """Block until the loads scheduled so far are done."""
+        with self._lock:
+            pending = list(self._inflight.values())
+        wait(pending, timeout=timeout)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, key: Key, load: Callable[[], Loaded]) -> None:
+        try:
+            loaded = load()
+        except Exception as ex:
+            # Read-ahead is best effort; the real request reports the error.
+            print("prefetch fail:", key, ex)
+            loaded = None
+        with self._lock:
+            self._inflight.pop(key, None)
+        if loaded is not None:
+            self.put(key, *loaded)
+
+    def _shrink(self, comic_id: int) -> None:
+        # Caller holds the lock. A comic keeps at most two windows of pages
+        # (the one being read ahead plus the one just read), oldest out first.
+        per_comic = max(self.window, 1) * 2
+        mine = [k for k in self._entries if k[0] == comic_id]
+        for k in mine[: max(len(mine) - per_comic, 0)]:
+            self._evict(k)
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key: Key) -> None:
+        body, _ = self._entries.pop(key)
+        self._bytes -= len(body)
+        self.evictions += 1
+
+
+# Process-wide singleton.
+prefetcher = Prefetcher(
+    global_data.Config.prefetch_pages, global_data.Config.prefetch_max_bytes
+)
@@ -1,8 +1,22 @@
 """Database backup tasks"""
 import asyncio
 import datetime
+import gzip
 import os
 import shutil
+import sqlite3
+import time
+
+import global_data
+
+# Pages copied per backup step. Between steps the source is unlocked, so a
+# scan commit or a favorite toggle never waits for the whole copy.
+_STEP_PAGES = 1024
+_STEP_SLEEP = 0.01
+
+# Outcome of the most recent backup run in this process (see last_result).
+_last_result: dict | None = None
+
 
 def _get_paths() -> tuple[str, str]:
     db_path = os.environ.get("DB_PATH", "prod.sqlite")
@@ -10,6 +24,68 @@ def _get_paths() -> tuple[str, str]:
     return db_path, backup_dir
 
 
+def list_backups(db_path: str, backup_dir: str) -> list[str]:
+    """Backup file names for ``db_path`` in ``backup_dir``, oldest first."""
+    if not os.path.isdir(backup_dir):
+        return []
+    db_stem = os.path.splitext(os.path.basename(db_path))[0]
+    backup_ext = os.path.splitext(db_path)[1] or ".db"
+    return sorted(
+        f for f in os.listdir(backup_dir)
+        if f.startswith(f"{db_stem}_") and f.endswith((backup_ext, backup_ext + ".gz"))
+    )
+
+
+def last_result() -> dict | None:
+    return _last_result
+
+
+def _source_mtime(db_path: str) -> float:
+    # Under WAL, commits land in the -wal file and reach the main file only
+    # at a checkpoint, so the newer of the two says when the data changed.
+    wal = db_path + "-wal"
+    mtime = os.path.getmtime(db_path)
+    if os.path.exists(wal):
+        mtime = max(mtime, os.path.getmtime(wal))
+    return mtime
+
+
+def _backup_file(db_path: str, backup_path: str, compress: bool) -> str:
+    """Copy ``db_path`` to ``backup_path`` with SQLite's online backup API.
+
+    The result is a consistent snapshot including WAL content, however many
+    commits land while it runs. Written under a temporary name, so a failed
+    run never leaves a partial backup. Returns the path written.
+    """
+    tmp_path = backup_path + ".tmp"
+    try:
+        src = sqlite3.connect(db_path)
+        try:
+            dst = sqlite3.connect(tmp_path)
+            try:
+                src.backup(dst, pages=_STEP_PAGES, sleep=_STEP_SLEEP)
+            finally:
+                dst.close()
+        finally:
+            src.close()
+        if compress:
+            backup_path += ".gz"
+            gz_tmp_path = backup_path + ".tmp"
+            try:
+                with open(tmp_path, "rb") as f_in, gzip.open(gz_tmp_path, "wb") as f_out:
+                    shutil.copyfileobj(f_in, f_out)
+                os.replace(gz_tmp_path, backup_path)
+            finally:
+                if os.path.exists(gz_tmp_path):
+                    os.remove(gz_tmp_path)
+        else:
+            os.replace(tmp_path, backup_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return backup_path
+
+
 async def backup_database_loop():
     """Background task to backup database every 24 hours"""
     print("[Task] Database backup task started (runs every 24 hours)", flush=True)
@@ -29,6 +105,8 @@ async def backup_database_loop():
 
 async def backup_database():
     """Backup the database to the backups subfolder only if it has been modified"""
+    global _last_result
+    started = time.perf_counter()
     try:
         db_path, backup_dir = _get_paths()
 
@@ -36,18 +114,12 @@ async def backup_database():
             print(f"[Task] Database file {db_path} not found", flush=True)
             return
 
-        db_mtime = os.path.getmtime(db_path)
+        db_mtime = _source_mtime(db_path)
         db_modified_time = datetime.datetime.fromtimestamp(db_mtime)
 
         os.makedirs(backup_dir, exist_ok=True)
 
-        db_stem = os.path.splitext(os.path.basename(db_path))[0]
-        backup_ext = os.path.splitext(db_path)[1] or ".db"
-        backup_files = sorted([
-            f for f in os.listdir(backup_dir)
-            if f.startswith(f"{db_stem}_") and f.endswith(backup_ext)
-        ])
-
+        backup_files = list_backups(db_path, backup_dir)
         if backup_files:
             latest_path = os.path.join(backup_dir, backup_files[-1])
             if abs(db_mtime - os.path.getmtime(latest_path)) < 1:
@@ -58,19 +130,39 @@ async def backup_database():
                 )
                 return
 
+        db_stem = os.path.splitext(os.path.basename(db_path))[0]
+        backup_ext = os.path.splitext(db_path)[1] or ".db"
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         backup_path = os.path.join(backup_dir, f"{db_stem}_{timestamp}{backup_ext}")
-        shutil.copy2(db_path, backup_path)
-        print(f"[Task] Backed up to {backup_path}", flush=True)
+        # The copy takes as long as the database is big; keep it off the loop.
+        backup_path = await asyncio.to_thread(
+            _backup_file, db_path, backup_path, global_data.Config.backup_compress
+        )
+        # Stamp the backup with the source's mtime so the next run can tell
+        # whether anything changed since.
+        os.utime(backup_path, (db_mtime, db_mtime))
+        _last_result = {
+            "finished_at": datetime.datetime.now().isoformat(),
+            "duration_seconds": round(time.perf_counter() - started, 3),
+            "size": os.path.getsize(backup_path),
+            "error": None,
+        }
+        print(
+            f"[Task] Backed up to {backup_path} "
+            f"({_last_result['size']} bytes in {_last_result['duration_seconds']}s)",
+            flush=True,
+        )
 
         # Keep last 7 backups
-        backup_files = sorted([
-            f for f in os.listdir(backup_dir)
-            if f.startswith(f"{db_stem}_") and f.endswith(backup_ext)
-        ])
-        for old in backup_files[:-7]:
+        for old in list_backups(db_path, backup_dir)[:-7]:
             os.remove(os.path.join(backup_dir, old))
             print(f"[Task] Removed old backup: {old}", flush=True)
 
     except Exception as e:
+        _last_result = {
+            "finished_at": datetime.datetime.now().isoformat(),
+            "duration_seconds": round(time.perf_counter() - started, 3),
+            "size": None,
+            "error": str(e),
+        }
         print(f"[Task] Failed to backup database: {e}", flush=True)
@@ -2,11 +2,15 @@
 import asyncio
 import datetime
 
-# Local clock hour at which the daily scan runs (24h). Images live only in an
-# in-memory store (api/images.py) and never refresh on their own, and comic /
+# Local clock hour at which the daily scan runs (24h). Image albums only pick
+# up folder changes when bootstrap walks them (api/images.py), and comic /
 # video scans are too heavy to run continuously — so we reconcile everything
 # once a day in the small hours instead.
 SCAN_HOUR = 2
+# Weekday (Monday is 0) whose scan re-lists every directory. The other days
+# reuse the listings of unchanged directories, which misses a file rewritten
+# in place (see walker.Walker).
+FULL_SCAN_WEEKDAY = 6
 
 
 def _seconds_until(hour: int, now: datetime.datetime | None = None) -> float:
@@ -18,15 +22,21 @@ def _seconds_until(hour: int, now: datetime.datetime | None = None) -> float:
     return (target - now).total_seconds()
 
 
+def _is_full_scan_day(today: datetime.date | None = None) -> bool:
+    return (today or datetime.date.today()).weekday() == FULL_SCAN_WEEKDAY
+
+
 async def daily_scan_loop():
-    """Background task: run a full media scan every day at local SCAN_HOUR."""
+    """Background task: scan all media every day at local SCAN_HOUR, re-listing
+    every directory on FULL_SCAN_WEEKDAY."""
     print(f"[Task] Daily scan task started (runs at {SCAN_HOUR:02d}:00 local time)", flush=True)
     from api.system import start_scan
     try:
         while True:
             await asyncio.sleep(_seconds_until(SCAN_HOUR))
-            if start_scan("all"):
-                print("[Task] Daily scan started", flush=True)
+            full = _is_full_scan_day()
+            if start_scan("all", full):
+                print(f"[Task] Daily {'full ' if full else ''}scan started", flush=True)
             else:
                 print("[Task] Daily scan skipped — a scan is already running", flush=True)
     except asyncio.CancelledError:
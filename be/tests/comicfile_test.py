@@ -132,7 +132,96 @@ def test_comicfile_directory_page_out_of_range(tmp_path):
 
 
 # ---------------------------------------------------------------------------
-# create_open() cached accessor
+# page_index() / seed()
+# ---------------------------------------------------------------------------
+
+def test_zip_page_index(tmp_path):
+    path = tmp_path / "mixed.zip"
+    jpeg = make_jpeg_bytes()
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("1.png", jpeg, compress_type=zipfile.ZIP_STORED)
+        zf.writestr("0.jpg", jpeg, compress_type=zipfile.ZIP_DEFLATED)
+    with comicfile.ZipComicfile(str(path)) as cf:
+        pages = cf.page_index()
+    assert [p["name"] for p in pages] == ["0.jpg", "1.png"]
+    assert [p["stored"] for p in pages] == [False, True]
+    assert pages[1]["mediaType"] == "image/png"
+    assert pages[1]["compressSize"] == pages[1]["size"] == len(jpeg)
+    with zipfile.ZipFile(path) as zf:
+        assert pages[1]["offset"] == zf.getinfo("1.png").header_offset
+
+
+def test_directory_page_index(tmp_path):
+    d = tmp_path / "dircomic"
+    d.mkdir()
+    (d / "0.jpg").write_bytes(b"abc")
+    with comicfile.DirectoryComicfile(str(d)) as cf:
+        (page,) = cf.page_index()
+    assert page == {
+        "name": "0.jpg", "offset": 0, "compressSize": 3, "size": 3,
+        "mediaType": "image/jpeg", "stored": True,
+    }
+
+
+def test_seed_skips_listing(tmp_path):
+    d = tmp_path / "dircomic"
+    d.mkdir()
+    (d / "0.jpg").write_bytes(b"a")
+    (d / "1.jpg").write_bytes(b"b")
+    cf = comicfile.create(str(d), ["1.jpg"])
+    with cf:
+        assert cf.namelist == ["1.jpg"]
+        assert cf.read(0) == (True, b"b")
+
+
+# ---------------------------------------------------------------------------
+# stored_span()
+# ---------------------------------------------------------------------------
+
+def _read_span(span):
+    path, offset, size = span
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read(size)
+
+
+def test_stored_span_zip_member(tmp_path):
+    path = tmp_path / "stored.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("0.jpg", b"first", compress_type=zipfile.ZIP_STORED)
+        zf.writestr("1.jpg", b"second page", compress_type=zipfile.ZIP_STORED)
+    with comicfile.ZipComicfile(str(path)) as cf:
+        pages = cf.page_index()
+    assert _read_span(comicfile.stored_span(str(path), pages[1], 1)) == b"second page"
+
+
+def test_stored_span_skips_deflated(tmp_path):
+    path = tmp_path / "deflated.zip"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("0.jpg", b"x" * 100)
+    with comicfile.ZipComicfile(str(path)) as cf:
+        (page,) = cf.page_index()
+    assert comicfile.stored_span(str(path), page, 1) is None
+
+
+def test_stored_span_rejects_bad_header(tmp_path):
+    path = tmp_path / "bad.zip"
+    path.write_bytes(b"\0" * 64)
+    page = {"name": "0.jpg", "offset": 0, "compressSize": 4, "size": 4, "stored": True}
+    assert comicfile.stored_span(str(path), page, 1) is None
+
+
+def test_stored_span_directory(tmp_path):
+    d = tmp_path / "dircomic"
+    d.mkdir()
+    (d / "0.jpg").write_bytes(b"abc")
+    with comicfile.DirectoryComicfile(str(d)) as cf:
+        (page,) = cf.page_index()
+    assert comicfile.stored_span(str(d), page, 1) == (str(d / "0.jpg"), 0, 3)
+
+
+# ---------------------------------------------------------------------------
+# create_open() and the ArchivePool
 # ---------------------------------------------------------------------------
 
 def test_create_open_returns_opened_comic(tmp_path):
@@ -148,9 +237,90 @@ def test_create_open_nonexistent_returns_none():
     assert result is None
 
 
-def test_create_open_cached(tmp_path):
-    path = tmp_path / "cached.zip"
-    make_zip_comic(str(path), pages=1)
-    cf1 = comicfile.create_open(str(path))
-    cf2 = comicfile.create_open(str(path))
-    assert cf1 is cf2
+class TestArchivePool:
+    def _zips(self, tmp_path, n):
+        paths = []
+        for i in range(n):
+            path = tmp_path / f"{i}.zip"
+            make_zip_comic(str(path), pages=1)
+            paths.append(str(path))
+        return paths
+
+    def test_reuses_handle(self, tmp_path):
+        pool = comicfile.ArchivePool(2, 60)
+        (path,) = self._zips(tmp_path, 1)
+        with pool.lease(path) as cf1:
+            pass
+        with pool.lease(path) as cf2:
+            assert cf2.read(0)[0]
+        assert cf1 is cf2
+        assert pool.stats()["hits"] == 1
+        assert pool.stats()["misses"] == 1
+
+    def test_nonexistent_yields_none(self):
+        pool = comicfile.ArchivePool(2, 60)
+        with pool.lease("/nonexistent/path.zip") as cf:
+            assert cf is None
+        assert pool.stats()["open"] == 0
+
+    def test_lru_eviction_closes_handle(self, tmp_path):
+        pool = comicfile.ArchivePool(2, 60)
+        a, b, c = self._zips(tmp_path, 3)
+        with pool.lease(a) as cf_a:
+            pass
+        with pool.lease(b):
+            pass
+        with pool.lease(a):
+            pass  # a is now most recently used
+        with pool.lease(c):
+            pass
+        stats = pool.stats()
+        assert stats["open"] == 2
+        assert stats["evictions"] == 1
+        assert cf_a._opened
+        with pool.lease(b) as cf_b:
+            pass
+        assert pool.stats()["misses"] == 4  # b was the one evicted
+        assert cf_b._opened
+
+    def test_leased_handle_survives_eviction(self, tmp_path):
+        pool = comicfile.ArchivePool(1, 60)
+        a, b = self._zips(tmp_path, 2)
+        with pool.lease(a) as cf_a:
+            with pool.lease(b):
+                pass
+            assert pool.stats()["evictions"] == 1
+            assert cf_a._opened
+            assert cf_a.read(0)[0]
+        assert not cf_a._opened
+
+    def test_evict_defers_close_until_release(self, tmp_path):
+        pool = comicfile.ArchivePool(4, 60)
+        (path,) = self._zips(tmp_path, 1)
+        with pool.lease(path) as cf:
+            pool.evict(path)
+            assert cf._opened
+        assert not cf._opened
+        assert pool.stats()["open"] == 0
+
+    def test_idle_handles_expire(self, tmp_path):
+        pool = comicfile.ArchivePool(4, 0)
+        a, b = self._zips(tmp_path, 2)
+        with pool.lease(a) as cf_a:
+            pass
+        with pool.lease(b):
+            pass
+        assert not cf_a._opened
+        assert pool.stats()["open"] == 1
+
+    def test_leased_handle_does_not_pin_idle_ones(self, tmp_path):
+        pool = comicfile.ArchivePool(4, 0)
+        a, b, c = self._zips(tmp_path, 3)
+        with pool.lease(a):
+            with pool.lease(b) as cf_b:
+                pass
+            # a is leased and oldest; the idle b behind it still expires.
+            with pool.lease(c):
+                pass
+            assert not cf_b._opened
+            assert pool.stats()["open"] == 2
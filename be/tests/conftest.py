@@ -1,4 +1,5 @@
 import io
+import os
 import zipfile
 from datetime import datetime
 
@@ -10,7 +11,10 @@ from sqlmodel.pool import StaticPool
 
 import comicfile
 import db
+import dir_size
 import global_data
+import page_cache
+import prefetch
 from model import ComicEntity, VideoEntity
 
 
@@ -32,6 +36,12 @@ def make_zip_comic(path, pages: int = 3) -> None:
             zf.writestr(f"{i:04d}.jpg", jpeg)
 
 
+def bump_mtime(path) -> None:
+    # The kernel's mtime clock is coarse; force a visibly different stamp.
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
 # ---------------------------------------------------------------------------
 # DB entity helpers (plain functions – call from tests with the session fixture)
 # ---------------------------------------------------------------------------
@@ -44,10 +54,9 @@ def insert_comic(
     page: int = 3,
     **kwargs,
 ) -> ComicEntity:
-    comic = ComicEntity(
-        id=id, name=name, path=path, size=1000,
-        updateTime=datetime.now(), page=page, **kwargs,
-    )
+    kwargs.setdefault("updateTime", datetime.now())
+    kwargs.setdefault("size", 1000)
+    comic = ComicEntity(id=id, name=name, path=path, page=page, **kwargs)
     session.add(comic)
     session.commit()
     return comic
@@ -61,9 +70,9 @@ def insert_video(
     duration: int = 60,
     **kwargs,
 ) -> VideoEntity:
+    kwargs.setdefault("updateTime", datetime.now())
     video = VideoEntity(
-        id=id, name=name, path=path, size=1000,
-        updateTime=datetime.now(), durationInSecond=duration, **kwargs,
+        id=id, name=name, path=path, size=1000, durationInSecond=duration, **kwargs,
     )
     session.add(video)
     session.commit()
@@ -93,6 +102,20 @@ class MockComicfile:
             return False, None
         return True, make_jpeg_bytes()
 
+    def open_page(self, page_idx: int):
+        if page_idx >= self._pages:
+            return None
+        buf = make_jpeg_bytes()
+        return io.BytesIO(buf), len(buf)
+
+    def page_index(self):
+        return [
+            {"name": n, "offset": 0, "compressSize": 1, "size": 1,
+             "mediaType": comicfile.mediaTypes.get(os.path.splitext(n)[1].lower(), "image/jpeg"),
+             "stored": False}
+            for n in self._namelist
+        ]
+
     def close(self):
         pass
 
@@ -104,13 +127,25 @@ class MockComicfile:
 @pytest.fixture(autouse=True)
 def clear_module_caches():
     from core.scan_progress import progress
-    comicfile.comic_cache.clear()
+    comicfile.pool.clear()
     progress.reset()
     yield
-    comicfile.comic_cache.clear()
+    comicfile.pool.clear()
     progress.reset()
 
 
+@pytest.fixture(autouse=True)
+def size_filler(monkeypatch):
+    # A fresh background size filler per test, stopped before the next one.
+    # It has no workers unless a test opts in (``size_filler.workers = 1``):
+    # a background writer would race the tests' own queries on the shared
+    # in-memory connection.
+    filler = dir_size.SizeFiller(0)
+    monkeypatch.setattr(dir_size, "filler", filler)
+    yield filler
+    filler.shutdown()
+
+
 @pytest.fixture
 def engine_and_client(tmp_path, monkeypatch):
     test_engine = create_engine(
@@ -127,6 +162,10 @@ def engine_and_client(tmp_path, monkeypatch):
     monkeypatch.setattr(global_data.Config, "nginx_comic_path", str(tmp_path / "comics"))
     monkeypatch.setattr(global_data.Config, "nginx_video_path", str(tmp_path / "videos"))
     monkeypatch.setattr(global_data.Config, "nginx_image_path", str(tmp_path / "images"))
+    monkeypatch.setattr(page_cache, "cache", page_cache.PageCache(str(tmp_path / "pages"), 1 << 30))
+    monkeypatch.setattr(page_cache, "narrow", page_cache.NarrowPages(1024))
+    # Read-ahead runs on background threads; tests opt in with their own.
+    monkeypatch.setattr(prefetch, "prefetcher", prefetch.Prefetcher(0, 1 << 30))
 
     def get_session_override():
         with Session(test_engine) as session:
@@ -163,15 +202,15 @@ def session(engine_and_client):
 
 # Standalone engine fixture for task tests (no HTTP client needed).
 @pytest.fixture
-def task_engine(monkeypatch):
-    engine = create_engine(
-        "sqlite://",
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-    )
+def task_engine(tmp_path, monkeypatch):
+    # A file database behind the app's own engine setup: the scan pipeline
+    # reaches the database from several threads at once (id reservation, the
+    # writer), which needs a connection each, as in production.
+    engine = db.create_sqlite_engine(str(tmp_path / "task.sqlite"))
     SQLModel.metadata.create_all(engine)
     monkeypatch.setattr(db, "engine", engine)
-    return engine
+    yield engine
+    engine.dispose()
 
 
 @pytest.fixture
@@ -1,6 +1,7 @@
 from datetime import datetime
 from unittest.mock import patch
 
+import comicfile
 import global_data
 from conftest import MockComicfile, insert_comic, make_jpeg_bytes
 from loader import ComicLoader
@@ -122,6 +123,219 @@ class TestGetPage:
         img = Image.open(io.BytesIO(r.content))
         assert img.width == 10
 
+    def test_resized_variant_served_from_disk_cache(self, client, session):
+        insert_comic(session, 1, page=3)
+        mock_cf = MockComicfile(pages=3)
+        with patch("comicfile.create_open", return_value=mock_cf):
+            first = client.get("/api/comics/1/pages/1?width=5")
+        # The second request never opens the archive.
+        with patch("comicfile.create_open", side_effect=AssertionError("opened")):
+            second = client.get("/api/comics/1/pages/1?width=5")
+        assert second.status_code == 200
+        assert second.headers["content-type"] == "image/webp"
+        assert second.headers["etag"] == first.headers["etag"]
+        assert second.content == first.content
+
+    def test_cached_variant_handed_to_nginx(self, client, session, monkeypatch):
+        monkeypatch.setattr(global_data.Config, "page_cache_accel", "/_pages/")
+        insert_comic(session, 1, page=3)
+        with patch("comicfile.create_open", return_value=MockComicfile(pages=3)):
+            client.get("/api/comics/1/pages/1?width=5")
+        r = client.get("/api/comics/1/pages/1?width=5")
+        assert r.headers["x-accel-redirect"].startswith("/_pages/")
+        assert r.headers["x-accel-redirect"].endswith(".webp")
+        assert r.content == b""
+
+    def test_seeds_open_with_page_index(self, client, session):
+        insert_comic(session, 1, page=3)
+        with patch("comicfile.create_open", return_value=MockComicfile(pages=3)):
+            client.get("/api/comics/1/pages/1")
+        comicfile.pool.clear()
+        with patch("comicfile.create_open", return_value=MockComicfile(pages=3)) as opened:
+            assert client.get("/api/comics/1/pages/2").status_code == 200
+            # Past the end is known from the index, without opening anything.
+            assert client.get("/api/comics/1/pages/9").status_code == 404
+        assert opened.call_count == 1
+        assert opened.call_args.args[1] == ["0000.jpg", "0001.jpg", "0002.jpg"]
+
+    def test_stored_page_streamed_from_file(self, client, session, tmp_path):
+        from conftest import make_zip_comic
+        f = tmp_path / "stored.zip"
+        make_zip_comic(str(f), pages=2)
+        insert_comic(session, 1, page=2, path=str(f))
+        first = client.get("/api/comics/1/pages/2")
+        comicfile.pool.clear()
+        with patch("comicfile.create_open", side_effect=AssertionError("opened")):
+            second = client.get("/api/comics/1/pages/2")
+        assert second.status_code == 200
+        assert second.content == first.content == make_jpeg_bytes()
+        assert second.headers["content-length"] == str(len(first.content))
+        assert second.headers["content-type"] == "image/jpeg"
+        assert second.headers["etag"] == first.headers["etag"]
+
+    def test_compressed_page_streamed_with_range(self, client, session, tmp_path):
+        import zipfile
+        f = tmp_path / "deflated.zip"
+        payload = make_jpeg_bytes()
+        with zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("0.jpg", payload)
+        insert_comic(session, 1, page=1, path=str(f))
+        r = client.get("/api/comics/1/pages/1", headers={"range": "bytes=10-"})
+        assert r.status_code == 206
+        assert r.content == payload[10:]
+        assert r.headers["content-range"] == f"bytes 10-{len(payload) - 1}/{len(payload)}"
+        # The streamed response handed its archive lease back once sent.
+        assert comicfile.pool.stats()["leased"] == 0
+
+    def test_resized_page_supports_range(self, client, session):
+        insert_comic(session, 1, page=3)
+        with patch("comicfile.create_open", return_value=MockComicfile(pages=3)):
+            full = client.get("/api/comics/1/pages/1?width=5")
+            part = client.get("/api/comics/1/pages/1?width=5", headers={"range": "bytes=0-3"})
+        assert part.status_code == 206
+        assert part.content == full.content[:4]
+
+    def test_next_pages_read_ahead(self, client, session, tmp_path, monkeypatch):
+        import zipfile
+        import prefetch
+        monkeypatch.setattr(prefetch, "prefetcher", prefetch.Prefetcher(2, 1 << 20))
+        f = tmp_path / "deflated.zip"
+        with zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as zf:
+            for i in range(4):
+                zf.writestr(f"{i}.jpg", make_jpeg_bytes())
+        insert_comic(session, 1, page=4, path=str(f))
+        assert client.get("/api/comics/1/pages/1").status_code == 200
+        prefetch.prefetcher.wait(5)
+        comicfile.pool.clear()
+        with patch("comicfile.create_open", side_effect=AssertionError("opened")):
+            r = client.get("/api/comics/1/pages/3")
+        assert r.status_code == 200
+        assert r.content == make_jpeg_bytes()
+        prefetch.prefetcher.wait(5)
+        assert prefetch.prefetcher.stats()["hits"] == 1
+        prefetch.prefetcher.shutdown()
+
+    def test_original_size_page_not_cached(self, client, session):
+        import page_cache
+        insert_comic(session, 1, page=3)
+        with patch("comicfile.create_open", return_value=MockComicfile(pages=3)):
+            client.get("/api/comics/1/pages/1?width=100")
+        assert page_cache.cache.stats()["entries"] == 0
+
+    def test_narrow_page_not_decoded_again(self, client, session):
+        insert_comic(session, 1, page=3)
+        with patch("comicfile.create_open", return_value=MockComicfile(pages=3)):
+            first = client.get("/api/comics/1/pages/1?width=100")
+            with patch("api.comicpage.Image.open", side_effect=AssertionError("decoded")):
+                second = client.get("/api/comics/1/pages/1?width=100")
+        assert second.status_code == 200
+        assert second.headers["content-type"] == first.headers["content-type"]
+        assert second.content == first.content
+
+
+class TestRenderPage:
+    # ``client`` for its fresh page cache.
+    ARGS = (1, "/comics/a.zip", datetime(2024, 1, 1), ["0.jpg"], [{"name": "0.jpg", "mediaType": "image/jpeg"}])
+
+    def test_reads_cached_variant(self, client):
+        import page_cache
+        from api.comicpage import render_page
+        from page_cache import variant_key
+        page_cache.cache.put(variant_key("comics", 1, 1, self.ARGS[2], 5), b"webp")
+        with patch("comicfile.create_open", side_effect=AssertionError("opened")):
+            assert render_page(*self.ARGS, 1, 5) == (b"webp", "image/webp")
+
+    def test_resizes_on_page_cpu(self, client):
+        import page_cache
+        from api.comicpage import render_page
+        from core.executors import page_cpu
+        before = page_cpu.stats()["completed"]
+        with patch("comicfile.create_open", return_value=MockComicfile(pages=1)):
+            body, media_type = render_page(*self.ARGS, 1, 5)
+        assert media_type == "image/webp"
+        assert page_cpu.stats()["completed"] == before + 1
+        assert page_cache.cache.stats()["entries"] == 1
+
+
+# ---------------------------------------------------------------------------
+# GET /api/comics/{id}/pages (batch)
+# ---------------------------------------------------------------------------
+
+def _parts(r):
+    """Split a multipart/mixed batch into [(headers, body)]."""
+    boundary = r.headers["content-type"].split("boundary=")[1].encode()
+    parts = []
+    for chunk in r.content.split(b"--" + boundary)[1:]:
+        if chunk.startswith(b"--"):
+            break
+        head, _, body = chunk[2:].partition(b"\r\n\r\n")
+        headers = dict(line.split(": ", 1) for line in head.decode().split("\r\n"))
+        parts.append((headers, body[:-2]))
+    return parts
+
+
+class TestGetBatch:
+    def test_returns_requested_pages(self, client, session):
+        insert_comic(session, 1, page=5)
+        with patch("comicfile.create_open", return_value=MockComicfile(pages=5)) as opened:
+            r = client.get("/api/comics/1/pages?start=2&end=4")
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("multipart/mixed; boundary=")
+        parts = _parts(r)
+        assert [h["X-Page"] for h, _ in parts] == ["2", "3", "4"]
+        for headers, body in parts:
+            assert body == make_jpeg_bytes()
+            assert headers["Content-Length"] == str(len(body))
+            assert headers["Content-Type"] == "image/jpeg"
+        assert opened.call_count == 1
+
+    def test_clamps_end_to_last_page(self, client, session):
+        insert_comic(session, 1, page=3)
+        with patch("comicfile.create_open", return_value=MockComicfile(pages=3)):
+            r = client.get("/api/comics/1/pages?start=2&end=10")
+        assert [h["X-Page"] for h, _ in _parts(r)] == ["2", "3"]
+
+    def test_resizes_to_width(self, client, session):
+        import io
+        from PIL import Image
+        insert_comic(session, 1, page=2)
+        with patch("comicfile.create_open", return_value=MockComicfile(pages=2)):
+            r = client.get("/api/comics/1/pages?start=1&end=2&width=5")
+        for headers, body in _parts(r):
+            assert headers["Content-Type"] == "image/webp"
+            assert Image.open(io.BytesIO(body)).width == 5
+
+    def test_uses_cached_variants(self, client, session):
+        insert_comic(session, 1, page=2)
+        with patch("comicfile.create_open", return_value=MockComicfile(pages=2)):
+            first = client.get("/api/comics/1/pages?start=1&end=2&width=5")
+        comicfile.pool.clear()
+        with patch("comicfile.create_open", side_effect=AssertionError("opened")), \
+                patch("api.comicpage.Image.open", side_effect=AssertionError("decoded")):
+            second = client.get("/api/comics/1/pages?start=1&end=2&width=5")
+        assert _parts(second) == _parts(first)
+
+    def test_narrow_page_not_decoded_again(self, client, session):
+        insert_comic(session, 1, page=2)
+        with patch("comicfile.create_open", return_value=MockComicfile(pages=2)):
+            client.get("/api/comics/1/pages?start=1&end=2&width=100")
+            with patch("api.comicpage.Image.open", side_effect=AssertionError("decoded")):
+                r = client.get("/api/comics/1/pages?start=1&end=2&width=100")
+        assert [h["Content-Type"] for h, _ in _parts(r)] == ["image/jpeg", "image/jpeg"]
+
+    def test_rejects_bad_ranges(self, client, session):
+        insert_comic(session, 1, page=3)
+        with patch("comicfile.create_open", return_value=MockComicfile(pages=3)):
+            assert client.get("/api/comics/1/pages?start=3&end=2").status_code == 400
+            assert client.get("/api/comics/1/pages?start=1&end=500").status_code == 400
+            assert client.get("/api/comics/1/pages?start=4&end=5").status_code == 404
+
+    def test_file_not_found(self, client, session):
+        insert_comic(session, 1, page=3)
+        with patch("comicfile.create_open", return_value=None):
+            r = client.get("/api/comics/1/pages?start=1&end=2")
+        assert r.status_code == 404
+
 
 # ---------------------------------------------------------------------------
 # PUT /api/comics/{id}/progress
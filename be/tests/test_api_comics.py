@@ -1,3 +1,4 @@
+import os
 from datetime import datetime
 from unittest.mock import patch
 
@@ -5,7 +6,7 @@ from unittest.mock import patch
 import comicfile
 from conftest import MockComicfile, insert_comic, make_zip_comic
 from loader import ComicLoader
-from model import ComicEntity
+from model import ComicEntity, path_digest
 from util import PathState
 
 
@@ -55,6 +56,65 @@ class TestGetAll:
         r = client.get("/api/comics?fileMiss=false")
         assert len(r.json()) == 1
 
+    def test_total_count_header(self, client, session):
+        for i in range(3):
+            insert_comic(session, i + 1, f"{i}.zip")
+        insert_comic(session, 4, "gone.zip", missing=True)
+        r = client.get("/api/comics?top=1")
+        assert r.headers["X-Total-Count"] == "3"
+
+    def test_cursor_pages_through_ties(self, client, session):
+        # Same updateTime everywhere: id breaks the tie, nothing repeats or drops.
+        same = datetime(2024, 1, 1)
+        for i in range(5):
+            insert_comic(session, i + 1, f"{i}.zip", updateTime=same)
+        seen, cursor = [], None
+        while True:
+            url = "/api/comics?top=2" + (f"&cursor={cursor}" if cursor else "")
+            r = client.get(url)
+            seen += [c["id"] for c in r.json()]
+            cursor = r.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+        assert seen == [5, 4, 3, 2, 1]
+
+    def test_cursor_orders_by_update_time(self, client, session):
+        insert_comic(session, 1, "old.zip", updateTime=datetime(2024, 1, 1))
+        insert_comic(session, 2, "new.zip", updateTime=datetime(2024, 6, 1))
+        r = client.get("/api/comics?top=1")
+        assert [c["name"] for c in r.json()] == ["new.zip"]
+        r = client.get(f"/api/comics?top=1&cursor={r.headers['X-Next-Cursor']}")
+        assert [c["name"] for c in r.json()] == ["old.zip"]
+        assert "X-Next-Cursor" not in r.headers
+
+    def test_invalid_cursor(self, client):
+        r = client.get("/api/comics?cursor=not-a-cursor")
+        assert r.status_code == 400
+
+    def test_fields_projection(self, client, session):
+        insert_comic(session, 1, "a.zip", page=7)
+        r = client.get("/api/comics?fields=name,page")
+        assert r.status_code == 200
+        assert r.json() == [{"id": 1, "name": "a.zip", "page": 7}]
+        assert r.headers["X-Total-Count"] == "1"
+
+    def test_fields_projection_with_cursor(self, client, session):
+        for i in range(3):
+            insert_comic(session, i + 1, f"{i}.zip", updateTime=datetime(2024, 1, i + 1))
+        r = client.get("/api/comics?fields=name&top=2")
+        assert [c["id"] for c in r.json()] == [3, 2]
+        r = client.get(f"/api/comics?fields=name&top=2&cursor={r.headers['X-Next-Cursor']}")
+        assert r.json() == [{"id": 1, "name": "0.zip"}]
+
+    def test_unknown_field(self, client):
+        r = client.get("/api/comics?fields=name,bogus")
+        assert r.status_code == 400
+
+    def test_excluded_field_rejected(self, client):
+        r = client.get("/api/comics?fields=name,pathDigest")
+        assert r.status_code == 400
+        assert "pathDigest" in r.json()["msg"]
+
 
 # ---------------------------------------------------------------------------
 # GET /api/comics/{id}
@@ -95,6 +155,29 @@ class TestDetail:
         assert r.status_code == 200
         assert len(r.json()["pageDetails"]) == 3
 
+    def test_served_from_page_index(self, client, session):
+        insert_comic(session, 1, page=3)
+        with patch("comicfile.create_open", return_value=MockComicfile(pages=3)):
+            client.get("/api/comics/1/detail")
+        comicfile.pool.clear()
+        with patch("comicfile.create_open", side_effect=AssertionError("opened")):
+            r = client.get("/api/comics/1/detail")
+        assert [p["name"] for p in r.json()["pageDetails"]] == [
+            "0000.jpg", "0001.jpg", "0002.jpg"
+        ]
+
+    def test_stale_page_index_rebuilt(self, client, session):
+        comic = insert_comic(session, 1, page=3)
+        with patch("comicfile.create_open", return_value=MockComicfile(pages=3)):
+            client.get("/api/comics/1/detail")
+        comicfile.pool.clear()
+        comic.updateTime = datetime(2030, 1, 1)
+        session.add(comic)
+        session.commit()
+        with patch("comicfile.create_open", return_value=MockComicfile(pages=5)):
+            r = client.get("/api/comics/1/detail")
+        assert len(r.json()["pageDetails"]) == 5
+
 
 # ---------------------------------------------------------------------------
 # POST /DELETE /api/comics/{id}/favor
@@ -136,6 +219,22 @@ class TestRefresh:
         assert r.status_code == 200
         assert r.json()["page"] == 4
 
+    def test_rewritten_archive_reindexed(self, client, session, tmp_path):
+        path = tmp_path / "comic.zip"
+        make_zip_comic(str(path), pages=3)
+        insert_comic(session, 1, name="comic.zip", path=str(path), page=3)
+        assert client.get("/api/comics/1/pages/3").status_code == 200  # pools the handle
+        make_zip_comic(str(path), pages=5)
+        st = path.stat()
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        with patch.object(ComicLoader, "gen_comic_cover", return_value=True):
+            assert client.post("/api/comics/1/refresh").json()["page"] == 5
+        with comicfile.pool.lease(str(path)) as cf:
+            assert cf.page == 5
+        assert client.get("/api/comics/1/pages/5").status_code == 200
+        r = client.get("/api/comics/1/detail")
+        assert len(r.json()["pageDetails"]) == 5
+
     def test_not_found(self, client):
         r = client.post("/api/comics/999/refresh")
         assert r.status_code == 404
@@ -169,6 +268,9 @@ class TestRename:
         assert r.status_code == 200
         assert r.json()["name"] == "new.zip"
         assert (tmp_path / "new.zip").exists()
+        # The scan must see the new path as known, not as a new file.
+        session.expire_all()
+        assert session.get(ComicEntity, 1).pathDigest == path_digest(str(tmp_path / "new.zip"))
 
     def test_same_name(self, client, session, tmp_path):
         f = tmp_path / "test.zip"
@@ -206,11 +308,12 @@ class TestRename:
         f = tmp_path / "cached.zip"
         make_zip_comic(str(f))
         insert_comic(session, 1, name="cached.zip", path=str(f))
-        comicfile.create_open(str(f))
-        assert len(comicfile.comic_cache) == 1
+        with comicfile.pool.lease(str(f)):
+            pass
+        assert comicfile.pool.stats()["open"] == 1
         r = client.post("/api/comics/1/rename", json={"name": "renamed.zip"})
         assert r.status_code == 200
-        assert len(comicfile.comic_cache) == 0
+        assert comicfile.pool.stats()["open"] == 0
 
 
 # ---------------------------------------------------------------------------
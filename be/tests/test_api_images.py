@@ -13,8 +13,10 @@ def make_entity(id=1, name="album", path="/nonexistent/album", page=3, **kwargs)
 @pytest.fixture(autouse=True)
 def clear_store():
     img_api._store.clear()
+    img_api._listings.clear()
     yield
     img_api._store.clear()
+    img_api._listings.clear()
 
 
 def set_store(*entities: ImageEntity):
@@ -23,7 +25,7 @@ def set_store(*entities: ImageEntity):
 
 
 @pytest.fixture
-def scan_env(tmp_path, monkeypatch):
+def scan_env(tmp_path, monkeypatch, task_engine):
     """Fixture providing separate scan_path and nginx_path under tmp_path."""
     import global_data
     scan_dir = tmp_path / "scan"
@@ -60,7 +62,7 @@ class TestBootstrap:
         img_api.bootstrap()
         assert len(img_api._store) == 1
 
-    def test_nonexistent_scan_path_skipped(self, monkeypatch):
+    def test_nonexistent_scan_path_skipped(self, monkeypatch, task_engine):
         import global_data
         monkeypatch.setattr(global_data.Config.Image, "scan_pathes", ["/nonexistent/xyz"])
         img_api.bootstrap()
@@ -139,6 +141,89 @@ class TestBootstrap:
         assert names == ["chapter1", "chapter1"]
 
 
+class TestPersistence:
+    def _album(self, scan_env, name):
+        d = scan_env / name
+        d.mkdir()
+        (d / "a.jpg").write_bytes(make_jpeg_bytes())
+        return d
+
+    def test_ids_and_state_survive_rebootstrap(self, scan_env):
+        self._album(scan_env, "b")
+        img_api.bootstrap()
+        entity = img_api._store[1]
+        entity.favorited, entity.lastViewedPosition, entity.coverPosition = True, 1, 1
+        img_api._save(entity)
+        self._album(scan_env, "a")  # sorts first, but must not take id 1
+        img_api.bootstrap()
+        assert img_api._store[1].name == "b"
+        assert img_api._store[1].favorited
+        assert (img_api._store[1].lastViewedPosition, img_api._store[1].coverPosition) == (1, 1)
+        assert img_api._store[2].name == "a"
+
+    def test_rebootstrap_keeps_live_entities(self, scan_env):
+        self._album(scan_env, "album")
+        img_api.bootstrap()
+        entity = img_api._store[1]
+        # Stands in for a favor committed after the walk read the table.
+        entity.favorited = True
+        (scan_env / "album" / "b.jpg").write_bytes(make_jpeg_bytes())
+        img_api.bootstrap()
+        assert img_api._store[1] is entity
+        assert entity.favorited
+        assert entity.page == 2
+
+    def test_removed_folder_flagged_missing_and_restored(self, scan_env, task_session):
+        import shutil
+        d = self._album(scan_env, "album")
+        img_api.bootstrap()
+        img_api._store[1].favorited = True
+        img_api._save(img_api._store[1])
+        moved = shutil.move(str(d), str(scan_env.parent / "elsewhere"))
+        img_api.bootstrap()
+        assert len(img_api._store) == 0
+        assert task_session.get(ImageEntity, 1).missing
+        shutil.move(moved, str(d))
+        img_api.bootstrap()
+        assert img_api._store[1].favorited
+        assert not img_api._store[1].missing
+
+    def test_sizes_filled_in_background(self, scan_env, task_session, size_filler):
+        size_filler.workers = 1
+        d = self._album(scan_env, "album")
+        img_api.bootstrap()
+        assert img_api._store[1].size == 0
+        assert size_filler.wait(5)
+        expected = (d / "a.jpg").stat().st_size
+        assert img_api._store[1].size == expected
+        assert task_session.get(ImageEntity, 1).size == expected
+
+    def test_load_serves_persisted_albums(self, scan_env):
+        self._album(scan_env, "a")
+        self._album(scan_env, "b")
+        img_api.bootstrap()
+        img_api._store.clear()
+        img_api.load()
+        assert sorted(e.name for e in img_api._store.values()) == ["a", "b"]
+
+    def test_api_changes_written_through(self, client, session, tmp_path):
+        d = tmp_path / "album"
+        d.mkdir()
+        (d / "a.jpg").write_bytes(make_jpeg_bytes())
+        set_store(make_entity(id=1, path=str(d), page=1))
+        client.post("/api/images/1/favor")
+        client.put("/api/images/1/progress", json={"position": 1})
+        row = session.get(ImageEntity, 1)
+        assert row.favorited and row.lastViewedPosition == 1
+        client.post("/api/images/1/rename", json={"name": "renamed"})
+        session.expire_all()
+        assert session.get(ImageEntity, 1).path == str(tmp_path / "renamed")
+        client.delete("/api/images/1/favor")
+        client.delete("/api/images/1")
+        session.expire_all()
+        assert session.get(ImageEntity, 1) is None
+
+
 class TestGetAll:
     def test_empty(self, client):
         r = client.get("/api/images")
@@ -192,6 +277,28 @@ class TestGetPage:
         assert r.status_code == 200
         assert r.headers["content-type"].startswith("image/")
 
+    def test_folder_listed_once_across_pages(self, client, tmp_path, monkeypatch):
+        d = tmp_path / "album"
+        d.mkdir()
+        for name in ("001.jpg", "002.jpg", "003.jpg"):
+            (d / name).write_bytes(make_jpeg_bytes())
+        set_store(make_entity(id=1, path=str(d), page=3))
+        calls = []
+        monkeypatch.setattr(img_api._listings, "_list_files", lambda p: calls.append(p) or img_api._image_files(p))
+        for page in (1, 2, 3):
+            assert client.get(f"/api/images/1/pages/{page}").status_code == 200
+        assert calls == [str(d)]
+
+    def test_range_request(self, client, tmp_path):
+        d = tmp_path / "album"
+        d.mkdir()
+        (d / "001.jpg").write_bytes(b"0123456789")
+        set_store(make_entity(id=1, path=str(d), page=1))
+        r = client.get("/api/images/1/pages/1", headers={"range": "bytes=2-4"})
+        assert r.status_code == 206
+        assert r.content == b"234"
+        assert r.headers["content-range"] == "bytes 2-4/10"
+
     def test_out_of_range_returns_404(self, client, tmp_path):
         d = tmp_path / "album"
         d.mkdir()
@@ -238,6 +345,19 @@ class TestGetPage:
         img = Image.open(io.BytesIO(r.content))
         assert img.width == 5
 
+    def test_narrow_image_served_from_file_after_first_decode(self, client, tmp_path):
+        from unittest.mock import patch
+        d = tmp_path / "album"
+        d.mkdir()
+        (d / "001.jpg").write_bytes(make_jpeg_bytes())  # 10x10
+        set_store(make_entity(id=1, path=str(d), page=1))
+        client.get("/api/images/1/pages/1?width=100")
+        with patch("api.comicpage.Image.open", side_effect=AssertionError("decoded")):
+            r = client.get("/api/images/1/pages/1?width=100")
+        assert r.status_code == 200
+        assert r.headers["content-type"] == "image/jpeg"
+        assert r.content == (d / "001.jpg").read_bytes()
+
     def test_missing_image_returns_404(self, client):
         assert client.get("/api/images/999/pages/1").status_code == 404
 
@@ -307,6 +427,20 @@ class TestRefresh:
         assert r.status_code == 200
         assert r.json()["page"] == 2
 
+    def test_moves_album_in_list_order(self, client, tmp_path):
+        d = tmp_path / "album"
+        d.mkdir()
+        (d / "001.jpg").write_bytes(make_jpeg_bytes())
+        stale = make_entity(id=1, path=str(d))
+        stale.updateTime = datetime(2000, 1, 1)
+        other = make_entity(id=2, name="b")
+        other.updateTime = datetime(2010, 1, 1)
+        set_store(stale, other)
+        assert client.get("/api/images").json()[0]["id"] == 2
+        client.post("/api/images/1/refresh")
+        # Picks up the folder's real (current) mtime, newer than album 2's.
+        assert client.get("/api/images").json()[0]["id"] == 1
+
     def test_missing_returns_404(self, client):
         assert client.post("/api/images/999/refresh").status_code == 404
 
@@ -328,6 +462,15 @@ class TestRename:
         set_store(make_entity(id=1, name="album", path=str(d)))
         assert client.post("/api/images/1/rename", json={"name": "album"}).status_code == 400
 
+    def test_name_of_another_album_returns_400(self, client, tmp_path):
+        d = tmp_path / "a" / "mine"
+        d.mkdir(parents=True)
+        set_store(make_entity(id=1, name="mine", path=str(d)),
+                  make_entity(id=2, name="theirs", path="/elsewhere/theirs"))
+        r = client.post("/api/images/1/rename", json={"name": "theirs"})
+        assert r.status_code == 400
+        assert d.exists()
+
     def test_missing_returns_404(self, client):
         assert client.post("/api/images/999/rename", json={"name": "x"}).status_code == 404
 
@@ -388,6 +531,14 @@ class TestDeletePage:
         assert (d / "c.jpg").exists()
         assert img_api._store[1].page == 2
 
+    def test_listing_reflects_deletion(self, client, tmp_path, monkeypatch):
+        d = self._album(tmp_path, monkeypatch)
+        set_store(make_entity(id=1, path=str(d), page=3))
+        assert len(client.get("/api/images/1/detail").json()["pageDetails"]) == 3
+        client.delete("/api/images/1/pages/1")
+        names = [p["name"] for p in client.get("/api/images/1/detail").json()["pageDetails"]]
+        assert names == ["b.jpg", "c.jpg"]
+
     def test_bumps_update_time(self, client, tmp_path, monkeypatch):
         d = self._album(tmp_path, monkeypatch)
         old = datetime(2000, 1, 1)
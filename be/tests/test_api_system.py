@@ -150,6 +150,57 @@ class TestTasksStatus:
         body = r.json()
         assert body["backup"]["backup_count"] == 2
         assert body["backup"]["last_backup"] is not None
+        assert body["backup"]["last_size"] == 1
+
+    def test_reports_last_backup_run(self, client, tmp_path, monkeypatch):
+        import sqlite3
+        import tasks.backup
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(tasks.backup, "_last_result", None)
+        conn = sqlite3.connect(tmp_path / "prod.sqlite")
+        conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY)")
+        conn.commit()
+        conn.close()
+        assert client.post("/api/debug/backup-now").json()["status"] == "success"
+        backup = client.get("/api/system/tasks").json()["backup"]
+        assert backup["backup_count"] == 1
+        assert backup["last_size"] > 0
+        assert backup["last_duration_seconds"] is not None
+        assert backup["last_error"] is None
+
+
+class TestArchivePoolStatus:
+    def test_counts_page_reads(self, client, session, tmp_path):
+        import zipfile
+        from conftest import insert_comic, make_jpeg_bytes
+        f = tmp_path / "a.zip"
+        # Deflated, so every page read goes through the open archive.
+        with zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("0.jpg", make_jpeg_bytes())
+            zf.writestr("1.jpg", make_jpeg_bytes())
+        insert_comic(session, 1, name="a.zip", path=str(f))
+        before = client.get("/api/system/archives").json()
+        for page in (1, 2):
+            assert client.get(f"/api/comics/1/pages/{page}").status_code == 200
+        body = client.get("/api/system/archives").json()
+        assert body["open"] == 1
+        assert body["leased"] == 0
+        assert body["misses"] - before["misses"] == 1
+        assert body["hits"] - before["hits"] == 1
+
+
+class TestExecutorsStatus:
+    def test_page_requests_use_page_executors(self, client, session, tmp_path):
+        from conftest import insert_comic, make_zip_comic
+        f = tmp_path / "a.zip"
+        make_zip_comic(str(f), pages=1)
+        insert_comic(session, 1, name="a.zip", path=str(f))
+        before = client.get("/api/system/executors").json()
+        assert client.get("/api/comics/1/pages/1?width=5").status_code == 200
+        after = client.get("/api/system/executors").json()
+        assert after["page_io"]["completed"] > before["page_io"]["completed"]
+        assert after["page_cpu"]["completed"] == before["page_cpu"]["completed"] + 1
+        assert after["page_io"]["queued"] == 0
 
 
 class TestSecondsUntil:
@@ -183,7 +234,7 @@ class TestDailyScanLoop:
         from tasks import scan
 
         started = []
-        with patch("api.system.start_scan", side_effect=lambda mt: started.append(mt) or True), \
+        with patch("api.system.start_scan", side_effect=lambda mt, full: started.append(mt) or True), \
              patch("tasks.scan._seconds_until", return_value=0):
             async def run():
                 task = asyncio.create_task(scan.daily_scan_loop())
@@ -218,6 +269,33 @@ class TestDailyScanLoop:
         assert mock_start.called
 
 
+    def test_full_scan_on_full_scan_weekday(self):
+        self._reset()
+        from tasks import scan
+
+        with patch("api.system.start_scan", return_value=True) as mock_start, \
+             patch("tasks.scan._seconds_until", return_value=0), \
+             patch("tasks.scan._is_full_scan_day", return_value=True):
+            async def run():
+                task = asyncio.create_task(scan.daily_scan_loop())
+                await asyncio.sleep(0.05)
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+            asyncio.run(run())
+
+        mock_start.assert_called_with("all", True)
+
+    def test_full_scan_day_is_the_configured_weekday(self):
+        from tasks.scan import FULL_SCAN_WEEKDAY, _is_full_scan_day
+        monday = datetime.date(2026, 6, 15)
+        days = [monday + datetime.timedelta(days=i) for i in range(7)]
+        assert [_is_full_scan_day(d) for d in days] == [i == FULL_SCAN_WEEKDAY for i in range(7)]
+
+
 class TestBackupNow:
     def test_backup_now_success(self, client, tmp_path, monkeypatch):
         monkeypatch.chdir(tmp_path)
@@ -1,3 +1,4 @@
+from datetime import datetime
 from unittest.mock import patch
 
 from conftest import insert_video
@@ -26,6 +27,21 @@ class TestGetAll:
         r = client.get("/api/videos?top=3")
         assert len(r.json()) == 3
 
+    def test_cursor_and_total(self, client, session):
+        for i in range(3):
+            insert_video(session, i + 1, f"{i}.mp4", updateTime=datetime(2024, 1, i + 1))
+        r = client.get("/api/videos?top=2")
+        assert r.headers["X-Total-Count"] == "3"
+        assert [v["id"] for v in r.json()] == [3, 2]
+        r = client.get(f"/api/videos?top=2&cursor={r.headers['X-Next-Cursor']}")
+        assert [v["id"] for v in r.json()] == [1]
+        assert "X-Next-Cursor" not in r.headers
+
+    def test_fields_projection(self, client, session):
+        insert_video(session, 1, "a.mp4", duration=90)
+        r = client.get("/api/videos?fields=durationInSecond")
+        assert r.json() == [{"id": 1, "durationInSecond": 90}]
+
 
 # ---------------------------------------------------------------------------
 # GET /api/videos/{id}
@@ -0,0 +1,66 @@
+import io
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+from conftest import make_jpeg_bytes
+from cover_engine import CoverEngine, encode_cover
+
+
+def make_large_jpeg() -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (900, 1200), color=(10, 20, 30)).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+def test_encode_cover_thumbnails_to_jpeg():
+    img = Image.open(io.BytesIO(encode_cover(make_large_jpeg())))
+    assert img.format == "JPEG"
+    assert img.size == (225, 300)
+
+
+def test_inline_when_disabled():
+    engine = CoverEngine(workers=0, timeout=1)
+    assert engine.encode(make_jpeg_bytes())[:2] == b"\xff\xd8"
+    assert engine._pool is None
+
+
+class TestProcessPool:
+    @pytest.fixture
+    def engine(self):
+        engine = CoverEngine(workers=1, timeout=10)
+        yield engine
+        engine.shutdown()
+
+    def test_encodes_in_worker(self, engine):
+        img = Image.open(io.BytesIO(engine.encode(make_large_jpeg())))
+        assert img.size == (225, 300)
+
+    def test_bad_image_raises(self, engine):
+        with pytest.raises(Exception):
+            engine.encode(b"not an image")
+        # The pool survives an ordinary failure.
+        assert engine.encode(make_jpeg_bytes())[:2] == b"\xff\xd8"
+
+    def test_timeout_recycles_pool(self, engine):
+        engine.encode(make_jpeg_bytes())  # warm the pool up
+        engine.timeout = 0.5
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            engine.run(time.sleep, 30)
+        assert time.monotonic() - started < 10
+        engine.timeout = 10
+        # The stuck worker was killed; a fresh pool serves the next job.
+        assert engine.encode(make_jpeg_bytes())[:2] == b"\xff\xd8"
+
+    def test_timeout_excludes_queue_wait(self, engine):
+        engine.encode(make_jpeg_bytes())  # warm the pool up
+        engine.timeout = 1.5
+        # One worker: the second job queues ~1s behind the first, then runs 1s.
+        first = threading.Thread(target=engine.run, args=(time.sleep, 1))
+        first.start()
+        time.sleep(0.1)
+        assert engine.run(time.sleep, 1) is None
+        first.join()
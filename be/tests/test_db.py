@@ -0,0 +1,115 @@
+"""db.create_sqlite_engine: connection pragmas and reader/writer concurrency."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, SQLModel, func, select
+
+import db
+from model import ComicEntity
+
+
+def make_engine(tmp_path):
+    engine = db.create_sqlite_engine(str(tmp_path / "t.sqlite"))
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def comic(id: int) -> ComicEntity:
+    return ComicEntity(
+        id=id, name=f"{id:06d}.zip" + "x" * 200, path=f"/data/comics/{id:06d}.zip",
+        size=1, updateTime=datetime.now(),
+    )
+
+
+def count(engine) -> int:
+    with Session(engine) as s:
+        return s.exec(select(func.count()).select_from(ComicEntity)).one()
+
+
+def start_big_commit(engine) -> Session:
+    """Open a scan-sized write transaction, spilled to the database file.
+
+    A tiny page cache makes SQLite write dirty pages out before COMMIT, the
+    way a large ``_commit_news`` does; under a rollback journal that takes
+    the exclusive lock that shuts readers out.
+    """
+    writer = Session(engine)
+    writer.connection().exec_driver_sql("PRAGMA cache_size=1")
+    writer.add_all(comic(i) for i in range(2, 400))
+    writer.flush()
+    return writer
+
+
+def test_pragmas_applied(tmp_path):
+    engine = make_engine(tmp_path)
+    with engine.connect() as conn:
+        pragma = lambda name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()  # noqa: E731
+        assert pragma("journal_mode") == "wal"
+        assert pragma("synchronous") == 1  # NORMAL
+        assert pragma("busy_timeout") == db._busy_timeout_ms
+        assert pragma("mmap_size") == db._mmap_size
+    assert engine.pool.size() == db._pool_size
+    engine.dispose()
+
+
+def test_reads_proceed_during_scan_commit(tmp_path):
+    engine = make_engine(tmp_path)
+    with Session(engine) as s:
+        s.add(comic(1))
+        s.commit()
+
+    writer = start_big_commit(engine)
+    try:
+        with ThreadPoolExecutor(1) as pool:
+            # The reader sees the last committed state without waiting.
+            assert pool.submit(count, engine).result(timeout=2) == 1
+        writer.commit()
+    finally:
+        writer.close()
+    assert count(engine) == 399
+    engine.dispose()
+
+
+def test_rollback_journal_blocks_readers(tmp_path, monkeypatch):
+    # The behaviour WAL replaces: the same spilled commit locks readers out.
+    monkeypatch.setattr(db, "_journal_mode", "DELETE")
+    monkeypatch.setattr(db, "_busy_timeout_ms", 100)
+    engine = make_engine(tmp_path)
+    writer = start_big_commit(engine)
+    try:
+        with pytest.raises(OperationalError, match="locked"):
+            count(engine)
+    finally:
+        writer.rollback()
+        writer.close()
+    engine.dispose()
+
+
+def test_writer_waits_for_busy_lock(tmp_path):
+    engine = make_engine(tmp_path)
+    with Session(engine) as s:
+        s.add(comic(1))
+        s.commit()
+
+    writer = start_big_commit(engine)
+    release = threading.Timer(0.3, writer.commit)
+    release.start()
+    try:
+        # A favorite toggle during the scan commit waits out the lock
+        # instead of failing with "database is locked".
+        started = time.monotonic()
+        with Session(engine) as s:
+            entity = s.get(ComicEntity, 1)
+            entity.favorited = True
+            s.commit()
+        assert time.monotonic() - started >= 0.2
+    finally:
+        release.join()
+        writer.close()
+    with Session(engine) as s:
+        assert s.get(ComicEntity, 1).favorited
+    engine.dispose()
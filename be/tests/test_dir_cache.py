@@ -0,0 +1,49 @@
+import os
+
+import dir_cache
+from dir_cache import DirCache
+
+
+class TestDirCache:
+    def test_record_flush_get(self, task_engine):
+        cache = DirCache("comics")
+        cache.record("/lib", (5, {"a.zip": ["f", 1, 2, 3]}), [])
+        assert cache.get("/lib") is None  # queued, not yet written
+        cache.flush()
+        assert cache.get("/lib") == (5, {"a.zip": ["f", 1, 2, 3]})
+        assert DirCache("videos").get("/lib") is None
+
+    def test_flushes_in_batches(self, task_engine, monkeypatch):
+        monkeypatch.setattr(dir_cache, "_BATCH", 2)
+        cache = DirCache("comics")
+        cache.record("/a", (1, {}), [])
+        cache.record("/b", (1, {}), [])
+        assert cache.get("/a") == (1, {})
+
+    def test_upsert_replaces_listing(self, task_engine):
+        cache = DirCache("comics")
+        cache.record("/lib", (1, {}), [])
+        cache.flush()
+        cache.record("/lib", (2, {"b.zip": ["f", 0, 0, 0]}), [])
+        cache.flush()
+        assert cache.get("/lib") == (2, {"b.zip": ["f", 0, 0, 0]})
+
+    def test_drop_removes_subtree_only(self, task_engine):
+        cache = DirCache("comics")
+        for path in ("/lib/a", "/lib/a/x", "/lib/a/x/y", "/lib/ab", "/lib"):
+            cache.record(path.replace("/", os.sep), (1, {}), [])
+        cache.flush()
+        cache.record(os.sep + os.path.join("lib", "a"), None, [])
+        cache.flush()
+        assert cache.get(os.path.join(os.sep, "lib", "a")) is None
+        assert cache.get(os.path.join(os.sep, "lib", "a", "x", "y")) is None
+        assert cache.get(os.path.join(os.sep, "lib", "ab")) == (1, {})
+        assert cache.get(os.sep + "lib") == (1, {})
+
+    def test_modified_listing_held_until_flush_modified(self, task_engine):
+        cache = DirCache("comics")
+        cache.record("/lib", (2, {}), ["/lib/a.zip"])
+        cache.flush()
+        assert cache.get("/lib") is None
+        cache.flush_modified()
+        assert cache.get("/lib") == (2, {})
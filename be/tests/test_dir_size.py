@@ -0,0 +1,108 @@
+import threading
+from datetime import datetime
+
+from sqlmodel import Session
+
+import dir_size
+from conftest import insert_comic
+from dir_size import SCAN, VISIBLE, SizeFiller, path_size
+from model import ComicEntity
+
+
+def test_path_size_sums_tree_without_following_dir_links(tmp_path):
+    (tmp_path / "a.jpg").write_bytes(b"1" * 10)
+    sub = tmp_path / "sub"
+    sub.mkdir()
+    (sub / "b.jpg").write_bytes(b"2" * 20)
+    outside = tmp_path.parent / f"{tmp_path.name}-outside"
+    outside.mkdir()
+    (outside / "big").write_bytes(b"3" * 1000)
+    (tmp_path / "link").symlink_to(outside)
+    assert path_size(str(tmp_path)) == 30
+    assert path_size(str(tmp_path / "a.jpg")) == 10
+    assert path_size(str(tmp_path / "gone")) == 0
+
+
+def test_fills_and_persists_sizes(task_engine, tmp_path, size_filler):
+    size_filler.workers = 1
+    d = tmp_path / "comic"
+    d.mkdir()
+    (d / "0.jpg").write_bytes(b"x" * 42)
+    with Session(task_engine) as s:
+        insert_comic(s, id=1, name="comic", path=str(d))
+    filled = {}
+    filler = dir_size.filler
+    assert filler is size_filler
+    filler.request(ComicEntity, 1, str(d), on_size=filled.__setitem__)
+    assert filler.wait(5)
+    assert filled == {1: 42}
+    with Session(task_engine) as s:
+        assert s.get(ComicEntity, 1).size == 42
+        assert s.get(ComicEntity, 1).sizeKnown
+
+
+def test_visible_entities_go_first(monkeypatch):
+    order = []
+    release = threading.Event()
+
+    def fake_size(path):
+        order.append(path)
+        if path == "first":
+            release.wait(5)
+        return 1
+
+    monkeypatch.setattr(dir_size, "path_size", fake_size)
+    monkeypatch.setattr(SizeFiller, "_store", lambda self, batch: None)
+    filler = SizeFiller(1)
+    filler.request(ComicEntity, 1, "first", SCAN)
+    while not order:
+        threading.Event().wait(0.01)
+    filler.request(ComicEntity, 2, "scanned", SCAN)
+    filler.request(ComicEntity, 3, "shown", SCAN)
+    filler.prioritize(ComicEntity, [{"id": 3, "path": "shown", "sizeKnown": False},
+                                    {"id": 4, "path": "sized", "sizeKnown": True}])
+    filler.request(ComicEntity, 3, "shown", SCAN)  # already queued ahead
+    release.set()
+    assert filler.wait(5)
+    filler.shutdown()
+    assert order == ["first", "shown", "scanned"]
+
+
+def test_paused_holds_writes(task_engine, tmp_path, size_filler):
+    size_filler.workers = 1
+    d = tmp_path / "c"
+    d.mkdir()
+    (d / "0.jpg").write_bytes(b"x" * 5)
+    with Session(task_engine) as s:
+        insert_comic(s, id=1, name="c", path=str(d))
+    with size_filler.paused():
+        size_filler.request(ComicEntity, 1, str(d))
+        assert not size_filler.wait(0.3)
+        with Session(task_engine) as s:
+            assert s.get(ComicEntity, 1).size == 1000
+    assert size_filler.wait(5)
+    with Session(task_engine) as s:
+        assert s.get(ComicEntity, 1).size == 5
+
+
+def test_prioritize_accepts_entities():
+    filler = SizeFiller(0)  # no workers: inspect the queue only
+    unsized = ComicEntity(id=9, name="c", path="/c", size=0, sizeKnown=False, updateTime=datetime.now())
+    empty = ComicEntity(id=10, name="e", path="/e", size=0, updateTime=datetime.now())
+    filler.prioritize(ComicEntity, [unsized, empty])
+    assert list(filler._queued) == [(ComicEntity, 9)]
+    assert filler._queued[(ComicEntity, 9)][:2] == (VISIBLE, "/c")
+
+
+def test_known_empty_size_not_requeued(client, session, tmp_path, size_filler):
+    size_filler.workers = 1
+    d = tmp_path / "empty"
+    d.mkdir()
+    insert_comic(session, id=1, name="empty", path=str(d), sizeKnown=False)
+    client.get("/api/comics")
+    assert size_filler.wait(5)
+    session.expire_all()
+    comic = session.get(ComicEntity, 1)
+    assert (comic.size, comic.sizeKnown) == (0, True)
+    client.get("/api/comics")
+    assert not size_filler._queued and not size_filler._results
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+
+import pytest
+
+from core.executors import BoundedExecutor
+
+
+class TestBoundedExecutor:
+    def test_runs_on_named_pool(self):
+        ex = BoundedExecutor("test-io", 2)
+        name = asyncio.run(ex.run(lambda: threading.current_thread().name))
+        assert name.startswith("test-io")
+        assert ex.stats()["completed"] == 1
+        ex.shutdown()
+
+    def test_worker_count_caps_concurrency(self):
+        ex = BoundedExecutor("test-io", 1)
+        gate = threading.Event()
+        seen = []
+
+        def job(i):
+            gate.wait(5)
+            seen.append((i, ex.stats()))
+
+        async def burst():
+            tasks = [asyncio.ensure_future(ex.run(job, i)) for i in range(3)]
+            await asyncio.sleep(0.05)
+            during = ex.stats()
+            gate.set()
+            await asyncio.gather(*tasks)
+            return during
+
+        during = asyncio.run(burst())
+        assert during["running"] == 1
+        assert during["queued"] == 2
+        assert all(stats["running"] == 1 for _, stats in seen)
+        final = ex.stats()
+        assert (final["queued"], final["running"], final["completed"]) == (0, 0, 3)
+        assert final["peak_queued"] >= 2
+        ex.shutdown()
+
+    def test_call_blocks_on_pool(self):
+        ex = BoundedExecutor("test-cpu", 1)
+        assert ex.call(lambda: threading.current_thread().name).startswith("test-cpu")
+        assert ex.stats()["completed"] == 1
+        ex.shutdown()
+
+    def test_propagates_errors(self):
+        ex = BoundedExecutor("test-io", 1)
+
+        def boom():
+            raise ValueError("nope")
+
+        with pytest.raises(ValueError):
+            asyncio.run(ex.run(boom))
+        assert ex.stats()["running"] == 0
+        ex.shutdown()
+
+    def test_cancelled_queued_job_leaves_queue(self):
+        ex = BoundedExecutor("test-io", 1)
+        gate = threading.Event()
+
+        async def scenario():
+            running = asyncio.ensure_future(ex.run(gate.wait, 5))
+            waiting = asyncio.ensure_future(ex.run(lambda: "never"))
+            await asyncio.sleep(0.05)
+            assert ex.stats()["queued"] == 1
+            waiting.cancel()  # the client went away while queued
+            with pytest.raises(asyncio.CancelledError):
+                await waiting
+            gate.set()
+            await running
+
+        asyncio.run(scenario())
+        stats = ex.stats()
+        assert (stats["queued"], stats["running"], stats["completed"]) == (0, 0, 1)
+        ex.shutdown()
+
+    def test_shutdown_drains_queue(self):
+        ex = BoundedExecutor("test-io", 1)
+        gate = threading.Event()
+
+        async def scenario():
+            running = asyncio.ensure_future(ex.run(gate.wait, 5))
+            waiting = asyncio.ensure_future(ex.run(lambda: "never"))
+            await asyncio.sleep(0.05)
+            ex.shutdown()
+            gate.set()
+            await running
+            with pytest.raises(asyncio.CancelledError):
+                await waiting
+
+        asyncio.run(scenario())
+        assert ex.stats()["queued"] == 0
@@ -0,0 +1,125 @@
+import os
+from datetime import datetime
+
+from image_store import ImageStore, ListingCache
+from model import ImageEntity, path_digest
+
+
+def album(id, name=None, when=datetime(2024, 1, 1), path=None) -> ImageEntity:
+    name = name or f"a{id}"
+    return ImageEntity(id=id, name=name, path=path or f"/img/{name}", size=0, updateTime=when)
+
+
+def ids(entities):
+    return [e.id for e in entities]
+
+
+def test_newest_first_with_top():
+    store = ImageStore()
+    store.replace([album(1, when=datetime(2024, 1, 1)), album(2, when=datetime(2024, 3, 1)),
+                   album(3, when=datetime(2024, 2, 1))])
+    assert ids(store.newest()) == [2, 3, 1]
+    assert ids(store.newest(2)) == [2, 3]
+    assert store.newest(0) == []
+    assert ids(store.newest(10)) == [2, 3, 1]
+
+
+def test_ties_keep_id_order():
+    store = ImageStore()
+    store.replace([album(3), album(1), album(2)])
+    assert ids(store.newest()) == [1, 2, 3]
+
+
+def test_set_update_time_reorders():
+    store = ImageStore()
+    a, b = album(1, when=datetime(2024, 1, 1)), album(2, when=datetime(2024, 2, 1))
+    store.replace([a, b])
+    store.set_update_time(a, datetime(2024, 3, 1))
+    assert ids(store.newest()) == [1, 2]
+    assert a.updateTime == datetime(2024, 3, 1)
+    assert len(store.newest()) == 2
+
+
+def test_rename_updates_indexes():
+    store = ImageStore()
+    a = album(1, "old")
+    store.add(a)
+    assert store.name_taken("old")
+    assert not store.name_taken("old", except_id=1)
+    store.rename(a, "new", "/img/new")
+    assert not store.name_taken("old")
+    assert store.name_taken("new")
+    assert store.id_for_path("/img/new") == 1
+    assert store.id_for_path("/img/old") is None
+    assert a.pathDigest == path_digest("/img/new")
+
+
+def test_shared_names_across_scan_paths():
+    store = ImageStore()
+    store.replace([album(1, "same", path="/a/same"), album(2, "same", path="/b/same")])
+    store.remove(1)
+    assert store.name_taken("same")
+    assert store.id_for_path("/b/same") == 2
+    assert ids(store.newest()) == [2]
+
+
+def test_add_replaces_same_id():
+    store = ImageStore()
+    store.add(album(1, "x"))
+    store.add(album(1, "y"))
+    assert len(store) == 1
+    assert not store.name_taken("x")
+    assert ids(store.newest()) == [1]
+
+
+def test_mapping_helpers():
+    store = ImageStore()
+    store.update({1: album(1), 2: album(2)})
+    assert store.keys() == [1, 2]
+    assert 1 in store and store[1].id == 1
+    assert store.get(3) is None
+    store.clear()
+    assert len(store) == 0 and store.newest() == []
+
+
+def counting_lister(calls):
+    def list_files(path):
+        calls.append(path)
+        return sorted(os.listdir(path))
+    return list_files
+
+
+def test_listing_cached_within_ttl(tmp_path):
+    (tmp_path / "1.jpg").write_bytes(b"x")
+    calls = []
+    cache = ListingCache(counting_lister(calls), ttl=60)
+    assert cache.get(str(tmp_path)) == ["1.jpg"]
+    (tmp_path / "2.jpg").write_bytes(b"x")
+    assert cache.get(str(tmp_path)) == ["1.jpg"]
+    assert len(calls) == 1
+    cache.invalidate(str(tmp_path))
+    assert cache.get(str(tmp_path)) == ["1.jpg", "2.jpg"]
+    assert len(calls) == 2
+
+
+def test_listing_revalidated_by_folder_mtime(tmp_path):
+    (tmp_path / "1.jpg").write_bytes(b"x")
+    calls = []
+    cache = ListingCache(counting_lister(calls), ttl=0)
+    cache.get(str(tmp_path))
+    cache.get(str(tmp_path))
+    assert len(calls) == 1  # mtime unchanged: no relisting
+    (tmp_path / "2.jpg").write_bytes(b"x")
+    os.utime(tmp_path, ns=(0, os.stat(tmp_path).st_mtime_ns + 1))
+    assert cache.get(str(tmp_path)) == ["1.jpg", "2.jpg"]
+    assert len(calls) == 2
+
+
+def test_listing_seed_and_capacity(tmp_path):
+    calls = []
+    cache = ListingCache(counting_lister(calls), ttl=60, capacity=2)
+    for name in "abc":
+        cache.seed(f"/img/{name}", [f"{name}.jpg"], 1)
+    assert cache.get("/img/c") == ["c.jpg"]
+    assert calls == []
+    assert len(cache._entries) == 2 and "/img/a" not in cache._entries
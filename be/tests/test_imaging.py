@@ -0,0 +1,34 @@
+import io
+
+from PIL import Image
+
+from imaging import downscale
+
+
+def _open(fmt: str, size=(2000, 3000)) -> Image.Image:
+    buf = io.BytesIO()
+    Image.new("RGB", size, (200, 100, 50)).save(buf, fmt)
+    return Image.open(io.BytesIO(buf.getvalue()))
+
+
+def test_jpeg_fits_target():
+    img = downscale(_open("JPEG"), (300, 300))
+    assert img.size == (200, 300)
+
+
+def test_jpeg_uses_reduced_scale_decode():
+    img = _open("JPEG")
+    downscale(img, (800, 1200))
+    # draft() switched the decoder to 1/2 scale before anything was decoded.
+    assert img.decoderconfig == (2, 0)
+    assert img.size == (800, 1200)
+
+
+def test_png_fits_target():
+    img = downscale(_open("PNG"), (800, 1200))
+    assert img.size == (800, 1200)
+
+
+def test_small_image_untouched():
+    img = downscale(_open("JPEG", (100, 150)), (300, 300))
+    assert img.size == (100, 150)
@@ -1,14 +1,18 @@
 from datetime import datetime
+import json
+import os
 from unittest.mock import MagicMock, patch
 
 import pytest
+from sqlalchemy import insert
 from sqlmodel import Session, select
 
 import comicfile
 import global_data
+import loader as loader_mod
 from conftest import insert_comic, make_zip_comic
 from loader import ComicLoader, VideoLoader, scan
-from model import ComicEntity, VideoEntity
+from model import ComicEntity, ComicPageIndexEntity, ScanDirEntity, VideoEntity
 
 
 # ---------------------------------------------------------------------------
@@ -61,18 +65,40 @@ class TestScan:
 # ComicLoader
 # ---------------------------------------------------------------------------
 
-class TestComicLoaderInit:
-    def test_empty_db_starts_at_zero(self, task_engine):
-        loader = ComicLoader()
-        assert loader._starting_id == 0
+class TestComicLoaderIds:
+    def test_empty_db_starts_at_one(self, task_engine):
+        assert ComicLoader()._get_id() == 1
 
-    def test_existing_db_picks_up_max_id(self, task_session, task_engine):
+    def test_starts_past_existing_max_id(self, task_session, task_engine):
         for i in [3, 7, 2]:
             task_session.add(ComicEntity(id=i, name=f"{i}.zip", path=f"/{i}.zip",
                                          size=0, updateTime=datetime.now(), page=1))
         task_session.commit()
+        assert ComicLoader()._get_id() == 8
+
+    def test_concurrent_loaders_never_collide(self, task_engine):
+        # A scan and an image convert each run their own loader.
+        a, b = ComicLoader(), ComicLoader()
+        ids = [a._get_id(), b._get_id(), a._get_id(), b._get_id()]
+        assert len(set(ids)) == 4
+        assert ids[2] == ids[0] + 1  # a keeps drawing from its own block
+
+    def test_each_thread_has_its_own_block(self, task_engine):
+        from concurrent.futures import ThreadPoolExecutor
+        loader = ComicLoader()
+        loader.id_block = 4
+        with ThreadPoolExecutor(4) as pool:
+            ids = list(pool.map(lambda _: loader._get_id(), range(40)))
+        assert len(set(ids)) == 40
+
+    def test_deleted_ids_are_not_reused(self, task_session, task_engine):
         loader = ComicLoader()
-        assert loader._starting_id == 7
+        loader.id_block = 1
+        first = loader._get_id()
+        insert_comic(task_session, first, path="/a.zip")
+        task_session.delete(task_session.get(ComicEntity, first))
+        task_session.commit()
+        assert loader._get_id() == first + 1
 
 
 class TestComicLoaderLoadOld:
@@ -86,22 +112,30 @@ class TestComicLoaderLoadOld:
 
     def test_empty_returns_empty(self, task_engine):
         loader = ComicLoader()
-        assert loader._load_old() == []
+        assert len(loader._load_old()) == 0
 
 
 class TestComicLoaderLoad:
-    def test_adds_comic_to_db(self, task_engine, tmp_path):
+    def test_adds_comic_to_db(self, task_engine, tmp_path, monkeypatch):
         f = tmp_path / "new.zip"
         make_zip_comic(str(f), pages=2)
+        monkeypatch.setattr(global_data.Config, "nginx_comic_path", str(tmp_path))
         loader = ComicLoader()
-        with patch.object(ComicLoader, "gen_comic_cover", return_value=True):
-            loader.load(str(f))
+        loader.load(str(f))
         with Session(task_engine) as s:
             comics = s.exec(select(ComicEntity)).all()
             assert len(comics) == 1
             assert comics[0].path == str(f)
             assert comics[0].page == 2
 
+    def test_reserves_a_single_id(self, task_engine, tmp_path, monkeypatch):
+        monkeypatch.setattr(global_data.Config, "nginx_comic_path", str(tmp_path))
+        for name in ("a.zip", "b.zip"):
+            make_zip_comic(str(tmp_path / name))
+            ComicLoader().load(str(tmp_path / name))
+        with Session(task_engine) as s:
+            assert sorted(c.id for c in s.exec(select(ComicEntity))) == [1, 2]
+
     def test_raises_on_duplicate_path(self, task_session, task_engine, tmp_path):
         f = tmp_path / "dup.zip"
         make_zip_comic(str(f))
@@ -112,12 +146,12 @@ class TestComicLoaderLoad:
 
 
 class TestComicLoaderToEntity:
-    def test_success(self, task_engine, tmp_path):
+    def test_success(self, task_engine, tmp_path, monkeypatch):
         f = tmp_path / "comic.zip"
         make_zip_comic(str(f), pages=3)
+        monkeypatch.setattr(global_data.Config, "nginx_comic_path", str(tmp_path))
         loader = ComicLoader()
-        with patch.object(ComicLoader, "gen_comic_cover", return_value=True):
-            entity = loader._to_entity(str(f))
+        entity = loader._to_entity(str(f))
         assert entity is not None
         assert entity.page == 3
         assert entity.path == str(f)
@@ -216,6 +250,35 @@ class TestComicLoaderWork:
             comics = s.exec(select(ComicEntity)).all()
             assert len(comics) == 1
 
+    def test_directory_comic_size_filled_in_background(
+        self, task_engine, tmp_path, monkeypatch, size_filler
+    ):
+        size_filler.workers = 1
+        d = tmp_path / "dircomic"
+        d.mkdir()
+        (d / "0.jpg").write_bytes(b"x" * 30)
+        (d / "1.jpg").write_bytes(b"y" * 12)
+        monkeypatch.setattr(global_data.Config.Comic, "scan_pathes", [str(tmp_path)])
+        monkeypatch.setattr(global_data.Config, "nginx_comic_path", str(tmp_path))
+        ComicLoader().work()
+        assert size_filler.wait(5)
+        with Session(task_engine) as s:
+            assert s.exec(select(ComicEntity)).one().size == 42
+
+    def test_work_requeues_rows_left_unsized(self, task_session, task_engine, tmp_path,
+                                             monkeypatch, size_filler):
+        # A size whose write failed earlier is picked up by the next scan.
+        size_filler.workers = 1
+        d = tmp_path / "dircomic"
+        d.mkdir()
+        (d / "0.jpg").write_bytes(b"x" * 7)
+        insert_comic(task_session, id=1, name="dircomic", path=str(d), size=0, sizeKnown=False)
+        monkeypatch.setattr(global_data.Config.Comic, "scan_pathes", [str(tmp_path)])
+        ComicLoader().work()
+        assert size_filler.wait(5)
+        with Session(task_engine) as s:
+            assert s.get(ComicEntity, 1).size == 7
+
     def test_work_skips_if_no_files(self, task_engine, tmp_path, monkeypatch):
         monkeypatch.setattr(global_data.Config.Comic, "scan_pathes", [str(tmp_path)])
         loader = ComicLoader()
@@ -239,11 +302,149 @@ class TestComicLoaderWork:
             assert len(s.exec(select(ComicEntity)).all()) == 1
 
 
+class TestScanPipeline:
+    def _setup(self, tmp_path, monkeypatch, n):
+        lib = tmp_path / "lib"
+        lib.mkdir()
+        for i in range(n):
+            make_zip_comic(str(lib / f"{i}.zip"), pages=1)
+        monkeypatch.setattr(global_data.Config.Comic, "scan_pathes", [str(lib)])
+        cover_dir = tmp_path / "covers"
+        cover_dir.mkdir()
+        monkeypatch.setattr(global_data.Config, "nginx_comic_path", str(cover_dir))
+        return cover_dir
+
+    def test_commits_in_batches(self, task_engine, tmp_path, monkeypatch):
+        self._setup(tmp_path, monkeypatch, 5)
+        monkeypatch.setattr(ComicLoader, "commit_batch", 2)
+        with patch.object(ComicLoader, "_commit_news", autospec=True,
+                          side_effect=ComicLoader._commit_news) as commit:
+            ComicLoader().work()
+        assert sorted(len(c.args[1]) for c in commit.call_args_list) == [1, 2, 2]
+        with Session(task_engine) as s:
+            assert len(s.exec(select(ComicEntity)).all()) == 5
+
+    def test_generates_covers(self, task_engine, tmp_path, monkeypatch):
+        cover_dir = self._setup(tmp_path, monkeypatch, 2)
+        ComicLoader().work()
+        # Parse workers draw ids from their own blocks, so match the covers
+        # against the committed ids rather than assuming 1 and 2.
+        with Session(task_engine) as s:
+            ids = s.exec(select(ComicEntity.id)).all()
+        assert sorted(p.name for p in cover_dir.iterdir()) == sorted(f"{i}_0.jpg" for i in ids)
+        assert len(ids) == 2
+
+    def test_failed_batch_keeps_other_batches(self, task_engine, tmp_path, monkeypatch):
+        self._setup(tmp_path, monkeypatch, 4)
+        monkeypatch.setattr(ComicLoader, "commit_batch", 2)
+        real_commit = ComicLoader._commit_news
+        calls = []
+
+        def flaky_commit(self, news):
+            calls.append(len(news))
+            if len(calls) == 1:
+                raise RuntimeError("disk full")
+            real_commit(self, news)
+
+        monkeypatch.setattr(ComicLoader, "_commit_news", flaky_commit)
+        global_data.err_message.clear()
+        ComicLoader().work()
+        with Session(task_engine) as s:
+            assert len(s.exec(select(ComicEntity)).all()) == 2
+        assert any("disk full" in m for m in global_data.err_message)
+        global_data.err_message.clear()
+
+    def test_skips_unreadable_archives(self, task_engine, tmp_path, monkeypatch):
+        self._setup(tmp_path, monkeypatch, 2)
+        (tmp_path / "lib" / "bad.zip").write_bytes(b"not a zip")
+        ComicLoader().work()
+        with Session(task_engine) as s:
+            assert len(s.exec(select(ComicEntity)).all()) == 2
+
+    def test_stores_page_index(self, task_engine, tmp_path, monkeypatch):
+        self._setup(tmp_path, monkeypatch, 2)
+        ComicLoader().work()
+        with Session(task_engine) as s:
+            comics = {c.id: c for c in s.exec(select(ComicEntity)).all()}
+            rows = s.exec(select(ComicPageIndexEntity)).all()
+            assert sorted(r.comicId for r in rows) == sorted(comics)
+            for row in rows:
+                assert row.updateTime == comics[row.comicId].updateTime
+                (page,) = json.loads(row.pages)
+                assert page["name"] == "0000.jpg"
+                assert page["mediaType"] == "image/jpeg"
+
+
+class TestComicLoaderIncrementalWork:
+    def _setup(self, tmp_path, monkeypatch):
+        lib = tmp_path / "lib"
+        lib.mkdir()
+        monkeypatch.setattr(global_data.Config.Comic, "scan_pathes", [str(lib)])
+        cover_dir = tmp_path / "covers"
+        cover_dir.mkdir()
+        monkeypatch.setattr(global_data.Config, "nginx_comic_path", str(cover_dir))
+        return lib
+
+    def test_persists_dir_listings(self, task_engine, tmp_path, monkeypatch):
+        lib = self._setup(tmp_path, monkeypatch)
+        make_zip_comic(str(lib / "a.zip"), pages=1)
+        with patch.object(ComicLoader, "gen_comic_cover", return_value=True):
+            ComicLoader().work()
+        with Session(task_engine) as s:
+            rows = s.exec(select(ScanDirEntity)).all()
+            assert [(r.scope, r.path) for r in rows] == [("comics", str(lib))]
+
+    def test_refreshes_modified_comic(self, task_engine, tmp_path, monkeypatch):
+        lib = self._setup(tmp_path, monkeypatch)
+        f = lib / "a.zip"
+        make_zip_comic(str(f), pages=1)
+        with patch.object(ComicLoader, "gen_comic_cover", return_value=True):
+            ComicLoader().work()
+            st = os.stat(lib)
+            make_zip_comic(str(f), pages=4)
+            # Rewritten in place: the directory's own mtime does not move, so
+            # only a full scan looks at the file again.
+            os.utime(lib, ns=(st.st_atime_ns, st.st_mtime_ns))
+            ComicLoader().work()
+            with Session(task_engine) as s:
+                assert s.exec(select(ComicEntity.page)).one() == 1
+            ComicLoader(full=True).work()
+        with Session(task_engine) as s:
+            comic = s.exec(select(ComicEntity).where(ComicEntity.path == str(f))).one()
+            assert comic.page == 4
+            assert comic.size == f.stat().st_size
+            row = s.get(ComicPageIndexEntity, comic.id)
+            assert row.updateTime == comic.updateTime
+            assert len(json.loads(row.pages)) == 4
+
+    def test_drops_vanished_dir_listings(self, task_engine, tmp_path, monkeypatch):
+        lib = self._setup(tmp_path, monkeypatch)
+        sub = lib / "sub"
+        sub.mkdir()
+        make_zip_comic(str(sub / "a.zip"), pages=1)
+        make_zip_comic(str(lib / "b.zip"), pages=1)
+        with patch.object(ComicLoader, "gen_comic_cover", return_value=True):
+            ComicLoader().work()
+            (sub / "a.zip").unlink()
+            sub.rmdir()
+            ComicLoader().work()
+        with Session(task_engine) as s:
+            paths = [r.path for r in s.exec(select(ScanDirEntity)).all()]
+            assert paths == [str(lib)]
+
+
+def reconcile(loader, pathes) -> int:
+    with loader._stage_present() as present:
+        for path in pathes:
+            present.add(path)
+        return loader._reconcile_missing(present)
+
+
 class TestReconcileMissing:
     def test_flags_gone_keeps_present(self, task_session, task_engine):
         insert_comic(task_session, id=1, name="here.zip", path="/lib/here.zip")
         insert_comic(task_session, id=2, name="gone.zip", path="/lib/gone.zip")
-        ComicLoader()._reconcile_missing({"/lib/here.zip"})
+        reconcile(ComicLoader(), {"/lib/here.zip"})
         with Session(task_engine) as s:
             assert not s.get(ComicEntity, 1).missing
             assert s.get(ComicEntity, 2).missing
@@ -251,7 +452,7 @@ class TestReconcileMissing:
     def test_clears_when_file_reappears(self, task_session, task_engine):
         insert_comic(task_session, id=1, name="back.zip",
                      path="/lib/back.zip", missing=True)
-        ComicLoader()._reconcile_missing({"/lib/back.zip"})
+        reconcile(ComicLoader(), {"/lib/back.zip"})
         with Session(task_engine) as s:
             assert not s.get(ComicEntity, 1).missing
 
@@ -259,7 +460,7 @@ class TestReconcileMissing:
         # Archived rows are deliberate "deleted file, kept record" tombstones.
         insert_comic(task_session, id=1, name="arch.zip",
                      path="/lib/arch.zip", archived=True)
-        ComicLoader()._reconcile_missing({"/somewhere/else.zip"})
+        reconcile(ComicLoader(), {"/somewhere/else.zip"})
         with Session(task_engine) as s:
             assert not s.get(ComicEntity, 1).missing
 
@@ -269,12 +470,38 @@ class TestReconcileMissing:
         insert_comic(task_session, id=1, name="x.zip",
                      path="/lib/x.zip", missing=True)
         insert_comic(task_session, id=2, name="y.zip", path="/lib/y.zip")
-        ComicLoader()._reconcile_missing(set())
+        reconcile(ComicLoader(), set())
         with Session(task_engine) as s:
             # nothing changes: neither flagged nor cleared
             assert s.get(ComicEntity, 1).missing
             assert not s.get(ComicEntity, 2).missing
 
+    def test_returns_changed_count_and_is_repeatable(self, task_session, task_engine):
+        insert_comic(task_session, id=1, name="a.zip", path="/lib/a.zip")
+        insert_comic(task_session, id=2, name="b.zip", path="/lib/b.zip", missing=True)
+        insert_comic(task_session, id=3, name="c.zip", path="/lib/c.zip")
+        loader = ComicLoader()
+        # a gone, b back, c unchanged
+        assert reconcile(loader, {"/lib/b.zip", "/lib/c.zip"}) == 2
+        # The staging table is dropped, so a second pass works and finds
+        # nothing left to change.
+        assert reconcile(loader, {"/lib/b.zip", "/lib/c.zip"}) == 0
+
+    def test_large_listing(self, task_session, task_engine):
+        # More paths than one staging chunk.
+        n = loader_mod._STAGE_CHUNK + 5_000
+        with task_engine.begin() as conn:
+            conn.execute(insert(ComicEntity), [
+                {"id": i, "name": f"{i}.zip", "path": f"/lib/{i}.zip", "size": 0,
+                 "updateTime": datetime.now()}
+                for i in range(1, n + 1)
+            ])
+        present = {f"/lib/{i}.zip" for i in range(1, n + 1) if i % 5}
+        assert reconcile(ComicLoader(), present) == n // 5
+        with Session(task_engine) as s:
+            flagged = s.exec(select(ComicEntity.id).where(ComicEntity.missing == True)).all()  # noqa: E712
+            assert sorted(flagged) == list(range(5, n + 1, 5))
+
     def test_work_flags_missing_even_with_no_new_files(
         self, task_session, task_engine, tmp_path, monkeypatch
     ):
@@ -302,7 +529,7 @@ class TestReconcileMissing:
         task_session.add(VideoEntity(id=2, name="gone.mp4", path="/v/gone.mp4",
                                      size=0, updateTime=datetime.now()))
         task_session.commit()
-        VideoLoader()._reconcile_missing({"/v/here.mp4"})
+        reconcile(VideoLoader(), {"/v/here.mp4"})
         with Session(task_engine) as s:
             assert not s.get(VideoEntity, 1).missing
             assert s.get(VideoEntity, 2).missing
@@ -312,17 +539,16 @@ class TestReconcileMissing:
 # VideoLoader
 # ---------------------------------------------------------------------------
 
-class TestVideoLoaderInit:
-    def test_empty_db(self, task_engine):
-        loader = VideoLoader()
-        assert loader._starting_id == 0
-
-    def test_picks_up_max_id(self, task_session, task_engine):
+class TestVideoLoaderIds:
+    def test_starts_past_existing_max_id(self, task_session, task_engine):
         task_session.add(VideoEntity(id=9, name="v.mp4", path="/v.mp4",
                                      size=0, updateTime=datetime.now()))
         task_session.commit()
-        loader = VideoLoader()
-        assert loader._starting_id == 9
+        assert VideoLoader()._get_id() == 10
+
+    def test_sequence_is_per_table(self, task_session, task_engine):
+        insert_comic(task_session, 50)
+        assert VideoLoader()._get_id() == 1
 
 
 class TestVideoLoaderLoadOld:
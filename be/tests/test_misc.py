@@ -2,6 +2,7 @@
 import asyncio
 from unittest.mock import patch
 
+from sqlmodel.pool import StaticPool
 
 from conftest import insert_comic
 
@@ -46,6 +47,43 @@ def test_ensure_column_adds_and_is_idempotent(monkeypatch):
     assert "flag" in cols()
 
 
+def test_ensure_indexes_backfills_existing_tables(monkeypatch):
+    """A database created before the indexes were declared gets them added,
+    and a second run is a no-op."""
+    from sqlalchemy import create_engine as sa_create_engine
+    import db
+
+    eng = sa_create_engine("sqlite://", poolclass=StaticPool)
+    db.SQLModel.metadata.create_all(eng)
+    names = (
+        "ix_comicentity_name", "ix_comicentity_path", "ix_comicentity_missing_updateTime",
+    )
+    with eng.connect() as conn:
+        # Back to the pre-index schema: the tables, none of the indexes.
+        for name in names:
+            conn.exec_driver_sql(f'DROP INDEX "{name}"')
+        conn.commit()
+    monkeypatch.setattr(db, "engine", eng)
+
+    def indexes():
+        with eng.connect() as conn:
+            return {r[1] for r in conn.exec_driver_sql("PRAGMA index_list(comicentity)")}
+
+    assert indexes().isdisjoint(names)
+    db._ensure_indexes()
+    assert indexes() >= set(names)
+    db._ensure_indexes()
+    with eng.connect() as conn:
+        plan = " ".join(
+            str(r[3]) for r in conn.exec_driver_sql(
+                "EXPLAIN QUERY PLAN SELECT * FROM comicentity WHERE missing = 0"
+                " ORDER BY updateTime DESC, id DESC LIMIT 10"
+            )
+        )
+    assert "ix_comicentity_missing_updateTime" in plan
+    assert "TEMP B-TREE" not in plan
+
+
 # ---------------------------------------------------------------------------
 # core/openapi.py — custom_openapi_schema
 # ---------------------------------------------------------------------------
@@ -0,0 +1,52 @@
+import os
+from datetime import datetime
+
+from page_cache import PageCache, variant_key
+
+
+def test_variant_key_includes_update_time():
+    t1 = datetime(2024, 1, 1)
+    t2 = datetime(2024, 1, 2)
+    assert variant_key("comics", 1, 2, t1, 800) != variant_key("comics", 1, 2, t2, 800)
+    assert variant_key("comics", 1, 2, t1, 800) != variant_key("images", 1, 2, t1, 800)
+
+
+def test_put_then_get(tmp_path):
+    cache = PageCache(str(tmp_path), 1000)
+    assert cache.get("k") is None
+    rel = cache.put("k", b"data")
+    assert cache.get("k") == rel
+    assert (tmp_path / rel).read_bytes() == b"data"
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = PageCache(str(tmp_path), 25)
+    cache.put("a", b"x" * 10)
+    cache.put("b", b"x" * 10)
+    cache.get("a")  # a is now more recent than b
+    cache.put("c", b"x" * 10)
+    assert cache.get("b") is None
+    assert not (tmp_path / cache.relpath("b")).exists()
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats()["bytes"] == 20
+
+
+def test_rebuilds_index_from_disk(tmp_path):
+    first = PageCache(str(tmp_path), 1000)
+    old = first.put("old", b"x" * 10)
+    new = first.put("new", b"x" * 10)
+    os.utime(tmp_path / old, (1, 1))  # least recently used
+    os.utime(tmp_path / new, (2, 2))
+    restarted = PageCache(str(tmp_path), 15)
+    assert restarted.stats()["entries"] == 2
+    restarted.put("third", b"x")
+    assert restarted.get("old") is None
+    assert restarted.get("new") is not None
+
+
+def test_overwrite_does_not_double_count(tmp_path):
+    cache = PageCache(str(tmp_path), 1000)
+    cache.put("k", b"x" * 10)
+    cache.put("k", b"x" * 10)
+    assert cache.stats() == {"entries": 1, "bytes": 10, "max_bytes": 1000}
@@ -0,0 +1,58 @@
+from sqlmodel import Session
+
+import path_index
+from conftest import insert_comic, insert_video
+from model import ComicEntity, VideoEntity, path_digest
+from path_index import PathIndex
+
+
+def test_membership(task_session):
+    insert_comic(task_session, 1, path="/lib/a.zip", pathDigest=path_digest("/lib/a.zip"))
+    insert_comic(task_session, 2, path="/lib/b.zip", pathDigest=path_digest("/lib/b.zip"))
+    index = PathIndex(ComicEntity)
+    assert "/lib/a.zip" in index
+    assert "/lib/b.zip" in index
+    assert "/lib/c.zip" not in index
+    assert len(index) == 2
+
+
+def test_scoped_to_its_table(task_session):
+    insert_video(task_session, 1, path="/lib/a.mp4", pathDigest=path_digest("/lib/a.mp4"))
+    assert "/lib/a.mp4" not in PathIndex(ComicEntity)
+    assert "/lib/a.mp4" in PathIndex(VideoEntity)
+
+
+def test_loads_lazily(task_session, monkeypatch):
+    loads = []
+    monkeypatch.setattr(path_index, "backfill", loads.append)
+    index = PathIndex(ComicEntity)
+    assert loads == []
+    "/x" in index
+    "/y" in index
+    assert loads == [ComicEntity]
+
+
+def test_backfills_rows_without_digest(task_session, task_engine):
+    # Rows from before the column existed, or written around the ORM helpers.
+    insert_comic(task_session, 1, path="/lib/old.zip")
+    assert "/lib/old.zip" in PathIndex(ComicEntity)
+    with Session(task_engine) as s:
+        assert s.get(ComicEntity, 1).pathDigest == path_digest("/lib/old.zip")
+    assert path_index.backfill(ComicEntity) == 0
+
+
+def test_from_path_sets_digest(tmp_path):
+    f = tmp_path / "a.mp4"
+    f.write_bytes(b"x")
+    entity = VideoEntity.from_path(f, 1)
+    assert entity.pathDigest == path_digest(str(f))
+    # Internal: never part of an API response.
+    assert "pathDigest" not in entity.model_dump()
+
+
+def test_digest_is_signed_64_bit():
+    digests = [path_digest(f"/lib/{i}") for i in range(1000)]
+    assert all(-(1 << 63) <= d < (1 << 63) for d in digests)
+    assert len(set(digests)) == 1000
+    assert path_digest("/lib/\udcff") == path_digest("/lib/\udcff")
+
@@ -0,0 +1,75 @@
+import threading
+
+from prefetch import Prefetcher
+
+
+def _load(body=b"page", media_type="image/jpeg"):
+    return lambda: (body, media_type)
+
+
+class TestPrefetcher:
+    def test_scheduled_page_is_served(self):
+        p = Prefetcher(3, 1 << 20)
+        p.schedule((1, 0, 2, None), _load())
+        p.wait()
+        assert p.get((1, 0, 2, None)) == (b"page", "image/jpeg")
+        assert p.get((1, 0, 3, None)) is None
+        stats = p.stats()
+        assert (stats["hits"], stats["misses"], stats["inflight"]) == (1, 1, 0)
+        p.shutdown()
+
+    def test_disabled_window_schedules_nothing(self):
+        p = Prefetcher(0, 1 << 20)
+        p.schedule((1, 0, 2, None), _load())
+        p.wait()
+        assert p.stats()["entries"] == 0
+
+    def test_pending_key_not_loaded_twice(self):
+        p = Prefetcher(3, 1 << 20)
+        gate = threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            gate.wait(5)
+            return b"x", "image/png"
+
+        p.schedule((1, 0, 2, None), slow)
+        p.schedule((1, 0, 2, None), slow)
+        gate.set()
+        p.wait()
+        p.schedule((1, 0, 2, None), slow)  # cached by now
+        p.wait()
+        assert calls == [1]
+        p.shutdown()
+
+    def test_failed_load_is_dropped(self):
+        p = Prefetcher(3, 1 << 20)
+
+        def boom():
+            raise OSError("gone")
+
+        p.schedule((1, 0, 2, None), boom)
+        p.wait()
+        assert p.get((1, 0, 2, None)) is None
+        assert p.stats()["inflight"] == 0
+        p.shutdown()
+
+    def test_per_comic_window(self):
+        p = Prefetcher(2, 1 << 20)
+        for page in range(1, 7):
+            p.put((1, 0, page, None), b"x", "image/jpeg")
+        p.put((2, 0, 1, None), b"x", "image/jpeg")
+        assert [k[2] for k in p._entries if k[0] == 1] == [3, 4, 5, 6]
+        assert p.get((2, 0, 1, None)) is not None
+
+    def test_byte_cap_evicts_least_recent(self):
+        p = Prefetcher(10, 10)
+        p.put((1, 0, 1, None), b"aaaa", "image/jpeg")
+        p.put((2, 0, 1, None), b"bbbb", "image/jpeg")
+        p.get((1, 0, 1, None))
+        p.put((3, 0, 1, None), b"cccc", "image/jpeg")
+        assert p.get((2, 0, 1, None)) is None
+        assert p.get((1, 0, 1, None)) is not None
+        assert p.stats()["bytes"] == 8
+        assert p.stats()["evictions"] == 1
@@ -0,0 +1,161 @@
+import asyncio
+import io
+
+import pytest
+
+from core.streaming import (
+    ZEROCOPY,
+    BytesRangeResponse,
+    FileSpanResponse,
+    RangeNotSatisfiable,
+    StreamResponse,
+    parse_range,
+)
+
+
+def _run(response, scope=None, headers=None):
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    raw = [(k.encode(), v.encode()) for k, v in (headers or {}).items()]
+    scope = {"type": "http", "method": "GET", "headers": raw, **(scope or {})}
+    asyncio.run(response(scope, None, send))
+    return sent
+
+
+def _body(sent):
+    return b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def _headers(sent):
+    return {k.decode(): v.decode() for k, v in sent[0]["headers"]}
+
+
+class TestParseRange:
+    @pytest.mark.parametrize(
+        "header, expected",
+        [
+            ("bytes=0-9", (0, 10)),
+            ("bytes=5-", (5, 100)),
+            ("bytes=-10", (90, 100)),
+            ("bytes=-500", (0, 100)),
+            ("bytes=90-500", (90, 100)),
+            ("bytes=0-1,5-6", None),
+            ("items=0-1", None),
+            ("bytes=-", None),
+            ("bytes=5-2", None),
+        ],
+    )
+    def test_parses(self, header, expected):
+        assert parse_range(header, 100) == expected
+
+    @pytest.mark.parametrize("header", ["bytes=100-", "bytes=-0", "bytes=100-150"])
+    def test_unsatisfiable(self, header):
+        with pytest.raises(RangeNotSatisfiable):
+            parse_range(header, 100)
+
+
+class TestFileSpanResponse:
+    def test_streams_span_in_chunks(self, tmp_path):
+        f = tmp_path / "blob"
+        f.write_bytes(b"headerPAYLOAD-BYTEStrailer")
+        response = FileSpanResponse(str(f), 6, 13, media_type="image/jpeg")
+        response.chunk_size = 4
+        sent = _run(response)
+        assert dict(sent[0]["headers"])[b"content-length"] == b"13"
+        bodies = [m["body"] for m in sent[1:]]
+        assert b"".join(bodies) == b"PAYLOAD-BYTES"
+        assert max(len(b) for b in bodies) == 4
+        assert not sent[-1]["more_body"]
+
+    def test_uses_zerocopy_extension(self, tmp_path):
+        f = tmp_path / "blob"
+        f.write_bytes(b"0123456789")
+        sent = _run(FileSpanResponse(str(f), 2, 5), {"extensions": {ZEROCOPY: {}}})
+        (message,) = sent[1:]
+        assert message["type"] == ZEROCOPY
+        assert (message["offset"], message["count"]) == (2, 5)
+
+    def test_head_sends_no_body(self, tmp_path):
+        f = tmp_path / "blob"
+        f.write_bytes(b"0123456789")
+        sent = _run(FileSpanResponse(str(f), 0, 10), {"method": "HEAD"})
+        assert sent[1]["body"] == b""
+
+    def test_truncated_file_ends_body(self, tmp_path):
+        f = tmp_path / "blob"
+        f.write_bytes(b"0123")
+        sent = _run(FileSpanResponse(str(f), 0, 10))
+        assert _body(sent) == b"0123"
+        assert not sent[-1]["more_body"]
+
+    def test_range_within_span(self, tmp_path):
+        f = tmp_path / "blob"
+        f.write_bytes(b"xx0123456789")
+        sent = _run(FileSpanResponse(str(f), 2, 10), headers={"range": "bytes=3-5"})
+        assert sent[0]["status"] == 206
+        assert _headers(sent)["content-range"] == "bytes 3-5/10"
+        assert _headers(sent)["content-length"] == "3"
+        assert _body(sent) == b"345"
+
+    def test_zerocopy_range(self, tmp_path):
+        f = tmp_path / "blob"
+        f.write_bytes(b"0123456789")
+        sent = _run(
+            FileSpanResponse(str(f), 2, 5),
+            {"extensions": {ZEROCOPY: {}}},
+            {"range": "bytes=1-"},
+        )
+        assert (sent[1]["offset"], sent[1]["count"]) == (3, 4)
+
+
+class TestRangedResponse:
+    def test_full_body_advertises_ranges(self):
+        sent = _run(BytesRangeResponse(b"abcdef", "image/png"))
+        assert sent[0]["status"] == 200
+        assert _headers(sent)["accept-ranges"] == "bytes"
+        assert _headers(sent)["content-length"] == "6"
+        assert _body(sent) == b"abcdef"
+
+    def test_unsatisfiable_range_is_416(self):
+        sent = _run(BytesRangeResponse(b"abcdef"), headers={"range": "bytes=10-"})
+        assert sent[0]["status"] == 416
+        assert _headers(sent)["content-range"] == "bytes */6"
+
+    def test_reversed_range_sends_everything(self):
+        sent = _run(BytesRangeResponse(b"abcdef"), headers={"range": "bytes=4-1"})
+        assert sent[0]["status"] == 200
+        assert _body(sent) == b"abcdef"
+
+    def test_if_range_mismatch_sends_everything(self):
+        response = BytesRangeResponse(b"abcdef", headers={"etag": '"v2"'})
+        sent = _run(response, headers={"range": "bytes=0-1", "if-range": '"v1"'})
+        assert sent[0]["status"] == 200
+        assert _body(sent) == b"abcdef"
+
+    def test_if_range_match_honours_range(self):
+        response = BytesRangeResponse(b"abcdef", headers={"etag": '"v2"'})
+        sent = _run(response, headers={"range": "bytes=0-1", "if-range": '"v2"'})
+        assert sent[0]["status"] == 206
+        assert _body(sent) == b"ab"
+
+
+class TestStreamResponse:
+    def test_streams_range_and_releases(self):
+        released = []
+        stream = io.BytesIO(b"0123456789")
+        response = StreamResponse(stream, 10, on_close=lambda: released.append(1))
+        response.chunk_size = 3
+        sent = _run(response, headers={"range": "bytes=4-8"})
+        assert _body(sent) == b"45678"
+        assert stream.closed
+        assert released == [1]
+
+    def test_releases_when_range_rejected(self):
+        released = []
+        response = StreamResponse(io.BytesIO(b"01"), 2, on_close=lambda: released.append(1))
+        sent = _run(response, headers={"range": "bytes=5-"})
+        assert sent[0]["status"] == 416
+        assert released == [1]
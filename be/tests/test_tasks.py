@@ -1,4 +1,24 @@
 import asyncio
+import gzip
+import sqlite3
+
+import pytest
+
+
+def make_db(path, rows: int = 1):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE IF NOT EXISTS t (id INTEGER PRIMARY KEY, v TEXT)")
+    conn.executemany("INSERT INTO t (v) VALUES (?)", [("x",)] * rows)
+    conn.commit()
+    conn.close()
+
+
+def count_rows(path) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT count(*) FROM t").fetchone()[0]
+    finally:
+        conn.close()
 
 
 # ---------------------------------------------------------------------------
@@ -15,7 +35,7 @@ class TestBackupDatabase:
     def test_creates_backup(self, tmp_path, monkeypatch):
         from tasks.backup import backup_database
         monkeypatch.chdir(tmp_path)
-        (tmp_path / "prod.sqlite").write_bytes(b"db content")
+        make_db(tmp_path / "prod.sqlite")
         asyncio.run(backup_database())
         backups = list((tmp_path / "backups").glob("prod_*.sqlite"))
         assert len(backups) == 1
@@ -23,10 +43,10 @@ class TestBackupDatabase:
     def test_skips_when_unchanged(self, tmp_path, monkeypatch):
         from tasks.backup import backup_database
         monkeypatch.chdir(tmp_path)
-        (tmp_path / "prod.sqlite").write_bytes(b"db content")
+        make_db(tmp_path / "prod.sqlite")
         asyncio.run(backup_database())
         asyncio.run(backup_database())
-        # shutil.copy2 preserves mtime, so second run should be skipped
+        # The backup carries the source's mtime, so the second run is skipped
         backups = list((tmp_path / "backups").glob("prod_*.sqlite"))
         assert len(backups) == 1
 
@@ -42,7 +62,7 @@ class TestBackupDatabase:
             f = backup_dir / f"prod_20200101_00000{i}.sqlite"
             f.write_bytes(b"old")
             os.utime(f, (old_mtime, old_mtime))
-        (tmp_path / "prod.sqlite").write_bytes(b"new content")
+        make_db(tmp_path / "prod.sqlite")
         asyncio.run(backup_database())
         backups = list(backup_dir.glob("prod_*.sqlite"))
         assert len(backups) == 7
@@ -59,7 +79,91 @@ class TestBackupDatabase:
             f = backup_dir / f"prod_20200101_0000{i:02d}.sqlite"
             f.write_bytes(b"old")
             os.utime(f, (old_mtime, old_mtime))
-        (tmp_path / "prod.sqlite").write_bytes(b"content")
+        make_db(tmp_path / "prod.sqlite")
         asyncio.run(backup_database())
         backups = list(backup_dir.glob("prod_*.sqlite"))
         assert len(backups) == 7
+
+    def test_backup_is_a_readable_copy(self, tmp_path, monkeypatch):
+        from tasks.backup import backup_database
+        monkeypatch.chdir(tmp_path)
+        make_db(tmp_path / "prod.sqlite", rows=5)
+        asyncio.run(backup_database())
+        (backup,) = (tmp_path / "backups").glob("prod_*.sqlite")
+        assert count_rows(backup) == 5
+        assert not list((tmp_path / "backups").glob("*.tmp"))
+
+    def test_includes_uncheckpointed_wal(self, tmp_path, monkeypatch):
+        from tasks.backup import backup_database
+        monkeypatch.chdir(tmp_path)
+        make_db(tmp_path / "prod.sqlite")
+        # An open WAL connection with autocheckpoint off keeps its commits in
+        # the -wal file, where a plain file copy would miss them.
+        live = sqlite3.connect(tmp_path / "prod.sqlite")
+        live.execute("PRAGMA journal_mode=WAL")
+        live.execute("PRAGMA wal_autocheckpoint=0")
+        live.executemany("INSERT INTO t (v) VALUES (?)", [("y",)] * 3)
+        live.commit()
+        try:
+            asyncio.run(backup_database())
+        finally:
+            live.close()
+        (backup,) = (tmp_path / "backups").glob("prod_*.sqlite")
+        assert count_rows(backup) == 4
+
+    def test_compressed_backup(self, tmp_path, monkeypatch):
+        import global_data
+        from tasks.backup import backup_database
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(global_data.Config, "backup_compress", True)
+        make_db(tmp_path / "prod.sqlite", rows=2)
+        asyncio.run(backup_database())
+        (backup,) = (tmp_path / "backups").glob("prod_*.sqlite.gz")
+        restored = tmp_path / "restored.sqlite"
+        restored.write_bytes(gzip.decompress(backup.read_bytes()))
+        assert count_rows(restored) == 2
+
+    def test_compressed_backup_written_under_temporary_name(self, tmp_path, monkeypatch):
+        import global_data
+        import tasks.backup
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(global_data.Config, "backup_compress", True)
+        make_db(tmp_path / "prod.sqlite")
+        backups = tmp_path / "backups"
+
+        def interrupted(f_in, f_out):
+            f_out.write(f_in.read(100))
+            f_out.flush()
+            assert list(backups.glob("*.gz")) == []
+            raise OSError("disk full")
+
+        monkeypatch.setattr(tasks.backup.shutil, "copyfileobj", interrupted)
+        asyncio.run(tasks.backup.backup_database())
+        assert list(backups.iterdir()) == []
+        assert tasks.backup.last_result()["error"] == "disk full"
+
+    def test_records_last_result(self, tmp_path, monkeypatch):
+        import tasks.backup
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(tasks.backup, "_last_result", None)
+        make_db(tmp_path / "prod.sqlite")
+        asyncio.run(tasks.backup.backup_database())
+        result = tasks.backup.last_result()
+        assert result["error"] is None
+        assert result["size"] > 0
+        assert result["duration_seconds"] >= 0
+
+    def test_failure_leaves_no_partial_file(self, tmp_path, monkeypatch):
+        import tasks.backup
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(tasks.backup, "_last_result", None)
+        (tmp_path / "prod.sqlite").write_bytes(b"not a database" * 100)
+        asyncio.run(tasks.backup.backup_database())
+        assert list((tmp_path / "backups").iterdir()) == []
+        assert tasks.backup.last_result()["error"]
+
+
+@pytest.fixture(autouse=True)
+def _reset_backup_result(monkeypatch):
+    import tasks.backup
+    monkeypatch.setattr(tasks.backup, "_last_result", None)
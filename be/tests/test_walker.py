@@ -0,0 +1,195 @@
+import os
+from unittest.mock import patch
+
+from conftest import bump_mtime
+from core.scan_progress import progress
+from loader import scan
+import walker as walker_mod
+from walker import Walker, image_leaves
+
+
+def walk(exts, pathes, cache=None, **kwargs):
+    """Walk ``pathes``, keeping ``cache`` current the way ``DirCache.record`` does.
+
+    Returns the found paths, the modified ones and the cache.
+    """
+    cache = {} if cache is None else cache
+
+    def on_listing(path, listing, modified):
+        if listing is None:
+            cache.pop(path, None)
+        else:
+            cache[path] = listing
+
+    walker = Walker(exts, pathes, cache, on_listing=on_listing, **kwargs)
+    found = set(walker)
+    return found, walker.modified, cache
+
+
+class TestWalker:
+    def test_matches_scan(self, tmp_path):
+        (tmp_path / "a.zip").write_bytes(b"x")
+        d = tmp_path / "dir" / "leaf"
+        d.mkdir(parents=True)
+        (d / "0.jpg").write_bytes(b"img")
+        found, modified, cache = walk([".zip", ""], [str(tmp_path)])
+        assert found == {str(tmp_path / "a.zip"), str(d)}
+        assert set(scan([".zip", ""], [str(tmp_path)])) == found
+        assert modified == set()
+        assert str(tmp_path / "dir") in cache
+
+    def test_yields_each_path_once(self, tmp_path):
+        for i in range(20):
+            sub = tmp_path / f"d{i}"
+            sub.mkdir()
+            (sub / "a.zip").write_bytes(b"x")
+        paths = list(Walker([".zip"], [str(tmp_path), str(tmp_path)], workers=4))
+        assert len(paths) == 20
+        assert len(set(paths)) == 20
+
+    def test_nested_tops_walked_once(self, tmp_path):
+        sub = tmp_path / "sub"
+        sub.mkdir()
+        (sub / "a.zip").write_bytes(b"x")
+        assert list(Walker([".zip"], [str(sub), str(tmp_path) + os.sep])) == [str(sub / "a.zip")]
+
+    def test_does_not_follow_symlinked_dirs(self, tmp_path):
+        real = tmp_path / "real"
+        real.mkdir()
+        (real / "a.zip").write_bytes(b"x")
+        (tmp_path / "lib").mkdir()
+        (tmp_path / "lib" / "link").symlink_to(real)
+        assert list(Walker([".zip"], [str(tmp_path / "lib")])) == []
+
+    def test_records_walk_throughput(self, tmp_path):
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "sub" / "a.zip").write_bytes(b"x")
+        walk([".zip"], [str(tmp_path)])
+        snap = progress.snapshot()["walk"]
+        assert snap["dirs"] == 2
+        assert snap["entries"] == 2  # "sub" in the root + "a.zip" in sub
+
+
+class TestWalkerIncremental:
+    def test_unchanged_dir_is_not_relisted(self, tmp_path):
+        (tmp_path / "a.zip").write_bytes(b"x")
+        _, _, cache = walk([".zip"], [str(tmp_path)])
+        with patch("walker.os.scandir") as mock_scandir:
+            found, _, _ = walk([".zip"], [str(tmp_path)], cache)
+        mock_scandir.assert_not_called()
+        assert found == {str(tmp_path / "a.zip")}
+
+    def test_full_relists_unchanged_dir(self, tmp_path):
+        (tmp_path / "a.zip").write_bytes(b"x")
+        _, _, cache = walk([".zip"], [str(tmp_path)])
+        cache[str(tmp_path)][1]["a.zip"] = ["f", 0, 0, 0]  # stale signature
+        _, modified, _ = walk([".zip"], [str(tmp_path)], cache, full=True)
+        assert modified == {str(tmp_path / "a.zip")}
+
+    def test_detects_rewritten_file_and_new_file(self, tmp_path):
+        f = tmp_path / "a.zip"
+        f.write_bytes(b"x")
+        _, _, cache = walk([".zip"], [str(tmp_path)])
+        f.write_bytes(b"longer")
+        (tmp_path / "b.zip").write_bytes(b"x")
+        bump_mtime(tmp_path)
+        found, modified, _ = walk([".zip"], [str(tmp_path)], cache)
+        assert found == {str(f), str(tmp_path / "b.zip")}
+        assert modified == {str(f)}
+
+    def test_rewrite_in_unchanged_dir_needs_full(self, tmp_path):
+        f = tmp_path / "a.zip"
+        f.write_bytes(b"x")
+        _, _, cache = walk([".zip"], [str(tmp_path)])
+        st = os.stat(tmp_path)
+        f.write_bytes(b"longer")
+        os.utime(tmp_path, ns=(st.st_atime_ns, st.st_mtime_ns))  # dir mtime unchanged
+        with patch("walker.os.stat", wraps=os.stat) as mock_stat:
+            assert walk([".zip"], [str(tmp_path)], cache)[1] == set()
+        # One stat for the directory itself, none for the files in it.
+        assert mock_stat.call_count == 1
+        assert walk([".zip"], [str(tmp_path)], cache, full=True)[1] == {str(f)}
+
+    def test_changed_directory_comic_is_modified(self, tmp_path):
+        leaf = tmp_path / "comic"
+        leaf.mkdir()
+        (leaf / "0.jpg").write_bytes(b"img")
+        _, _, cache = walk([""], [str(tmp_path)])
+        (leaf / "1.jpg").write_bytes(b"img")
+        bump_mtime(leaf)
+        _, modified, _ = walk([""], [str(tmp_path)], cache)
+        assert modified == {str(leaf)}
+
+    def test_vanished_dir_is_dropped(self, tmp_path):
+        sub = tmp_path / "sub"
+        (sub / "deeper").mkdir(parents=True)
+        _, _, cache = walk([".zip"], [str(tmp_path)])
+        assert str(sub / "deeper") in cache
+        (sub / "deeper").rmdir()
+        sub.rmdir()
+        bump_mtime(tmp_path)
+        walk([".zip"], [str(tmp_path)], cache)
+        # The walker reports the vanished child; its subtree goes with it in DirCache.
+        assert str(sub) not in cache
+
+
+IMAGE_EXTS = {".jpg", ".png"}
+
+
+class TestImageLeaves:
+    def test_collects_pure_leaves_with_listing_and_mtime(self, tmp_path):
+        a = tmp_path / "a"
+        a.mkdir()
+        for name in ("2.jpg", "1.PNG", "10.jpg"):
+            (a / name).write_bytes(b"img")
+        mixed = tmp_path / "mixed"
+        (mixed / "inner").mkdir(parents=True)
+        (mixed / "x.jpg").write_bytes(b"img")
+        (mixed / "inner" / "y.jpg").write_bytes(b"img")
+        notes = tmp_path / "notes"
+        notes.mkdir()
+        (notes / "x.jpg").write_bytes(b"img")
+        (notes / "readme.txt").write_bytes(b"txt")
+        (tmp_path / "empty").mkdir()
+
+        leaves = image_leaves([str(tmp_path)], IMAGE_EXTS, workers=4)
+        assert [leaf.path for leaf in leaves] == [str(a), str(mixed / "inner")]
+        assert leaves[0].files == ["1.PNG", "10.jpg", "2.jpg"]
+        assert leaves[0].mtime_ns == os.stat(a).st_mtime_ns
+
+    def test_symlinked_dir_makes_non_leaf_and_is_not_followed(self, tmp_path):
+        real = tmp_path / "real"
+        real.mkdir()
+        (real / "x.jpg").write_bytes(b"img")
+        lib = tmp_path / "lib"
+        lib.mkdir()
+        (lib / "y.jpg").write_bytes(b"img")
+        (lib / "link").symlink_to(real)
+        assert image_leaves([str(lib)], IMAGE_EXTS) == []
+
+    def test_one_scandir_per_directory(self, tmp_path):
+        for i in range(5):
+            (tmp_path / f"d{i}").mkdir()
+            (tmp_path / f"d{i}" / "x.jpg").write_bytes(b"img")
+        listed = []
+        real_scandir = os.scandir
+
+        def counting_scandir(path):
+            listed.append(path)
+            return real_scandir(path)
+
+        with patch("walker.os.scandir", side_effect=counting_scandir):
+            leaves = image_leaves([str(tmp_path)], IMAGE_EXTS)
+        assert len(leaves) == 5
+        assert sorted(listed) == sorted({str(tmp_path), *(str(tmp_path / f"d{i}") for i in range(5))})
+
+    def test_uses_mtime_from_parent_listing_when_free(self, tmp_path, monkeypatch):
+        leaf = tmp_path / "leaf"
+        leaf.mkdir()
+        (leaf / "x.jpg").write_bytes(b"img")
+        monkeypatch.setattr(walker_mod, "_FREE_ENTRY_STAT", True)
+        stat = os.stat
+        with patch("walker.os.stat", side_effect=stat) as mock_stat:
+            leaves = image_leaves([str(tmp_path)], IMAGE_EXTS)
+        assert leaves[0].mtime_ns == stat(leaf).st_mtime_ns
+        assert [c.args[0] for c in mock_stat.call_args_list] == [str(tmp_path)]
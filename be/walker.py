@@ -0,0 +1,268 @@
+"""Concurrent, streaming directory walk shared by the media loaders.
+
+``os.walk`` lists one directory at a time, and on an SMB/NFS mount every
+readdir is a network round trip — so a library of thousands of folders spends
+most of its scan waiting on latency rather than doing work. The walker fans
+the listings out over a small thread pool and yields matching paths as soon as
+their directory has been read, so the loader can start opening archives while
+the rest of the tree is still being listed. The same fan-out finds the
+image albums (``image_leaves``) for the image bootstrap.
+"""
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Set
+
+import comicfile
+import global_data
+from core.scan_progress import progress
+
+
+# Windows fills in a DirEntry's stat from the directory listing itself; on
+# POSIX it costs a stat() call, better spent on the child's own worker.
+_FREE_ENTRY_STAT = os.name == "nt"
+
+
+def _fan_out(tops: Iterable[str], visit: Callable, workers: int) -> Iterator:
+    """Visit every directory under ``tops`` on ``workers`` threads.
+
+    ``visit(path, hint)`` reads one directory and returns ``None`` (unreadable)
+    or ``(result, subdirs)``, where ``subdirs`` are ``(path, hint)`` pairs to
+    visit next and a hint is whatever the parent's listing already learned
+    about the child (``None`` for the tops). Yields each result as soon as
+    its directory is done, in no particular order.
+    """
+    todo = deque((top, None) for top in _distinct_tops(tops))
+
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        pending = set()
+        while todo or pending:
+            # Keep a couple of listings queued per worker, no more: the
+            # directory backlog stays in the deque, not in futures.
+            while todo and len(pending) < workers * 2:
+                pending.add(ex.submit(visit, *todo.popleft()))
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                out = future.result()
+                if out is None:
+                    continue
+                result, subdirs = out
+                # Symlinked dirs are never descended into, so with distinct
+                # tops no directory is reached twice: nothing to remember.
+                todo.extend(subdirs)
+                yield result
+
+
+def _distinct_tops(tops: Iterable[str]) -> List[str]:
+    """``tops`` less repeats and the ones inside another top."""
+    kept: Dict[str, str] = {}  # normalized -> as given
+    for top in sorted(tops, key=lambda t: len(os.path.normpath(t))):
+        norm = os.path.normpath(top)
+        if not any(norm == k or norm.startswith(k.rstrip(os.sep) + os.sep) for k in kept):
+            kept[norm] = top
+    return list(kept.values())
+
+
+def _list_dir(path: str, exts: List[str], scan_dir: bool) -> Dict[str, list]:
+    """Readdir ``path``, keeping only the children a scan for ``exts`` needs.
+
+    Media files are stat'ed for their ``[size, mtime_ns, inode]`` signature;
+    images only matter as "this leaf dir is a comic", so they skip the stat.
+    """
+    entries = {}
+    with os.scandir(path) as it:
+        for e in it:
+            if e.is_dir():
+                # Like os.walk: a symlinked dir still makes its parent a
+                # non-leaf, but is never descended into.
+                entries[e.name] = ["l" if e.is_symlink() else "d"]
+                continue
+            ext = os.path.splitext(e.name)[1]
+            if ext in exts:
+                try:
+                    st = e.stat()
+                    entries[e.name] = ["f", st.st_size, st.st_mtime_ns, st.st_ino]
+                except OSError:
+                    entries[e.name] = ["f", 0, 0, 0]
+            elif scan_dir and ext in comicfile.allowImgs:
+                entries[e.name] = ["i"]
+    return entries
+
+
+# (directory, fresh listing or None once gone, modified paths in it)
+OnListing = Callable[[str, tuple | None, List[str]], None]
+
+
+class Walker:
+    """Walk ``pathes`` for files with one of ``exts``, yielding each match.
+
+    ``""`` in ``exts`` also yields leaf directories holding images (directory
+    comics). ``cache`` maps a directory to the ``(mtime_ns, entries)`` recorded
+    by the previous scan (see ``model.ScanDirEntity``): a directory whose mtime
+    still matches is taken from its cached listing without a readdir or a stat
+    of any file in it. Its subdirectories are still visited — a change deep in
+    a subtree does not bubble up to the ancestors' mtime — so an unchanged
+    tree costs one stat per directory instead of a readdir plus a stat per
+    media file.
+
+    The price: a file rewritten in place (same name, new bytes) leaves its
+    directory's mtime alone and goes unnoticed. ``full`` ignores the cached
+    listings and re-lists everything, which catches it; the scheduled scan
+    runs one weekly (see ``tasks.scan``).
+
+    ``cache`` is only asked for one directory at a time (``cache.get``), from
+    the walk's threads, so it can be a lookup in the database rather than
+    every listing held in memory. ``on_listing(path, record, modified)`` is
+    called on the iterating thread for each directory whose listing is not
+    the cached one: ``record`` is its fresh ``(mtime_ns, entries)``, or None
+    once it is gone from disk (and everything under it with it), and
+    ``modified`` the paths in it counted in ``modified`` below.
+
+    Found paths are only yielded, not kept. ``modified`` collects the paths
+    seen by the previous scan whose signature (for directory comics: mtime)
+    changed, so it grows with the changes, not with the library.
+    """
+
+    def __init__(
+        self,
+        exts: List[str],
+        pathes: List[str],
+        cache: Mapping[str, tuple] | None = None,
+        full: bool = False,
+        workers: int | None = None,
+        on_listing: OnListing | None = None,
+    ):
+        self.exts = exts
+        self.pathes = pathes
+        self.cache = cache if cache is not None else {}
+        self.full = full
+        self.workers = workers or global_data.Config.scan_walk_workers
+        self.on_listing = on_listing
+        self.modified: Set[str] = set()
+
+    def __iter__(self) -> Iterator[str]:
+        scan_dir = "" in self.exts  # "" means scan dir
+        started = time.perf_counter()
+        try:
+            visit = lambda root, _hint: self._visit(root, scan_dir)  # noqa: E731
+            for visited in _fan_out(self.pathes, visit, self.workers):
+                root, record, changed, found, modified, gone = visited
+                self.modified.update(modified)
+                if self.on_listing is not None:
+                    if changed:
+                        self.on_listing(root, record, modified)
+                    for path in gone:
+                        self.on_listing(path, None, [])
+                if record is None:
+                    continue
+                progress.add_walked(len(record[1]))
+                yield from found
+        finally:
+            progress.add_walk_time(time.perf_counter() - started)
+
+    def _visit(self, root: str, scan_dir: bool):
+        """List one directory (or reuse its cached listing); runs on a worker."""
+        try:
+            mtime = os.stat(root).st_mtime_ns
+        except OSError:
+            mtime = None
+        old = self.cache.get(root)
+        if mtime is None:
+            # Report a vanished directory only if there is a listing to drop.
+            return ((root, None, True, [], [], []), []) if old is not None else None
+        modified = []
+        gone = []
+        if old is not None and old[0] == mtime and not self.full:
+            entries = old[1]
+        else:
+            try:
+                entries = _list_dir(root, self.exts, scan_dir)
+            except OSError:
+                return None
+            if old is not None:
+                for name, prev in old[1].items():
+                    entry = entries.get(name)
+                    if prev[0] == "d" and (entry is None or entry[0] != "d"):
+                        gone.append(os.path.join(root, name))
+                    elif entry is not None and entry[0] == "f" and prev != entry:
+                        modified.append(os.path.join(root, name))
+
+        found = []
+        subdirs = []
+        is_leaf = True
+        for name, entry in entries.items():
+            if entry[0] == "f":
+                found.append(os.path.join(root, name))
+            elif entry[0] == "d":
+                subdirs.append(os.path.join(root, name))
+                is_leaf = False
+            elif entry[0] == "l":
+                is_leaf = False
+        if scan_dir and is_leaf and any(e[0] == "i" for e in entries.values()):
+            found.append(root)
+            if old is not None and old[0] != mtime:
+                modified.append(root)
+        record = (mtime, entries)
+        changed = old is None or (old[0], old[1]) != record
+        return (root, record, changed, found, modified, gone), [(d, None) for d in subdirs]
+
+
+class ImageLeaf(NamedTuple):
+    path: str
+    files: List[str]  # image names, sorted
+    mtime_ns: int
+
+
+def _visit_image_dir(root: str, mtime_ns: int | None, exts: Set[str]):
+    """One scandir of ``root``: its album listing if it is one, and its subdirs."""
+    if mtime_ns is None:
+        try:
+            mtime_ns = os.stat(root).st_mtime_ns
+        except OSError:
+            return None
+    files = []
+    subdirs = []
+    pure = True
+    try:
+        with os.scandir(root) as it:
+            for e in it:
+                if e.is_dir():
+                    # Like os.walk: a symlinked dir makes this folder a
+                    # non-leaf, but is never descended into.
+                    pure = False
+                    if not e.is_symlink():
+                        hint = None
+                        if _FREE_ENTRY_STAT:
+                            try:
+                                hint = e.stat().st_mtime_ns
+                            except OSError:
+                                pass
+                        subdirs.append((e.path, hint))
+                elif os.path.splitext(e.name)[1].lower() in exts:
+                    files.append(e.name)
+                else:
+                    pure = False
+    except OSError:
+        return None
+    leaf = ImageLeaf(root, sorted(files), mtime_ns) if pure and files else None
+    return leaf, subdirs
+
+
+def image_leaves(pathes: List[str], exts: Set[str], workers: int | None = None) -> List[ImageLeaf]:
+    """Every pure image folder under ``pathes``, sorted by path.
+
+    A folder qualifies only if it holds nothing but files with one of
+    ``exts`` (lower-cased) — no subdirectories and no other files — so an
+    album is always safe to delete wholesale, and a mixed folder yields its
+    pure leaves rather than itself. Each
+    directory costs one scandir, plus a stat for its mtime except where the
+    parent's listing already carried it; the listing and mtime come back
+    with the leaf, so callers need no further round trip per album.
+    """
+    workers = workers or global_data.Config.scan_walk_workers
+    visit = lambda root, hint: _visit_image_dir(root, hint, exts)  # noqa: E731
+    return sorted(
+        (leaf for leaf in _fan_out(pathes, visit, workers) if leaf is not None),
+        key=lambda leaf: leaf.path,
+    )